@@ -0,0 +1,255 @@
+"""Local stand-in for the RedCat API, for offline benchmarks
+
+Serves /login and the stampcard summary and transactions reports over HTTP, honouring Fields,
+Order, Start, Limit and Filters (or ignoring Filters, like some servers do), optionally
+gzip-compressed. Rows are generated from their index, so millions of rows cost no memory until
+a page asks for them. Run it on its own to point the app at it:
+
+    python benchmarks/mock_server.py --rows 1000000 --port 8765 --latency-ms 20
+"""
+import argparse
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from itertools import islice
+
+STORES = ["Brisbane CBD", "Fortitude Valley", "South Bank", "Chermside", "Carindale", "Toowong",
+          "Indooroopilly", "Newstead"]
+FIRST_TXN_DATE = datetime(2023, 1, 1, 8, 0, 0)
+
+# Report endpoint -> key field, whose value is the row index + 1
+REPORTS = {
+    "stampcards_summary": "MemberNo",
+    "stampcards_transactions": "MemberSalesHeaderRecid"
+}
+
+OPERATORS = {
+    ">=": lambda value, bound: value >= bound,
+    ">": lambda value, bound: value > bound,
+    "<=": lambda value, bound: value <= bound,
+    "<": lambda value, bound: value < bound,
+    "=": lambda value, bound: value == bound
+}
+
+def summary_row(index, members):
+    return {
+        "MemberNo": index + 1,
+        "CurrentStamps": index % 10,
+        "CardsFilled": (index * 7) % 13,
+        "RewardsEarned": (index * 3) % 11
+    }
+
+def transaction_row(index, members):
+    return {
+        "MemberSalesHeaderRecid": index + 1,
+        "MemberNo": 1 + (index * 7919) % members,
+        "SaleStampsEarned": 1 + index % 3,
+        "RewardsEarned": 1 if index % 10 == 0 else 0,
+        "StoreName": STORES[index % len(STORES)],
+        "Amount": round(4.5 + (index * 37 % 5000) / 100, 2),
+        "TxnDate": (FIRST_TXN_DATE + timedelta(minutes=index)).isoformat()
+    }
+
+ROW_BUILDERS = {"stampcards_summary": summary_row, "stampcards_transactions": transaction_row}
+
+class MockRedCatAPI:
+    """Report data and query logic of the mock server, independent of HTTP"""
+
+    def __init__(self, rows, members=None, shape="lists", ignore_filters=False, token_requests=None):
+        if shape not in ("lists", "dicts"):
+            raise ValueError("shape must be 'lists' or 'dicts'")
+        self.rows = rows
+        self.members = members or max(rows // 10, 1)
+        self.shape = shape
+        self.ignore_filters = ignore_filters
+        self.token_requests = token_requests
+        self.tokens = {}
+        self.logins = 0
+        self.orderings = {}
+        self.rows_served = 0
+        self.lock = threading.Lock()
+
+    def login(self):
+        """Issue a token; with token_requests set it expires after that many report requests"""
+        with self.lock:
+            self.logins += 1
+            if self.token_requests is None:
+                return "mock-token"
+            token = f"mock-token-{self.logins}"
+            self.tokens[token] = self.token_requests
+            return token
+
+    def authorize(self, token):
+        """Return True if a report request may use token, counting it against the token's requests"""
+        if not token:
+            return False
+        if self.token_requests is None:
+            return True
+        with self.lock:
+            remaining = self.tokens.get(token, 0)
+            if remaining <= 0:
+                return False
+            self.tokens[token] = remaining - 1
+            return True
+
+    def row(self, report, index):
+        return ROW_BUILDERS[report](index, self.members)
+
+    def ordering(self, report, field, descending):
+        """Row indexes sorted by a non-key field (built once per field and direction)"""
+        with self.lock:
+            cache_key = (report, field, descending)
+            if cache_key not in self.orderings:
+                key_field = REPORTS[report]
+                self.orderings[cache_key] = sorted(
+                    range(self.rows),
+                    key=lambda index: (self.row(report, index)[field], self.row(report, index)[key_field]),
+                    reverse=descending
+                )
+            return self.orderings[cache_key]
+
+    def query(self, report, payload):
+        """Return the response body for a report request"""
+        key_field = REPORTS[report]
+        fields = payload.get("Fields") or list(self.row(report, 0))
+        order_field, direction = (payload.get("Order") or [[key_field, "asc"]])[0]
+        descending = str(direction).lower() == "desc"
+        start = int(payload.get("Start", 0))
+        limit = int(payload.get("Limit", 1000))
+
+        # Key conditions narrow the index range directly; anything else is checked row by row
+        low, high = 0, self.rows
+        conditions = []
+        for field, operator, value in [] if self.ignore_filters else payload.get("Filters") or []:
+            if field == key_field and operator in (">=", ">", "<", "<="):
+                index = int(value) - 1
+                if operator == ">=":
+                    low = max(low, index)
+                elif operator == ">":
+                    low = max(low, index + 1)
+                elif operator == "<":
+                    high = min(high, index)
+                else:
+                    high = min(high, index + 1)
+            else:
+                conditions.append((field, OPERATORS[operator], value))
+
+        if order_field == key_field:
+            indexes = range(high - 1, low - 1, -1) if descending else range(low, high)
+        else:
+            indexes = self.ordering(report, order_field, descending)
+            if low > 0 or high < self.rows:
+                indexes = [index for index in indexes if low <= index < high]
+        if conditions:
+            records = (self.row(report, index) for index in indexes)
+            records = (record for record in records
+                       if all(record[field] is not None and compare(record[field], value)
+                              for field, compare, value in conditions))
+            page = list(islice(records, start, start + limit))
+        else:
+            # Without row conditions a page is a slice of the indexes, so deep pages stay cheap
+            page = [self.row(report, index) for index in indexes[start:start + limit]]
+        with self.lock:
+            self.rows_served += len(page)
+        if self.shape == "dicts":
+            return {"data": [{field: record[field] for field in fields} for record in page]}
+        return {"data": [[record[field] for field in fields] for record in page]}
+
+def make_handler(api, latency, compress=False):
+    class MockRedCatHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            if compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                data = gzip.compress(data, compresslevel=5)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if latency:
+                time.sleep(latency)
+            endpoint = self.path.rstrip("/").rsplit("/", 1)[-1]
+            if endpoint == "login":
+                self.send_json(200, {"token": api.login()})
+            elif endpoint in REPORTS:
+                if not api.authorize(self.headers.get("X-Redcat-Authtoken")):
+                    self.send_json(401, {"error": "Missing or expired X-Redcat-Authtoken"})
+                else:
+                    self.send_json(200, api.query(endpoint, payload))
+            else:
+                self.send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    return MockRedCatHandler
+
+class MockRedCatServer:
+    """Run the mock API on a background thread: with MockRedCatServer(rows) as server: server.base_url"""
+
+    def __init__(self, rows, members=None, shape="lists", latency_ms=0, compress=False, host="127.0.0.1", port=0,
+                 ignore_filters=False, token_requests=None):
+        self.api = MockRedCatAPI(rows, members=members, shape=shape, ignore_filters=ignore_filters,
+                                 token_requests=token_requests)
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.api, latency_ms / 1000, compress))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the RedCat reporting API")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows per report (default: 100000)")
+    parser.add_argument("--members", type=int, help="Distinct members in transactions (default: rows / 10)")
+    parser.add_argument("--shape", choices=["lists", "dicts"], default="lists",
+                        help="Return records as lists in Fields order or as dicts")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every request")
+    parser.add_argument("--compress", action="store_true", help="gzip responses when the client accepts it")
+    parser.add_argument("--ignore-filters", action="store_true",
+                        help="Return every row regardless of Filters, to exercise the client-side fallback")
+    parser.add_argument("--token-requests", type=int,
+                        help="Expire each login token after this many report requests, to exercise re-login")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = MockRedCatServer(args.rows, members=args.members, shape=args.shape, latency_ms=args.latency_ms,
+                              compress=args.compress, host=args.host, port=args.port,
+                              ignore_filters=args.ignore_filters, token_requests=args.token_requests)
+    print(f"Mock RedCat API with {args.rows} rows at {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
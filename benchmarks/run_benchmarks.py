@@ -0,0 +1,196 @@
+"""Offline throughput benchmarks against the local mock API
+
+Fetches the transactions report from benchmarks/mock_server.py, then times normalization,
+display formatting and every export format, and compares rows/s with a stored baseline:
+
+    python benchmarks/run_benchmarks.py --sizes 10k,1m --save-baseline
+    python benchmarks/run_benchmarks.py --sizes 10k,1m
+
+Exits with status 1 when a benchmark is slower than the baseline by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reporting
+from reporting import (
+    CONFIG, DEFAULT_PAGE_SIZE, DEFAULT_MAX_WORKERS, TRANSACTION_FIELDS, RunMetrics, measured_pages,
+    fetch_report_pages, get_stampcard_transactions, login
+)
+from frames import ColumnStore, FRAME_WRITERS, export_frame
+from mock_server import MockRedCatServer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+EXPORT_EXTENSIONS = {"csv": ".csv", "json": ".json", "jsonl": ".jsonl", "parquet": ".parquet", "arrow": ".arrow"}
+# Display formatting only ever renders a screenful, so a sample of rows is enough to time it
+DISPLAY_SAMPLE_ROWS = 10_000
+
+def parse_size(text):
+    """Parse a row count such as 10000, 10k or 1m"""
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier > 1 else text
+    try:
+        return int(float(number) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size: {text}") from None
+
+def size_label(rows):
+    if rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}M"
+    if rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+def timed(results, name, rows, function):
+    """Run function, record its duration and throughput under name, and return its result"""
+    started = time.perf_counter()
+    value = function()
+    seconds = time.perf_counter() - started
+    results[name] = {"seconds": round(seconds, 4), "rows_per_s": round(rows / seconds, 1) if seconds > 0 else None}
+    return value
+
+def benchmark_display(store, results):
+    """Time VirtualTable row formatting (needs customtkinter; skipped without it)"""
+    try:
+        from gui import VirtualTable, DISPLAY_COLUMNS
+    except Exception as e:
+        print(f"  display benchmark skipped: {e}")
+        return
+    columns = DISPLAY_COLUMNS["transactions"]
+    table = SimpleNamespace(columns=columns, column_indexes=[store.fields.index(field) for field, _, _ in columns],
+                            format_cell=VirtualTable.format_cell)
+    sample = min(len(store), DISPLAY_SAMPLE_ROWS)
+    step = max(len(store) // sample, 1)
+
+    def format_rows():
+        for index in range(0, step * sample, step):
+            VirtualTable.format_row(table, store.row(index))
+
+    timed(results, "display", sample, format_rows)
+
+def run_size(token, rows, args):
+    """Run every benchmark for one report size and return {benchmark: timings}"""
+    results = {}
+    metrics = RunMetrics("transactions")
+    store = ColumnStore(TRANSACTION_FIELDS)
+    pages = measured_pages(fetch_report_pages(get_stampcard_transactions, token, limit=rows, page_size=args.page_size,
+                                              order_by="MemberSalesHeaderRecid", order_direction="asc",
+                                              max_workers=args.workers), metrics)
+    for page in pages:
+        with metrics.stage("normalize"):
+            store.append_records(page)
+    with metrics.stage("normalize"):
+        store.consolidate()
+    for name in ("fetch", "normalize"):
+        seconds = metrics.stages[name][1]
+        results[name] = {"seconds": round(seconds, 4), "rows_per_s": round(len(store) / seconds, 1)}
+    # Memory held by the normalized rows, tracked like the exports' file sizes
+    results["normalize"]["bytes"] = store.memory_usage()
+    if len(store) != rows:
+        raise RuntimeError(f"Fetched {len(store)} rows, expected {rows}")
+
+    benchmark_display(store, results)
+
+    frame = store.frame()
+    with tempfile.TemporaryDirectory(prefix="report-bench-") as directory:
+        for export_format in args.formats:
+            filename = os.path.join(directory, f"transactions{EXPORT_EXTENSIONS[export_format]}")
+            timed(results, f"export_{export_format}", rows,
+                  lambda: export_frame(frame, filename, "transactions", export_format))
+            results[f"export_{export_format}"]["bytes"] = os.path.getsize(filename)
+            os.remove(filename)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print each benchmark against the baseline and return the regressions"""
+    regressions = []
+    for size, benchmarks in results.items():
+        print(f"\n{size_label(int(size))} rows")
+        for name, timing in benchmarks.items():
+            line = f"  {name:<16} {timing['seconds']:>9.3f} s {timing['rows_per_s'] or 0:>14,.0f} rows/s"
+            reference = baseline.get(size, {}).get(name, {}).get("rows_per_s")
+            if reference and timing["rows_per_s"]:
+                change = timing["rows_per_s"] / reference - 1
+                line += f"  {change:+7.1%} vs baseline"
+                if change < -tolerance:
+                    line += "  REGRESSION"
+                    regressions.append((size, name, change))
+            print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fetch, normalization, display and exports offline")
+    parser.add_argument("--sizes", type=lambda text: [parse_size(size) for size in text.split(",")],
+                        default=[10_000], help="Comma-separated row counts, e.g. 10k,1m,10m (default: 10k)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added by the mock server to each request")
+    parser.add_argument("--shape", choices=["lists", "dicts"], default="lists", help="Mock response record shape")
+    parser.add_argument("--compress", action="store_true", help="Have the mock server gzip its responses")
+    parser.add_argument("--page-size", type=int, default=CONFIG["reports"].get("page_size", DEFAULT_PAGE_SIZE))
+    parser.add_argument("--workers", type=int, default=CONFIG["reports"].get("max_workers", DEFAULT_MAX_WORKERS))
+    parser.add_argument("--formats", type=lambda text: text.split(","), default=list(FRAME_WRITERS),
+                        help=f"Comma-separated export formats (default: {','.join(FRAME_WRITERS)})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed throughput drop before a result counts as a regression (default: 0.25)")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+    unknown = [export_format for export_format in args.formats if export_format not in FRAME_WRITERS]
+    if unknown:
+        parser.error(f"Unknown export format: {', '.join(unknown)}")
+
+    results = {}
+    with MockRedCatServer(max(args.sizes), shape=args.shape, latency_ms=args.latency_ms,
+                          compress=args.compress) as server:
+        reporting.BASE_URL = server.base_url
+        token = login("benchmark", "benchmark")
+        print(f"Mock API at {server.base_url} ({args.shape}, {args.latency_ms:g} ms latency, "
+              f"{'gzip' if args.compress else 'uncompressed'}, "
+              f"page size {args.page_size}, {args.workers} workers)")
+        for rows in args.sizes:
+            print(f"Benchmarking {size_label(rows)} rows...")
+            results[str(rows)] = run_size(token, rows, args)
+
+    options = {"latency_ms": args.latency_ms, "shape": args.shape, "compress": args.compress,
+               "page_size": args.page_size, "workers": args.workers}
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        baseline = stored.get("results", {})
+        if stored.get("options") != options:
+            print(f"\nNote: baseline was recorded with different options: {stored.get('options')}")
+    regressions = compare(results, baseline, args.tolerance)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor()},
+        "options": options,
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        # Keep baseline entries for sizes that were not part of this run
+        report["results"] = {**baseline, **results}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
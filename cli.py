@@ -0,0 +1,325 @@
+"""Headless command-line mode, e.g. for cron jobs and display-less servers:
+
+    python main.py report --type transactions --out transactions.csv
+    python main.py schedule
+
+Only the reporting core is imported, never customtkinter or tkinter.
+"""
+import argparse
+import getpass
+import os
+import sys
+import time
+from datetime import datetime
+
+from reporting import (
+    CONFIG, REPORT_FETCHERS, REPORT_FIELDS, DEFAULT_ORDER_FIELDS, get_token_manager, resumable_report_pages,
+    report_fields, member_view_pages, sharded_report_pages, filter_conditions, stream_report_to_file, ReportCache,
+    refresh_transactions_cache, refresh_summary_cache, SummaryDiff, SUMMARY_DIFF_FIELDS, CancellableSession,
+    RunMetrics, measured_pages, write_metrics
+)
+from scheduler import ReportScheduler, load_scheduled_jobs
+
+def build_parser():
+    """Build the argument parser for the headless commands"""
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="RedCat stamp card reporting. Run without arguments to open the GUI."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    report = subparsers.add_parser("report", help="Generate a report and export it to a file")
+    report.add_argument("--type", dest="report_type", choices=sorted(REPORT_FIELDS), default="summary",
+                        help="Report to generate (default: summary); members joins the summary with "
+                             "per-member transaction activity")
+    report.add_argument("--out", required=True,
+                        help="Output file; the format follows the extension "
+                             "(.csv, .json, .jsonl, .parquet, .arrow or .feather)")
+    report.add_argument("--username", default=os.environ.get("REDCAT_USERNAME"),
+                        help="API username (default: $REDCAT_USERNAME)")
+    report.add_argument("--password", default=os.environ.get("REDCAT_PASSWORD"),
+                        help="API password (default: $REDCAT_PASSWORD, otherwise prompted)")
+    report.add_argument("--limit", type=int, default=CONFIG["reports"]["default_limit"],
+                        help="Maximum number of records, 0 for all (default: reports.default_limit)")
+    report.add_argument("--order-by", help="Field to sort by (default: the report's key field)")
+    report.add_argument("--direction", choices=["desc", "asc"], default="desc", help="Sort direction")
+    report.add_argument("--page-size", type=int, help="Records per API call (default: reports.page_size)")
+    report.add_argument("--workers", type=int, help="Concurrent page requests (default: reports.max_workers)")
+    report.add_argument("--from-date", help="Transactions only: first TxnDate to include (YYYY-MM-DD)")
+    report.add_argument("--to-date", help="Transactions only: last TxnDate to include (YYYY-MM-DD)")
+    report.add_argument("--store", help="Transactions only: only include this StoreName")
+    report.add_argument("--member-from", type=int, help="Lowest MemberNo to include")
+    report.add_argument("--member-to", type=int, help="Highest MemberNo to include")
+    report.add_argument("--shards", type=int, default=0,
+                        help="Fetch the report as N key-range shards in parallel worker processes (default: off)")
+    report.add_argument("--cache", action="store_true", default=CONFIG.get("cache", {}).get("enabled", False),
+                        help="Refresh and serve the report from the local cache")
+    report.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="Fetch from the API even when cache.enabled is set")
+    report.add_argument("--diff", action="store_true",
+                        help="Summary only: export just the members that are new, changed or removed since the "
+                             "cached snapshot, then update the snapshot")
+    report.add_argument("--aggregate", choices=["store", "member", "day", "week", "month"],
+                        help="Transactions only: export totals grouped by store, member or TxnDate period")
+    report.add_argument("--no-resume", dest="resume", action="store_false",
+                        default=CONFIG.get("jobs", {}).get("resume", True),
+                        help="Start from scratch instead of resuming an interrupted pull of the same report")
+    report.add_argument("--stats", action="store_true",
+                        help="Print timings, throughput, bytes transferred and peak memory when done")
+    report.add_argument("--metrics-file",
+                        help="Append the run's metrics as a JSON line to this file (default: metrics.file)")
+    report.add_argument("--quiet", action="store_true", help="Only print errors")
+
+    schedule = subparsers.add_parser("schedule", help="Run the scheduled exports of config.json until interrupted")
+    schedule.add_argument("--username", default=os.environ.get("REDCAT_USERNAME"),
+                          help="API username (default: $REDCAT_USERNAME)")
+    schedule.add_argument("--password", default=os.environ.get("REDCAT_PASSWORD"),
+                          help="API password (default: $REDCAT_PASSWORD, otherwise prompted)")
+    schedule.add_argument("--once", action="store_true", help="Run every scheduled job once now, then exit")
+    schedule.add_argument("--quiet", action="store_true", help="Only print errors")
+    return parser
+
+def timestamped_log(quiet):
+    """Return a log function printing timestamped messages to stderr (nothing when quiet)"""
+    def log(message):
+        if not quiet:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            print(f"[{timestamp}] {message}", file=sys.stderr)
+    return log
+
+def credentials(args):
+    """Return (username, password) from the arguments, prompting for the password on a terminal"""
+    username = args.username
+    password = args.password
+    if not username:
+        raise ValueError("Username is required (--username or $REDCAT_USERNAME)")
+    if not password:
+        if not sys.stdin.isatty():
+            raise ValueError("Password is required (--password or $REDCAT_PASSWORD)")
+        password = getpass.getpass("API password: ")
+    return username, password
+
+def run_report(args, log=None):
+    """Fetch a report and stream it to args.out, returning the process exit code"""
+    log = log or timestamped_log(args.quiet)
+
+    report_type = args.report_type
+    fields = report_fields(report_type)
+    order_by = args.order_by or DEFAULT_ORDER_FIELDS[report_type]
+    if order_by not in fields:
+        raise ValueError(f"Cannot order {report_type} report by {order_by}; choose one of: {', '.join(fields)}")
+    if args.limit < 0:
+        raise ValueError("Limit must be 0 (all records) or a positive integer")
+    if args.aggregate and report_type != "transactions":
+        raise ValueError("--aggregate is only available for the transactions report")
+    if args.shards < 0:
+        raise ValueError("--shards must be 0 (off) or a positive integer")
+    if args.shards and args.cache:
+        raise ValueError("--shards fetches from the API and cannot be combined with --cache")
+    if args.shards and report_type == "members":
+        raise ValueError("--shards is not available for the members report")
+    if args.diff and report_type != "summary":
+        raise ValueError("--diff is only available for the summary report")
+    if args.diff and (args.shards or args.cache):
+        raise ValueError("--diff always compares a full download with the cached snapshot; "
+                         "drop --shards and --cache")
+    filters = filter_conditions(report_type, {
+        "date_from": args.from_date,
+        "date_to": args.to_date,
+        "store": args.store,
+        "member_from": args.member_from,
+        "member_to": args.member_to
+    })
+    if args.diff and filters:
+        raise ValueError("--diff compares every member and cannot be combined with filters")
+
+    username, password = credentials(args)
+
+    source = "diff" if args.diff else "cache" if args.cache else "shards" if args.shards else "api"
+    metrics = RunMetrics(report_type, source=source, limit=args.limit or None, aggregate=args.aggregate,
+                         filters=len(filters))
+    session = CancellableSession(metrics=metrics)
+
+    token = get_token_manager(username, password)
+    if not token.has_valid_token():
+        log("Authenticating...")
+        with metrics.stage("login"):
+            token.get_token()
+
+    def progress(pages, records):
+        log(f"Page {pages} received ({records} records so far)")
+
+    cache = ReportCache() if args.cache or args.diff else None
+    diff = None
+    try:
+        if report_type == "members":
+            if cache:
+                new_rows = refresh_transactions_cache(cache, token, page_size=args.page_size,
+                                                      max_workers=args.workers, progress_callback=progress,
+                                                      session=session)
+                log(f"{new_rows} new transactions merged into cache "
+                    f"({cache.count('transactions', report_fields('transactions'))} cached)")
+                refresh_summary_cache(cache, token, page_size=args.page_size, max_workers=args.workers,
+                                      progress_callback=progress, session=session)
+                summary_pages, transaction_pages = (
+                    cache.iter_pages(source, report_fields(source), page_size=args.page_size, filters=filters)
+                    for source in ("summary", "transactions")
+                )
+            else:
+                log("Fetching summary and transactions concurrently")
+                summary_pages, transaction_pages = member_view_pages(
+                    token, filters=filters, page_size=args.page_size, max_workers=args.workers,
+                    progress_callback=progress, session=session)
+        elif args.diff:
+            diff = SummaryDiff(cache)
+            log("Comparing the summary with the cached snapshot "
+                f"({cache.refreshed_at('summary', fields) or 'none yet: every member is new'})")
+            pages = diff.pages(token, page_size=args.page_size, max_workers=args.workers,
+                               progress_callback=progress, session=session)
+        elif cache:
+            if report_type == "transactions":
+                new_rows = refresh_transactions_cache(cache, token, page_size=args.page_size,
+                                                      max_workers=args.workers, progress_callback=progress,
+                                                      session=session)
+                log(f"{new_rows} new transactions merged into cache "
+                    f"({cache.count('transactions', report_fields('transactions'))} cached)")
+            else:
+                refresh_summary_cache(cache, token, page_size=args.page_size, max_workers=args.workers,
+                                      progress_callback=progress, session=session)
+            pages = cache.iter_pages(report_type, fields, order_by=order_by, order_direction=args.direction,
+                                     limit=args.limit or None, page_size=args.page_size, filters=filters)
+        elif args.shards:
+            log(f"Fetching {report_type} report in {args.shards} parallel shards")
+            pages = sharded_report_pages(
+                report_type,
+                token,
+                args.shards,
+                limit=args.limit or None,
+                page_size=args.page_size,
+                order_by=order_by,
+                order_direction=args.direction,
+                progress_callback=lambda pages, records: log(f"{pages} pages received ({records} records so far)"),
+                max_workers=args.workers,
+                filters=filters,
+                session=session
+            )
+        else:
+            pages = resumable_report_pages(
+                REPORT_FETCHERS[report_type],
+                token,
+                report_type,
+                limit=args.limit or None,
+                page_size=args.page_size,
+                order_by=order_by,
+                order_direction=args.direction,
+                progress_callback=progress,
+                max_workers=args.workers,
+                filters=filters,
+                resume=args.resume,
+                resume_callback=lambda pages, records: log(
+                    f"Resuming interrupted report: {records} records from {pages} saved pages"),
+                stale_callback=lambda pages, records: log(
+                    f"The report changed since it was interrupted; discarding {records} saved records "
+                    "and starting over"),
+                session=session
+            )
+
+        if report_type == "members":
+            # pandas is only needed (and imported) for joins and rollups
+            from frames import build_member_view, export_frame
+            view = build_member_view(measured_pages(summary_pages, metrics), measured_pages(transaction_pages, metrics),
+                                     order_by=order_by, order_direction=args.direction, limit=args.limit or None,
+                                     metrics=metrics)
+            log(f"Joined {len(view)} members with their transaction activity")
+            with metrics.stage("export"):
+                record_count = export_frame(view, args.out, "members") if len(view) else 0
+        elif args.aggregate:
+            from frames import TransactionAggregator, export_frame
+            aggregator = TransactionAggregator(args.aggregate)
+            for page in measured_pages(pages, metrics):
+                with metrics.stage("aggregate"):
+                    aggregator.add_records(page, fields)
+            result = aggregator.result()
+            log(f"Aggregated {aggregator.transactions} transactions into {len(result)} groups")
+            with metrics.stage("export"):
+                record_count = export_frame(result, args.out, f"transactions_by_{args.aggregate}") if len(result) else 0
+        elif diff:
+            log(f"Writing summary changes into {args.out}")
+            record_count = stream_report_to_file(measured_pages(pages, metrics), args.out, "summary_changes",
+                                                 fields=SUMMARY_DIFF_FIELDS, metrics=metrics)
+            log("{new} new, {changed} changed, {removed} removed, {unchanged} unchanged members".format(**diff.counts))
+        else:
+            log(f"Generating {report_type} report into {args.out}")
+            record_count = stream_report_to_file(measured_pages(pages, metrics), args.out, report_type, metrics=metrics)
+    finally:
+        if cache:
+            cache.close()
+        session.close()
+        metrics.finish()
+
+    log(f"Report completed: {record_count} records written to {args.out}")
+    if args.stats:
+        for line in metrics.format_lines():
+            print(line, file=sys.stderr)
+    metrics_path = write_metrics(metrics, args.metrics_file)
+    if metrics_path:
+        log(f"Metrics appended to {metrics_path}")
+    return 0
+
+def run_scheduled_job(job, username, password, log):
+    """Run one ScheduledJob as the equivalent report command, logging through log"""
+    args = build_parser().parse_args(job.report_argv(datetime.now()))
+    args.username, args.password = username, password
+    directory = os.path.dirname(args.out)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    log(f"{job.name}: running {job.report_type} report into {args.out}")
+    run_report(args, log=lambda message: log(f"{job.name}: {message}"))
+
+def run_schedule(args):
+    """Run the scheduled jobs of config.json, returning the process exit code"""
+    log = timestamped_log(args.quiet)
+    jobs = load_scheduled_jobs()
+    if not jobs:
+        raise ValueError("No scheduled jobs: add them to schedule.jobs in config.json")
+    username, password = credentials(args)
+
+    def run_job(job):
+        run_scheduled_job(job, username, password, log)
+
+    if args.once:
+        failed = 0
+        for job in jobs:
+            try:
+                run_job(job)
+            except Exception as e:
+                failed += 1
+                print(f"Error: {job.name}: {e}", file=sys.stderr)
+        return 1 if failed else 0
+
+    # The token manager is shared by every run, so scheduled jobs log in once and reuse the token
+    scheduler = ReportScheduler(jobs, run_job, log).start()
+    for job in jobs:
+        log(f"Scheduled {job.name} ({job.schedule}), first run at {job.next_run:%Y-%m-%d %H:%M}")
+    try:
+        while True:
+            time.sleep(1)
+    finally:
+        scheduler.stop()
+
+COMMANDS = {
+    "report": run_report,
+    "schedule": run_schedule
+}
+
+def run_cli(argv):
+    """Parse argv and run the requested headless command, returning the exit code"""
+    args = build_parser().parse_args(argv)
+    try:
+        return COMMANDS[args.command](args)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,557 @@
+"""Typed, vectorized report data built on pandas
+
+Each API page (list-of-lists or list-of-dicts) is normalized once into a typed DataFrame using
+the Fields list sent in the payload, so display, export and aggregation work on columns
+instead of inspecting every record. Imported by the GUI and by headless commands that need it;
+plain CSV/JSON exports from the command line never load pandas.
+"""
+import os
+import sys
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from reporting import (
+    CONFIG, DEFAULT_PAGE_SIZE, SUMMARY_FIELDS, TRANSACTION_FIELDS, MEMBER_VIEW_FIELDS, CSVReportWriter,
+    JSONReportWriter, JSONLinesReportWriter, ParquetReportWriter, ArrowIPCReportWriter
+)
+
+# pandas dtypes for known report fields; other fields are kept as-is
+INTEGER_FIELDS = {"MemberSalesHeaderRecid", "MemberNo", "CurrentStamps", "CardsFilled", "RewardsEarned",
+                  "SaleStampsEarned", "PreviousCurrentStamps", "PreviousCardsFilled", "PreviousRewardsEarned"}
+DECIMAL_FIELDS = {"Amount"}
+DATETIME_FIELDS = {"TxnDate"}
+# Nullable integer dtypes narrower than Int64, with the range each holds
+COMPACT_INTEGER_DTYPES = [(np.iinfo(np.int8), "Int8"), (np.iinfo(np.int16), "Int16"), (np.iinfo(np.int32), "Int32")]
+# Fields with a handful of distinct values, stored dictionary-encoded: one small integer code per row
+CATEGORY_FIELDS = {"StoreName", "Change"}
+
+def normalize_page(records, fields):
+    """Convert one page of API records into a DataFrame with typed columns in field order
+
+    Records are transposed into one value sequence per field and each column is built with its
+    dtype directly, rather than inferring an object frame first and converting it afterwards.
+    """
+    if not records:
+        return normalize_frame(pd.DataFrame({field: pd.Series(dtype="object") for field in fields}))
+    if isinstance(records[0], dict):
+        columns = [[record.get(field) for record in records] for field in fields]
+    else:
+        columns = list(zip(*records))[:len(fields)]
+        columns += [(None,) * len(records)] * (len(fields) - len(columns))
+    return pd.DataFrame({field: typed_column(field, values) for field, values in zip(fields, columns)})
+
+def typed_column(field, values):
+    """Build one column from raw API values with the field's dtype (invalid values become missing)"""
+    if field in INTEGER_FIELDS:
+        try:
+            column = pd.array(values, dtype="Int64")
+        except (TypeError, ValueError):
+            column = pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce").astype("Int64")
+        return compact_integers(column)
+    if field in CATEGORY_FIELDS:
+        return category_column(values)
+    if field in DECIMAL_FIELDS:
+        return pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce").astype("float64")
+    if field in DATETIME_FIELDS:
+        return pd.to_datetime(pd.Series(values, dtype="object"), errors="coerce")
+    return pd.Series(values)
+
+def normalize_frame(frame):
+    """Coerce known report columns to their typed dtypes (invalid values become missing)"""
+    for field in frame.columns:
+        if field in INTEGER_FIELDS:
+            frame[field] = compact_integers(pd.to_numeric(frame[field], errors="coerce").astype("Int64"))
+        elif field in CATEGORY_FIELDS:
+            frame[field] = category_column(frame[field].tolist())
+        elif field in DECIMAL_FIELDS:
+            frame[field] = pd.to_numeric(frame[field], errors="coerce").astype("float64")
+        elif field in DATETIME_FIELDS:
+            frame[field] = pd.to_datetime(frame[field], errors="coerce")
+    return frame
+
+def category_column(values):
+    """Dictionary-encode string values: sorted categories plus one small integer code per row
+
+    Looking codes up in a dict is about twice as fast as pd.Categorical's factorization of a
+    page of Python strings; anything other than strings and None goes through pd.Categorical.
+    """
+    try:
+        categories = sorted({value for value in values if value is not None})
+    except TypeError:
+        return pd.Categorical(values)
+    codes = dict(zip(categories, range(len(categories))))
+    codes[None] = -1
+    return pd.Categorical.from_codes(np.fromiter(map(codes.__getitem__, values), dtype=np.int32, count=len(values)),
+                                     categories=pd.Index(categories, dtype="str"))
+
+def compact_integers(column):
+    """Store integers in the smallest nullable dtype that holds them (Int8 up to Int64)
+
+    Sums and group-by sums still return Int64, so narrow storage cannot overflow a total.
+    """
+    low, high = column.min(), column.max()
+    if low is pd.NA:
+        return column.astype("Int8")
+    for limits, dtype in COMPACT_INTEGER_DTYPES:
+        if limits.min <= low and high <= limits.max:
+            return column.astype(dtype)
+    return column
+
+def concat_frames(frames):
+    """pd.concat that keeps dictionary-encoded columns encoded
+
+    pd.concat only keeps a categorical column when every page has the same categories; otherwise
+    it falls back to plain strings, so that column is rebuilt with union_categoricals.
+    """
+    combined = pd.concat(frames, ignore_index=True)
+    for field in combined.columns:
+        if (isinstance(frames[0][field].dtype, pd.CategoricalDtype)
+                and not isinstance(combined[field].dtype, pd.CategoricalDtype)):
+            combined[field] = union_categoricals([frame[field] for frame in frames], sort_categories=True)
+    return combined
+
+def column_arrays(frame):
+    return [frame[field].array for field in frame.columns]
+
+def column_memory(array):
+    """Bytes held by one column array, including the strings of an object column"""
+    if array.dtype == object:
+        return array.nbytes + sum(sys.getsizeof(value) for value in array)
+    return array.nbytes
+
+def empty_frame(fields):
+    """Return an empty typed DataFrame with the given columns"""
+    return normalize_page([], fields)
+
+class ColumnStore:
+    """Typed columnar store for fetched report pages
+
+    Pages are normalized into DataFrame chunks as they arrive. The worker thread appends while
+    the GUI reads visible rows, so chunks are appended before their offsets and row_count is
+    updated last; readers never see a row before it is complete. Columns are compact: integers
+    in the narrowest dtype that fits, StoreName dictionary-encoded and TxnDate as datetime64.
+    """
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.parts = ([], [], [])  # (chunks, their column arrays, starting row of each chunk)
+        self.row_count = 0
+        self.nbytes = 0
+        self.cached_frame = None
+        self.sort_indexes = {}
+        self.index_lock = threading.Lock()
+
+    def __len__(self):
+        return self.row_count
+
+    def append_records(self, records):
+        """Normalize and append a page of records (all dicts or all lists)"""
+        if records:
+            self.append_frame(normalize_page(records, self.fields))
+
+    def append_frame(self, frame):
+        """Append an already-normalized page"""
+        if frame.empty:
+            return
+        chunks, columns, offsets = self.parts
+        frame = frame.reset_index(drop=True)
+        arrays = column_arrays(frame)
+        chunks.append(frame)
+        columns.append(arrays)
+        offsets.append(self.row_count)
+        self.cached_frame = None
+        self.sort_indexes = {}
+        self.nbytes += sum(map(column_memory, arrays))
+        self.row_count += len(frame)
+
+    def row(self, index):
+        """Return the values of one row in field order"""
+        _, columns, offsets = self.parts
+        chunk_index = bisect_right(offsets, index) - 1
+        # Indexing the column arrays directly is several times faster than building an iloc row
+        position = index - offsets[chunk_index]
+        return [array[position] for array in columns[chunk_index]]
+
+    def frame(self):
+        """Return all rows as a single DataFrame (concatenated once and cached)"""
+        if self.cached_frame is None:
+            chunks = self.parts[0]
+            self.cached_frame = concat_frames(chunks) if chunks else empty_frame(self.fields)
+        return self.cached_frame
+
+    def consolidate(self):
+        """Merge the page chunks into one DataFrame for faster access once fetching is done"""
+        frame = self.frame()
+        arrays = column_arrays(frame)
+        self.parts = ([frame], [arrays], [0]) if len(frame) else ([], [], [])
+        self.nbytes = sum(map(column_memory, arrays))
+
+    def memory_usage(self):
+        """Bytes held by the stored rows"""
+        return self.nbytes
+
+    def sort_index(self, field):
+        """Return the SortIndex of a field, building it on first use (meant for finished reports)"""
+        with self.index_lock:
+            index = self.sort_indexes.get(field)
+            if index is None:
+                index = SortIndex(self.frame()[field])
+                self.sort_indexes[field] = index
+            return index
+
+    def index_memory_usage(self):
+        """Bytes held by the sort indexes built so far"""
+        return sum(index.nbytes for index in list(self.sort_indexes.values()))
+
+    @classmethod
+    def from_frame(cls, frame):
+        store = cls(frame.columns)
+        store.append_frame(frame)
+        return store
+
+# --- Sort and Search ---
+class SortIndex:
+    """Ascending row order of one column, for instant re-sorting and lookups without a refetch
+
+    The column is factorized into sorted distinct values, so the stable row order (missing
+    values last) holds each value's rows as one contiguous block; bounds marks where each block
+    starts. Looking a value up in the distinct values is a hash lookup, after which its rows are
+    a slice of the order. Costs 4 bytes per row plus the distinct values and their bounds.
+    """
+
+    def __init__(self, column):
+        codes, uniques = pd.factorize(column, sort=True)
+        missing = int((codes < 0).sum())
+        dtype = np.int32 if len(codes) < 2 ** 31 else np.int64
+        order = np.argsort(codes, kind="stable").astype(dtype)
+        # Missing values sort first as code -1; move them to the end
+        self.order = np.concatenate([order[missing:], order[:missing]])
+        self.values = pd.Index(uniques)
+        self.numeric = pd.api.types.is_numeric_dtype(self.values.dtype)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.bounds = np.concatenate([[0], np.cumsum(counts)]).astype(dtype)
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes + self.bounds.nbytes + self.values.memory_usage()
+
+    def positions(self, ascending=True):
+        """Row positions sorted by the column; ties keep their row order and missing values come last"""
+        if ascending:
+            return self.order
+        # Reverse the order of the value blocks, but not the rows within each block
+        lengths = np.diff(self.bounds)[::-1]
+        starts = self.bounds[-2::-1]
+        valid = int(self.bounds[-1])
+        blocks = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(valid)
+        return np.concatenate([self.order[blocks], self.order[valid:]])
+
+    def rows_of(self, codes):
+        """Row positions holding any of the given value codes"""
+        return np.concatenate([self.order[self.bounds[code]:self.bounds[code + 1]] for code in codes]
+                              or [self.order[:0]])
+
+    def find(self, text):
+        """Row positions matching a search: the exact number for numeric columns, else a text prefix
+
+        Text matches ignore case. Raises ValueError for a non-numeric search of a numeric column.
+        """
+        text = str(text).strip()
+        if self.numeric:
+            try:
+                value = float(text)
+            except ValueError:
+                raise ValueError(f"Not a number: {text}") from None
+            code = self.values.get_indexer([int(value) if value.is_integer() else value])[0]
+            return self.rows_of([code] if code >= 0 else [])
+        prefix = text.casefold()
+        return self.rows_of([code for code, value in enumerate(self.values) if str(value).casefold().startswith(prefix)])
+
+class RowSelection:
+    """Rows of a ColumnStore in a given order (a sort or search result), read like the store itself"""
+
+    def __init__(self, store, positions):
+        self.store = store
+        self.fields = store.fields
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def row(self, index):
+        return self.store.row(int(self.positions[index]))
+
+    def frame(self):
+        return self.store.frame().take(self.positions).reset_index(drop=True)
+
+def select_rows(store, order_by=None, ascending=True, search_field=None, search_text=""):
+    """Sort a store's rows and/or narrow them to a search, without touching the stored rows
+
+    Returns a RowSelection, or the store itself when there is nothing to do. Search matches are
+    listed in the chosen sort order, otherwise in the store's own order.
+    """
+    positions = store.sort_index(order_by).positions(ascending) if order_by else None
+    if search_field and search_text:
+        # Flagging the matches and walking the rows in order is linear, however many rows match
+        matched = np.zeros(len(store), dtype=bool)
+        matched[store.sort_index(search_field).find(search_text)] = True
+        positions = np.flatnonzero(matched) if positions is None else positions[matched[positions]]
+    return store if positions is None else RowSelection(store, positions)
+
+# --- Aggregation ---
+# Group-by choices for transaction rollups: name -> output key column
+AGGREGATION_KEYS = {
+    "store": "StoreName",
+    "member": "MemberNo",
+    "day": "Day",
+    "week": "Week",
+    "month": "Month"
+}
+AGGREGATION_METRICS = ["Transactions", "SaleStampsEarned", "RewardsEarned", "Amount"]
+
+def transaction_group_keys(frame, group_by):
+    """Return the grouping Series for a rollup (weeks start on Monday)"""
+    if group_by not in AGGREGATION_KEYS:
+        raise ValueError(f"Unknown aggregation: {group_by}. Choose one of: {', '.join(AGGREGATION_KEYS)}")
+    key_name = AGGREGATION_KEYS[group_by]
+    if group_by in ("store", "member"):
+        keys = frame[key_name]
+    else:
+        dates = frame["TxnDate"].dt.floor("D")
+        if group_by == "week":
+            keys = dates - pd.to_timedelta(dates.dt.dayofweek, unit="D")
+        elif group_by == "month":
+            keys = dates.dt.to_period("M").dt.to_timestamp()
+        else:
+            keys = dates
+    return keys.rename(key_name)
+
+def aggregate_transactions(frame, group_by):
+    """Roll up transactions into counts and sums of stamps, rewards and Amount per group
+
+    Uses one vectorized groupby; every metric is a count or a sum, so partial results from
+    separate pages can be combined with combine_aggregates.
+    """
+    keys = transaction_group_keys(frame, group_by)
+    grouped = frame.groupby(keys, dropna=False, sort=True, observed=True).agg(
+        Transactions=("MemberSalesHeaderRecid", "size"),
+        SaleStampsEarned=("SaleStampsEarned", "sum"),
+        RewardsEarned=("RewardsEarned", "sum"),
+        Amount=("Amount", "sum")
+    )
+    return grouped
+
+def combine_aggregates(parts):
+    """Merge partial rollups (indexed by group key) into one"""
+    if len(parts) == 1:
+        return parts[0]
+    combined = pd.concat(parts)
+    return combined.groupby(level=0, dropna=False, sort=True, observed=True).sum()
+
+def finish_aggregate(grouped):
+    """Turn a rollup into a flat typed frame with the group key as the first column"""
+    result = grouped.reset_index()
+    result["Transactions"] = result["Transactions"].astype("Int64")
+    result["SaleStampsEarned"] = result["SaleStampsEarned"].astype("Int64")
+    result["RewardsEarned"] = result["RewardsEarned"].astype("Int64")
+    result["Amount"] = result["Amount"].round(2)
+    return result
+
+class TransactionAggregator:
+    """Incrementally aggregate transaction pages without keeping the pages themselves
+
+    Partial rollups are merged every COMBINE_EVERY pages, so memory is bounded by the number of
+    groups rather than the number of transactions.
+    """
+
+    COMBINE_EVERY = 50
+
+    def __init__(self, group_by):
+        if group_by not in AGGREGATION_KEYS:
+            raise ValueError(f"Unknown aggregation: {group_by}. Choose one of: {', '.join(AGGREGATION_KEYS)}")
+        self.group_by = group_by
+        self.parts = []
+        self.transactions = 0
+
+    def add_frame(self, frame):
+        if frame.empty:
+            return
+        self.parts.append(aggregate_transactions(frame, self.group_by))
+        self.transactions += len(frame)
+        if len(self.parts) >= self.COMBINE_EVERY:
+            self.parts = [combine_aggregates(self.parts)]
+
+    def add_records(self, records, fields):
+        if records:
+            self.add_frame(normalize_page(records, fields))
+
+    def result(self):
+        """Return the combined rollup as a flat frame"""
+        if not self.parts:
+            return pd.DataFrame(columns=[AGGREGATION_KEYS[self.group_by]] + AGGREGATION_METRICS)
+        return finish_aggregate(combine_aggregates(self.parts))
+
+# --- Member View ---
+class MemberActivity:
+    """Per-member transaction count, total Amount and last TxnDate, accumulated page by page
+
+    Each page is reduced with a hash group-by on MemberNo and the partial results are merged
+    every COMBINE_EVERY pages, so the work is linear in the number of transactions and memory
+    is bounded by the number of members.
+    """
+
+    COMBINE_EVERY = 50
+
+    def __init__(self):
+        self.parts = []
+        self.transactions = 0
+
+    @staticmethod
+    def combine(parts):
+        if len(parts) == 1:
+            return parts[0]
+        grouped = pd.concat(parts).groupby(level=0, sort=False)
+        return pd.DataFrame({
+            "Transactions": grouped["Transactions"].sum(),
+            "TotalAmount": grouped["TotalAmount"].sum(),
+            "LastTxnDate": grouped["LastTxnDate"].max()
+        })
+
+    def add_frame(self, frame):
+        if frame.empty:
+            return
+        # Separate per-column reductions run on pandas' fast paths (a named agg() is several times slower)
+        grouped = frame.groupby("MemberNo", sort=False)
+        self.parts.append(pd.DataFrame({
+            "Transactions": grouped.size(),
+            "TotalAmount": grouped["Amount"].sum(),
+            "LastTxnDate": grouped["TxnDate"].max()
+        }))
+        self.transactions += len(frame)
+        if len(self.parts) >= self.COMBINE_EVERY:
+            self.parts = [self.combine(self.parts)]
+
+    def add_records(self, records):
+        if records:
+            self.add_frame(normalize_page(records, TRANSACTION_FIELDS))
+
+    def result(self):
+        """Return the activity indexed by MemberNo"""
+        if not self.parts:
+            return pd.DataFrame({"Transactions": pd.Series(dtype="Int64"), "TotalAmount": pd.Series(dtype="float64"),
+                                 "LastTxnDate": pd.Series(dtype="datetime64[ns]")},
+                                index=pd.Index([], dtype="Int64", name="MemberNo"))
+        return self.combine(self.parts)
+
+def join_member_view(summary, activity):
+    """Left-join per-member activity onto the summary rows on MemberNo
+
+    A hash join on the activity index, so it is linear in the number of members; members
+    without transactions get 0 transactions, a 0 total and no LastTxnDate.
+    """
+    view = summary.merge(activity, how="left", left_on="MemberNo", right_index=True, sort=False)
+    view["Transactions"] = view["Transactions"].fillna(0).astype("Int64")
+    view["TotalAmount"] = view["TotalAmount"].fillna(0).astype("float64").round(2)
+    return view[MEMBER_VIEW_FIELDS].reset_index(drop=True)
+
+def build_member_view(summary_pages, transaction_pages, order_by="MemberNo", order_direction="desc", limit=None,
+                      metrics=None):
+    """Consume summary and transaction pages at the same time and return the sorted member view
+
+    Transactions are aggregated on the calling thread while the summary is collected on a
+    second thread; if either side fails, the other stops at its next page.
+    """
+    stop = threading.Event()
+
+    def stage(name):
+        return metrics.stage(name) if metrics else nullcontext()
+
+    def collect_summary():
+        frames = []
+        try:
+            for page in summary_pages:
+                if stop.is_set():
+                    break
+                with stage("normalize"):
+                    frames.append(normalize_page(page, SUMMARY_FIELDS))
+        finally:
+            if hasattr(summary_pages, "close"):
+                summary_pages.close()
+        return pd.concat(frames, ignore_index=True) if frames else empty_frame(SUMMARY_FIELDS)
+
+    activity = MemberActivity()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        summary_future = executor.submit(collect_summary)
+        try:
+            for page in transaction_pages:
+                if summary_future.done() and summary_future.exception():
+                    break
+                with stage("aggregate"):
+                    activity.add_records(page)
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            if hasattr(transaction_pages, "close"):
+                transaction_pages.close()
+        summary = summary_future.result()
+
+    with stage("join"):
+        view = join_member_view(summary, activity.result())
+        if order_by:
+            view = view.sort_values(order_by, ascending=str(order_direction).lower() == "asc",
+                                    kind="stable", na_position="last", ignore_index=True)
+        if limit:
+            view = view.head(limit)
+    return view
+
+# --- Frame Exports ---
+FRAME_WRITERS = {
+    "csv": CSVReportWriter,
+    "json": JSONReportWriter,
+    "jsonl": JSONLinesReportWriter,
+    "parquet": ParquetReportWriter,
+    "arrow": ArrowIPCReportWriter
+}
+
+# Extensions that select a sibling format from the same export button (e.g. JSON -> JSON Lines)
+FORMAT_VARIANTS = {
+    ("json", ".jsonl"): "jsonl",
+    ("parquet", ".arrow"): "arrow",
+    ("parquet", ".feather"): "arrow"
+}
+
+# Export format implied by a file extension when no export button chose one
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow"
+}
+
+def export_frame(frame, filename, report_type, export_format=None):
+    """Export a typed frame in page-sized slices through the streaming writer for export_format
+
+    Without an explicit export_format the format follows the file extension.
+    """
+    if frame is None or frame.empty:
+        raise ValueError("No records to export")
+    extension = os.path.splitext(filename)[1].lower()
+    if export_format is None:
+        if extension not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Unsupported export format: {extension or filename}")
+        export_format = FORMAT_EXTENSIONS[extension]
+    export_format = FORMAT_VARIANTS.get((export_format, extension), export_format)
+    page_size = CONFIG["reports"].get("page_size", DEFAULT_PAGE_SIZE)
+    with FRAME_WRITERS[export_format](filename, report_type, list(frame.columns)) as writer:
+        for offset in range(0, len(frame), page_size):
+            writer.write_frame(frame.iloc[offset:offset + page_size])
+    return writer.total_records
@@ -0,0 +1,1377 @@
+import customtkinter as ctk
+import os
+import threading
+import queue
+import time
+import tkinter as tk
+import tkinter.font as tkfont
+from datetime import datetime
+from tkinter import filedialog, messagebox
+
+from reporting import (
+    CONFIG, BASE_URL, DEFAULT_PAGE_SIZE, DEFAULT_MAX_WORKERS, SUMMARY_FIELDS, REPORT_FETCHERS,
+    DEFAULT_ORDER_FIELDS, get_token_manager, filter_conditions, member_view_pages,
+    resumable_report_pages, sharded_report_pages, report_fields, stream_report_to_file,
+    ReportCache, refresh_transactions_cache, refresh_summary_cache, SummaryDiff, SUMMARY_DIFF_FIELDS,
+    CancellableSession, ReportCancelled, RunMetrics, measured_pages, write_metrics
+)
+from scheduler import ReportScheduler, load_scheduled_jobs
+from cli import run_scheduled_job
+# frames (and with it pandas) is imported on first use, so it adds nothing to startup time
+
+# --- Theme Setup ---
+ctk.set_appearance_mode("Dark")
+ctk.set_default_color_theme("dark-blue")
+
+# --- GUI App ---
+# (field, column title, column width in characters) shown in the results table
+DISPLAY_COLUMNS = {
+    "summary": [
+        ("MemberNo", "Member#", 10),
+        ("CurrentStamps", "Stamps", 8),
+        ("CardsFilled", "Filled", 7),
+        ("RewardsEarned", "Rewards", 8)
+    ],
+    "transactions": [
+        ("MemberSalesHeaderRecid", "TxnID", 12),
+        ("MemberNo", "Member#", 10),
+        ("SaleStampsEarned", "Stamps", 7),
+        ("RewardsEarned", "Rewards", 8),
+        ("StoreName", "Store", 15),
+        ("Amount", "Amount", 10),
+        ("TxnDate", "Date", 11)
+    ],
+    "members": [
+        ("MemberNo", "Member#", 10),
+        ("CurrentStamps", "Stamps", 8),
+        ("CardsFilled", "Filled", 7),
+        ("RewardsEarned", "Rewards", 8),
+        ("LastTxnDate", "Last Txn", 11),
+        ("Transactions", "Txns", 7),
+        ("TotalAmount", "Total", 12)
+    ],
+    "summary_changes": [
+        ("Change", "Change", 9),
+        ("MemberNo", "Member#", 10),
+        ("CurrentStamps", "Stamps", 8),
+        ("CardsFilled", "Filled", 7),
+        ("RewardsEarned", "Rewards", 8),
+        ("PreviousCurrentStamps", "Was Stamps", 11),
+        ("PreviousCardsFilled", "Was Filled", 11),
+        ("PreviousRewardsEarned", "Was Rewards", 12)
+    ]
+}
+AGGREGATE_KEY_COLUMNS = {
+    "store": ("StoreName", "Store", 20),
+    "member": ("MemberNo", "Member#", 10),
+    "day": ("Day", "Day", 11),
+    "week": ("Week", "Week Of", 11),
+    "month": ("Month", "Month", 8)
+}
+# Fields the Find box searches: numbers match exactly, text by prefix
+SEARCH_FIELDS = ["MemberNo", "StoreName"]
+
+def aggregate_display_columns(group_by):
+    """Results table columns for a transactions rollup"""
+    return [
+        AGGREGATE_KEY_COLUMNS[group_by],
+        ("Transactions", "Txns", 9),
+        ("SaleStampsEarned", "Stamps", 9),
+        ("RewardsEarned", "Rewards", 9),
+        ("Amount", "Amount", 14)
+    ]
+
+class EmptyStore:
+    """Row source of a table that shows no rows, so an empty table needs no ColumnStore (or pandas)"""
+    fields = []
+
+    def __len__(self):
+        return 0
+
+class VirtualTable(ctk.CTkFrame):
+    """Scrollable results grid that only renders the rows currently in view
+
+    Rows are read from a typed ColumnStore and the canvas keeps one text item per visible line,
+    rewriting them on scroll, so scrolling cost does not depend on the size of the report.
+    set_columns, refresh and show_message may be called from any thread: they queue work that is
+    applied in batches on the Tk main loop.
+    """
+
+    POLL_INTERVAL_MS = 100
+
+    def __init__(self, master, width=800, height=300, fg_color="#0D1117", text_color="#E6EDF3",
+                 font=("Consolas", 10), **kwargs):
+        super().__init__(master, fg_color=fg_color, **kwargs)
+        self.text_color = text_color
+        self.font = tkfont.Font(family=font[0], size=font[1])
+        self.header_font = tkfont.Font(family=font[0], size=font[1], weight="bold")
+        self.row_height = self.font.metrics("linespace") + 2
+        self.header_height = self.row_height + 6
+
+        self.columns = []
+        self.column_indexes = []
+        self.store = EmptyStore()
+        self.message = ""
+        self.first_row = 0
+        self.row_items = []
+        self.pending = queue.SimpleQueue()
+        self.metrics = None  # RunMetrics of the displayed report, which records redraw time as "display"
+
+        self.canvas = tk.Canvas(self, width=width, height=height, bg=fg_color, highlightthickness=0)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y", pady=4)
+        self.canvas.pack(side="left", fill="both", expand=True, padx=(6, 0), pady=4)
+
+        self.header_item = self.canvas.create_text(0, 0, anchor="nw", font=self.header_font, fill=text_color)
+        self.rule_item = self.canvas.create_line(0, 0, 0, 0, fill="#30363D")
+        self.message_item = self.canvas.create_text(0, 0, anchor="nw", font=self.font, fill=text_color)
+
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(sequence, self.on_mouse_wheel)
+        self.after(self.POLL_INTERVAL_MS, self.apply_pending)
+
+    # -- Thread-safe API --
+    def set_columns(self, columns, store):
+        """Show the given (field, title, width) columns of a ColumnStore, replacing the current view"""
+        self.pending.put(("columns", (list(columns), store)))
+
+    def refresh(self):
+        """Queue a redraw, e.g. after rows were appended to the displayed store"""
+        self.pending.put(("refresh", None))
+
+    def show_message(self, message):
+        """Clear the table and show a message instead of rows"""
+        self.pending.put(("message", message))
+
+    # -- Main-thread rendering --
+    def apply_pending(self):
+        """Apply queued updates in one batch and redraw once"""
+        changed = False
+        try:
+            while True:
+                action, value = self.pending.get_nowait()
+                changed = True
+                if action == "columns":
+                    self.columns, self.store = value
+                    self.column_indexes = [self.store.fields.index(field) for field, _, _ in self.columns]
+                    self.message = ""
+                    self.first_row = 0
+                elif action == "message":
+                    self.columns = []
+                    self.column_indexes = []
+                    self.store = EmptyStore()
+                    self.message = value
+                    self.first_row = 0
+        except queue.Empty:
+            pass
+        if changed:
+            self.redraw()
+        self.after(self.POLL_INTERVAL_MS, self.apply_pending)
+
+    def visible_row_count(self):
+        return max((self.canvas.winfo_height() - self.header_height) // self.row_height, 1)
+
+    @staticmethod
+    def format_cell(value):
+        # Values come from a ColumnStore, so pandas is already loaded by the time a row is shown
+        import pandas as pd
+        if value is None or pd.isna(value):
+            return "N/A"
+        if isinstance(value, float):
+            return f"{value:.2f}"
+        return str(value)
+
+    def format_row(self, values):
+        return " ".join(f"{self.format_cell(values[index])[:width - 1]:<{width}}"
+                        for index, (_, _, width) in zip(self.column_indexes, self.columns))
+
+    def redraw(self):
+        """Render the header and the rows in the current viewport"""
+        started = time.perf_counter()
+        total = len(self.store)
+        visible = self.visible_row_count()
+        self.first_row = max(0, min(self.first_row, total - visible))
+
+        self.canvas.itemconfigure(self.message_item, text=self.message)
+        self.canvas.coords(self.message_item, 0, 0)
+        header = " ".join(f"{title:<{width}}" for _, title, width in self.columns)
+        self.canvas.itemconfigure(self.header_item, text=header)
+        rule_y = self.row_height + 2
+        self.canvas.coords(self.rule_item, 0, rule_y, self.canvas.winfo_width() if self.columns else 0, rule_y)
+
+        # Grow the pool of line items to fit the viewport; it never holds more than one screenful
+        while len(self.row_items) < visible:
+            self.row_items.append(self.canvas.create_text(0, 0, anchor="nw", font=self.font, fill=self.text_color))
+
+        for slot, item in enumerate(self.row_items):
+            index = self.first_row + slot
+            if slot < visible and index < total:
+                self.canvas.itemconfigure(item, text=self.format_row(self.store.row(index)))
+                self.canvas.coords(item, 0, self.header_height + slot * self.row_height)
+            else:
+                self.canvas.itemconfigure(item, text="")
+
+        if total > visible:
+            self.scrollbar.set(self.first_row / total, (self.first_row + visible) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        if self.metrics is not None:
+            self.metrics.add("display", time.perf_counter() - started)
+
+    def yview(self, action, value, unit=None):
+        """Scrollbar callback accepting Tk's ('moveto', fraction) and ('scroll', n, unit) forms"""
+        visible = self.visible_row_count()
+        if action == "moveto":
+            self.first_row = int(float(value) * len(self.store))
+        elif action == "scroll":
+            step = visible if unit == "pages" else 1
+            self.first_row += int(value) * step
+        self.redraw()
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.yview("scroll", -3, "units")
+        else:
+            self.yview("scroll", 3, "units")
+
+class ReportJob:
+    """One report run: its inputs, progress and result, plus a session that cancel() shuts down
+
+    Written by the job's worker thread and read by the main loop; the Tk widgets of its row in
+    the jobs panel are only touched on the main thread.
+    """
+
+    def __init__(self, job_id, inputs, stream_filename=None):
+        self.job_id = job_id
+        self.inputs = inputs
+        self.report_type = inputs['report_type']
+        self.stream_filename = stream_filename
+        source = ("diff" if inputs['diff'] else "cache" if inputs['use_cache'] else "shards" if inputs['sharded']
+                  else "api")
+        self.metrics = RunMetrics(self.report_type, source=source, limit=inputs['limit'],
+                                  aggregate=inputs['aggregate'], filters=len(inputs['filters']))
+        self.session = CancellableSession(metrics=self.metrics)
+        self.thread = None
+        self.state = "running"
+        self.status = "Starting..."
+        self.progress = 0.0
+        self.store = None
+        self.columns = []
+        self.result_type = self.report_type
+        self.message = ""
+        self.row = None
+        # Client-side view of the finished result: (field, ascending) sort, (field, text) search and
+        # the RowSelection they give (None shows the rows as fetched)
+        self.view_order = None
+        self.search = None
+        self.view = None
+        self.view_version = 0
+
+    @property
+    def name(self):
+        return f"#{self.job_id} {self.report_type}"
+
+    @property
+    def running(self):
+        return self.state == "running"
+
+    @property
+    def cancel_requested(self):
+        return self.session.cancelled.is_set()
+
+    def cancel(self):
+        """Stop the job's outstanding requests; the worker then raises ReportCancelled"""
+        self.status = "Cancelling..."
+        self.session.cancel()
+
+    def watch(self, pages):
+        """Pass pages through, stopping at the next page once the job is cancelled"""
+        try:
+            for page in pages:
+                self.session.check_cancelled()
+                yield page
+        finally:
+            if hasattr(pages, "close"):
+                pages.close()
+
+    def finish(self, state, status):
+        self.state = state
+        self.status = status
+
+class StampReportingApp(ctk.CTk):
+    # Queued UI events are applied at most once per frame (~20 fps)
+    FRAME_INTERVAL_MS = 50
+    # Finished jobs kept in the jobs panel
+    MAX_FINISHED_JOBS = 5
+
+    def __init__(self):
+        super().__init__()
+        self.title(CONFIG["ui"]["window_title"])
+        self.geometry(f"{CONFIG['ui']['default_width']}x{CONFIG['ui']['default_height']}")
+        self.configure(fg_color="#1E1E1E")
+        self.resizable(True, True)
+        self.minsize(700, 600)
+
+        self.token = None
+        self.current_report_data = None
+        self.current_report_type = None
+        self.ui_events = queue.SimpleQueue()
+        self.jobs = {}
+        self.next_job_id = 1
+        self.shown_job = None
+        self.scheduler = None
+        # Scheduled exports log in with the credentials of the last generated report
+        self.schedule_credentials = (os.environ.get("REDCAT_USERNAME"), os.environ.get("REDCAT_PASSWORD"))
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Create main scrollable container
+        main_container = ctk.CTkScrollableFrame(self, fg_color="#1E1E1E")
+        main_container.pack(expand=True, padx=10, pady=10, fill="both")
+        
+        # Main content frame
+        frame = ctk.CTkFrame(main_container, fg_color="#1E1E1E")
+        frame.pack(expand=True, padx=10, pady=10, fill="both")
+
+        # -- Configuration Info --
+        config_frame = ctk.CTkFrame(frame, fg_color="#404040", corner_radius=10)
+        config_frame.pack(pady=(10, 15), padx=20, fill="x")
+        
+        config_title = ctk.CTkLabel(config_frame, text="⚙️ Configuration", font=("Arial", 12, "bold"))
+        config_title.pack(pady=(8, 5))
+        
+        config_info = ctk.CTkLabel(config_frame, 
+            text=f"API: {BASE_URL}\nDefault Limit: {CONFIG['reports']['default_limit']} records | "
+                 f"Page Size: {CONFIG['reports'].get('page_size', DEFAULT_PAGE_SIZE)} records | "
+                 f"Parallel Requests: {CONFIG['reports'].get('max_workers', DEFAULT_MAX_WORKERS)}", 
+            font=("Arial", 10), justify="left", text_color="#CCCCCC")
+        config_info.pack(pady=(0, 8))
+
+        # -- Credentials Section --
+        creds_frame = ctk.CTkFrame(frame, fg_color="#2B2B2B", corner_radius=10)
+        creds_frame.pack(pady=10, padx=20, fill="x")
+        
+        creds_title = ctk.CTkLabel(creds_frame, text="🔐 Authentication", font=("Arial", 14, "bold"))
+        creds_title.pack(pady=(10, 5))
+        
+        self.username_entry = ctk.CTkEntry(creds_frame, placeholder_text="API Username", width=300, height=35)
+        self.username_entry.pack(pady=5)
+        
+        self.password_entry = ctk.CTkEntry(creds_frame, placeholder_text="Password", show="*", width=300, height=35)
+        self.password_entry.pack(pady=(5, 15))
+
+        # -- Report Selection Section --
+        report_frame = ctk.CTkFrame(frame, fg_color="#2B2B2B", corner_radius=10)
+        report_frame.pack(pady=10, padx=20, fill="x")
+        
+        report_title = ctk.CTkLabel(report_frame, text="📊 Report Selection", font=("Arial", 14, "bold"))
+        report_title.pack(pady=(10, 5))
+
+        # Report type selection
+        self.report_type_var = ctk.StringVar(value="summary")
+        
+        report_type_frame = ctk.CTkFrame(report_frame, fg_color="transparent")
+        report_type_frame.pack(pady=10, fill="x")
+        
+        self.summary_radio = ctk.CTkRadioButton(
+            report_type_frame, 
+            text="📋 Stampcard Summary", 
+            variable=self.report_type_var, 
+            value="summary",
+            font=("Arial", 12)
+        )
+        self.summary_radio.pack(side="left", padx=(20, 40))
+        
+        self.transactions_radio = ctk.CTkRadioButton(
+            report_type_frame, 
+            text="💳 Stampcard Transactions", 
+            variable=self.report_type_var, 
+            value="transactions",
+            font=("Arial", 12)
+        )
+        self.transactions_radio.pack(side="left", padx=(0, 40))
+        
+        self.members_radio = ctk.CTkRadioButton(
+            report_type_frame, 
+            text="👥 Member View", 
+            variable=self.report_type_var, 
+            value="members",
+            font=("Arial", 12)
+        )
+        self.members_radio.pack(side="left")
+
+        # Report parameters
+        params_frame = ctk.CTkFrame(report_frame, fg_color="transparent")
+        params_frame.pack(pady=10, fill="x")
+
+        # Limit input
+        limit_frame = ctk.CTkFrame(params_frame, fg_color="transparent")
+        limit_frame.pack(side="left", padx=(20, 20))
+        
+        limit_label = ctk.CTkLabel(limit_frame, text="Record Limit (0 = all):", font=("Arial", 11))
+        limit_label.pack()
+        self.limit_entry = ctk.CTkEntry(limit_frame, placeholder_text="1000", width=100, height=30)
+        self.limit_entry.pack()
+        self.limit_entry.insert(0, str(CONFIG['reports']['default_limit']))
+
+        # Order by selection
+        order_frame = ctk.CTkFrame(params_frame, fg_color="transparent")
+        order_frame.pack(side="left", padx=(20, 20))
+        
+        order_label = ctk.CTkLabel(order_frame, text="Order By:", font=("Arial", 11))
+        order_label.pack()
+        self.order_var = ctk.StringVar(value="MemberNo")
+        self.order_combo = ctk.CTkComboBox(
+            order_frame, 
+            values=SUMMARY_FIELDS,
+            variable=self.order_var,
+            command=self.on_view_change,
+            width=140,
+            height=30
+        )
+        self.order_combo.pack()
+
+        # Order direction
+        direction_frame = ctk.CTkFrame(params_frame, fg_color="transparent")
+        direction_frame.pack(side="left", padx=(20, 20))
+        
+        direction_label = ctk.CTkLabel(direction_frame, text="Direction:", font=("Arial", 11))
+        direction_label.pack()
+        self.direction_var = ctk.StringVar(value="desc")
+        self.direction_combo = ctk.CTkComboBox(
+            direction_frame, 
+            values=["desc", "asc"],
+            variable=self.direction_var,
+            command=self.on_view_change,
+            width=80,
+            height=30
+        )
+        self.direction_combo.pack()
+
+        # Aggregation (transactions only)
+        aggregate_frame = ctk.CTkFrame(params_frame, fg_color="transparent")
+        aggregate_frame.pack(side="left", padx=(20, 20))
+        
+        aggregate_label = ctk.CTkLabel(aggregate_frame, text="Aggregate By:", font=("Arial", 11))
+        aggregate_label.pack()
+        self.aggregate_var = ctk.StringVar(value="none")
+        self.aggregate_combo = ctk.CTkComboBox(
+            aggregate_frame, 
+            values=["none"] + list(AGGREGATE_KEY_COLUMNS),
+            variable=self.aggregate_var,
+            width=100,
+            height=30
+        )
+        self.aggregate_combo.pack()
+
+        # Fetch options
+        options_frame = ctk.CTkFrame(params_frame, fg_color="transparent")
+        options_frame.pack(side="left", padx=(20, 20))
+        
+        # Stream straight to an export file instead of holding the report in memory
+        self.stream_var = ctk.BooleanVar(value=False)
+        self.stream_checkbox = ctk.CTkCheckBox(
+            options_frame,
+            text="💾 Stream to file",
+            variable=self.stream_var,
+            font=("Arial", 11)
+        )
+        self.stream_checkbox.pack(anchor="w", pady=(4, 4))
+        
+        # Serve reports from the local cache, only downloading new transactions
+        self.cache_var = ctk.BooleanVar(value=CONFIG.get("cache", {}).get("enabled", False))
+        self.cache_checkbox = ctk.CTkCheckBox(
+            options_frame,
+            text="🗄️ Use local cache",
+            variable=self.cache_var,
+            font=("Arial", 11)
+        )
+        self.cache_checkbox.pack(anchor="w", pady=(0, 4))
+        
+        # Split full extracts into key ranges fetched by parallel worker processes
+        self.shard_var = ctk.BooleanVar(value=False)
+        self.shard_checkbox = ctk.CTkCheckBox(
+            options_frame,
+            text="⚡ Sharded extract",
+            variable=self.shard_var,
+            font=("Arial", 11)
+        )
+        self.shard_checkbox.pack(anchor="w", pady=(0, 4))
+        
+        # Summary only: show just the members that changed since the cached snapshot
+        self.diff_var = ctk.BooleanVar(value=False)
+        self.diff_checkbox = ctk.CTkCheckBox(
+            options_frame,
+            text="🔀 Changes only",
+            variable=self.diff_var,
+            font=("Arial", 11)
+        )
+        self.diff_checkbox.pack(anchor="w")
+
+        # Filters, sent to the API so only matching rows are transferred
+        filters_frame = ctk.CTkFrame(report_frame, fg_color="transparent")
+        filters_frame.pack(pady=(0, 5), fill="x")
+        
+        self.filter_entries = {}
+        filter_inputs = [
+            ("date_from", "From Date:", "YYYY-MM-DD", 110),
+            ("date_to", "To Date:", "YYYY-MM-DD", 110),
+            ("store", "Store:", "Store name", 140),
+            ("member_from", "Member From:", "MemberNo", 100),
+            ("member_to", "Member To:", "MemberNo", 100)
+        ]
+        for option, label_text, placeholder, width in filter_inputs:
+            filter_frame = ctk.CTkFrame(filters_frame, fg_color="transparent")
+            filter_frame.pack(side="left", padx=(20, 0))
+            
+            filter_label = ctk.CTkLabel(filter_frame, text=label_text, font=("Arial", 11))
+            filter_label.pack()
+            entry = ctk.CTkEntry(filter_frame, placeholder_text=placeholder, width=width, height=30)
+            entry.pack()
+            self.filter_entries[option] = entry
+
+        # Action buttons
+        button_frame = ctk.CTkFrame(report_frame, fg_color="transparent")
+        button_frame.pack(pady=15)
+
+        self.generate_button = ctk.CTkButton(
+            button_frame, 
+            text="📊 Generate Report", 
+            command=self.handle_generate_report_threaded, 
+            width=180, 
+            height=40,
+            font=("Arial", 12, "bold"),
+            state="disabled"
+        )
+        self.generate_button.pack(side="left", padx=(0, 10))
+
+        self.export_csv_button = ctk.CTkButton(
+            button_frame, 
+            text="📄 Export CSV", 
+            command=self.export_csv, 
+            width=120, 
+            height=40,
+            fg_color="#4CAF50",
+            hover_color="#45a049",
+            state="disabled"
+        )
+        self.export_csv_button.pack(side="left", padx=(5, 5))
+
+        self.export_json_button = ctk.CTkButton(
+            button_frame, 
+            text="📋 Export JSON", 
+            command=self.export_json, 
+            width=120, 
+            height=40,
+            fg_color="#2196F3",
+            hover_color="#1976D2",
+            state="disabled"
+        )
+        self.export_json_button.pack(side="left", padx=(5, 5))
+
+        self.export_parquet_button = ctk.CTkButton(
+            button_frame, 
+            text="🧱 Export Parquet", 
+            command=self.export_parquet, 
+            width=130, 
+            height=40,
+            fg_color="#8E44AD",
+            hover_color="#7D3C98",
+            state="disabled"
+        )
+        self.export_parquet_button.pack(side="left", padx=(5, 0))
+
+        # Progress bar
+        self.progress_bar = ctk.CTkProgressBar(report_frame, width=600)
+        self.progress_bar.pack(pady=(10, 15))
+        self.progress_bar.set(0)
+
+        # The jobs, results and log panels are built once the window is on screen (see build_output_panels)
+        self.output_ready = False
+        self.after_idle(lambda: self.after(0, self.build_output_panels, frame))
+
+    def build_output_panels(self, frame):
+        """Build the jobs, results and log panels below the report inputs, then enable Generate Report"""
+        # -- Jobs Section: one row per report run, with its own progress and cancel button --
+        self.jobs_frame = ctk.CTkFrame(frame, fg_color="#2B2B2B", corner_radius=10)
+        self.jobs_frame.pack(pady=10, padx=20, fill="x")
+        
+        jobs_title = ctk.CTkLabel(self.jobs_frame, text="🧵 Report Jobs", font=("Arial", 14, "bold"))
+        jobs_title.pack(pady=(10, 5))
+        
+        self.jobs_hint = ctk.CTkLabel(self.jobs_frame, text="Generated reports run here; several can run at once",
+                                      font=("Arial", 11), text_color="#CCCCCC")
+        self.jobs_hint.pack(pady=(0, 10))
+
+        # -- Results Section --
+        results_frame = ctk.CTkFrame(frame, fg_color="#2B2B2B", corner_radius=10)
+        results_frame.pack(pady=10, padx=20, fill="both", expand=True)
+        
+        results_title = ctk.CTkLabel(results_frame, text="📈 Report Results", font=("Arial", 14, "bold"))
+        results_title.pack(pady=(10, 5))
+        
+        # Find: searches the shown rows in memory; Order By and Direction re-sort them the same way
+        search_frame = ctk.CTkFrame(results_frame, fg_color="transparent")
+        search_frame.pack(pady=(0, 5), padx=15, fill="x")
+        search_label = ctk.CTkLabel(search_frame, text="Find:", font=("Arial", 11))
+        search_label.pack(side="left")
+        self.search_var = ctk.StringVar(value=SEARCH_FIELDS[0])
+        self.search_combo = ctk.CTkComboBox(search_frame, values=SEARCH_FIELDS, variable=self.search_var,
+                                            width=120, height=28)
+        self.search_combo.pack(side="left", padx=(5, 5))
+        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="Member number or store name prefix",
+                                         width=240, height=28)
+        self.search_entry.pack(side="left")
+        self.search_entry.bind("<Return>", self.on_search)
+        search_button = ctk.CTkButton(search_frame, text="🔎 Find", width=70, height=28, command=self.on_search)
+        search_button.pack(side="left", padx=(5, 0))
+        clear_search_button = ctk.CTkButton(search_frame, text="Clear", width=60, height=28, fg_color="#555555",
+                                            hover_color="#444444", command=self.clear_search)
+        clear_search_button.pack(side="left", padx=(5, 0))
+        
+        # Results display: virtualized table that only renders the visible rows
+        self.results_display = VirtualTable(results_frame, width=800, height=300, corner_radius=6)
+        self.results_display.pack(pady=(0, 15), fill="both", expand=True, padx=15)
+
+        # -- Activity Log --
+        log_frame = ctk.CTkFrame(frame, fg_color="#2B2B2B", corner_radius=10)
+        log_frame.pack(pady=10, padx=20, fill="x")
+        
+        log_title = ctk.CTkLabel(log_frame, text="📋 Activity Log", font=("Arial", 14, "bold"))
+        log_title.pack(pady=(10, 5))
+        
+        log_body = ctk.CTkFrame(log_frame, fg_color="transparent")
+        log_body.pack(pady=(0, 15), fill="x", padx=15)
+        
+        self.output_box = ctk.CTkTextbox(log_body, height=120, width=520, wrap="word", state="disabled")
+        self.output_box.pack(side="left", fill="x", expand=True)
+        self.output_box.configure(fg_color="#0D1117", text_color="#E6EDF3", font=("Consolas", 11))
+        
+        # Timings of the shown job: stages, throughput, bytes transferred and peak memory
+        self.stats_box = ctk.CTkTextbox(log_body, height=120, width=280, wrap="none", state="disabled")
+        self.stats_box.pack(side="right", padx=(10, 0))
+        self.stats_box.configure(fg_color="#0D1117", text_color="#9CDCFE", font=("Consolas", 10))
+        self.stats_text = ""
+        
+        self.output_ready = True
+        self.generate_button.configure(state="normal")
+        self.after(self.FRAME_INTERVAL_MS, self.apply_ui_events)
+        self.start_scheduler()
+
+    # -- Thread-safe UI updates --
+    # Worker threads never touch widgets: they queue events that apply_ui_events drains on the main loop
+    def log(self, message, job=None):
+        """Add message to the activity log with timestamp (and the job it belongs to)"""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        prefix = f"[{job.name}] " if job else ""
+        self.ui_events.put(("log", f"[{timestamp}] {prefix}{message}"))
+
+    def update_progress(self, message, progress=None, job=None):
+        """Update progress bar and log message"""
+        self.log(message, job)
+        if progress is not None:
+            self.set_progress(progress, job)
+
+    def set_progress(self, progress, job=None):
+        if job:
+            job.progress = progress
+            self.ui_events.put(("job", job))
+        else:
+            self.ui_events.put(("progress", progress))
+
+    def report_page_progress(self, pages, records, limit, job=None):
+        """Map paginated fetch progress onto the 0.3-0.8 band of the progress bar"""
+        if limit:
+            fraction = min(records / limit, 1.0)
+        else:
+            # Total size is unknown until a short page arrives, so approach the end of the band
+            fraction = pages / (pages + 1)
+        # Only the latest page status of each job and frame is logged
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        prefix = f"[{job.name}] " if job else ""
+        line = f"[{timestamp}] {prefix}📥 Page {pages} received ({records} records so far)"
+        self.ui_events.put(("status", (job, line)))
+        self.set_progress(0.3 + 0.5 * fraction, job)
+
+    def clear_log(self):
+        self.ui_events.put(("clear_log", None))
+
+    def show_job_later(self, job):
+        """Queue showing a job's results (or status) in the results table"""
+        self.ui_events.put(("show_job", job))
+
+    def apply_ui_events(self):
+        """Apply queued UI events in one batch: log lines in one insert, only the latest progress"""
+        lines = []
+        statuses = {}
+        clear_log = False
+        progress = None
+        jobs = {}
+        shown = None
+        try:
+            while True:
+                kind, value = self.ui_events.get_nowait()
+                if kind == "log":
+                    lines.extend(statuses.values())
+                    statuses = {}
+                    lines.append(value)
+                elif kind == "status":
+                    job, line = value
+                    statuses.pop(job, None)
+                    statuses[job] = line
+                elif kind == "clear_log":
+                    clear_log = True
+                    lines = []
+                    statuses = {}
+                elif kind == "progress":
+                    progress = value
+                elif kind == "job":
+                    jobs[value.job_id] = value
+                elif kind == "show_job":
+                    shown = value
+        except queue.Empty:
+            pass
+        lines.extend(statuses.values())
+
+        if clear_log or lines:
+            self.output_box.configure(state="normal")
+            if clear_log:
+                self.output_box.delete("1.0", "end")
+            if lines:
+                self.output_box.insert("end", "\n".join(lines) + "\n")
+                self.output_box.see("end")
+            self.output_box.configure(state="disabled")
+        if progress is not None:
+            self.progress_bar.set(progress)
+        for job in jobs.values():
+            self.update_job_row(job)
+        if shown is not None:
+            self.show_job(shown)
+        self.update_stats()
+        self.after(self.FRAME_INTERVAL_MS, self.apply_ui_events)
+
+    def update_stats(self):
+        """Show the shown job's metrics in the stats panel (rewritten only when they change)"""
+        job = self.shown_job
+        text = "\n".join([f"⏱️ {job.name}"] + self.memory_lines(job) + job.metrics.format_lines()) if job else ""
+        if text != self.stats_text:
+            self.stats_text = text
+            self.stats_box.configure(state="normal")
+            self.stats_box.delete("1.0", "end")
+            self.stats_box.insert("end", text)
+            self.stats_box.configure(state="disabled")
+
+    @staticmethod
+    def memory_lines(job):
+        """Memory held by the job's report data, as shown in the stats panel"""
+        if not job.store or not len(job.store):
+            return []
+        size = job.store.memory_usage()
+        lines = [f"🧠 Report data: {size / (1024 * 1024):.1f} MB ({size / len(job.store):.0f} B/row)"]
+        index_size = job.store.index_memory_usage()
+        if index_size:
+            lines.append(f"🗂️ Sort indexes: {index_size / (1024 * 1024):.1f} MB")
+        return lines
+
+    # -- Report Jobs (main thread) --
+    def add_job_row(self, job):
+        """Add a row with progress, status and Show/Cancel buttons for a job to the jobs panel"""
+        row = ctk.CTkFrame(self.jobs_frame, fg_color="transparent")
+        row.pack(fill="x", padx=15, pady=2)
+        job.name_label = ctk.CTkLabel(row, text=job.name, width=150, anchor="w", font=("Arial", 11, "bold"))
+        job.name_label.pack(side="left")
+        job.progress_bar = ctk.CTkProgressBar(row, width=180)
+        job.progress_bar.pack(side="left", padx=10)
+        job.progress_bar.set(0)
+        job.status_label = ctk.CTkLabel(row, text=job.status, width=200, anchor="w", font=("Arial", 11))
+        job.status_label.pack(side="left", padx=(0, 10))
+        job.cancel_button = ctk.CTkButton(row, text="🛑 Cancel", width=80, height=26, fg_color="#C0392B",
+                                          hover_color="#A93226", command=lambda: self.cancel_job(job))
+        job.cancel_button.pack(side="right")
+        job.show_button = ctk.CTkButton(row, text="👁️ Show", width=70, height=26, command=lambda: self.show_job(job))
+        job.show_button.pack(side="right", padx=(0, 5))
+        job.row = row
+        self.jobs_hint.pack_forget()
+
+        # Keep the panel short: drop the oldest finished jobs that are not on screen
+        finished = [other for other in self.jobs.values() if not other.running and other is not self.shown_job]
+        for other in finished[:max(len(finished) - self.MAX_FINISHED_JOBS, 0)]:
+            other.row.destroy()
+            del self.jobs[other.job_id]
+
+    def update_job_row(self, job):
+        if job.row is None or not job.row.winfo_exists():
+            return
+        job.progress_bar.set(job.progress)
+        job.status_label.configure(text=job.status)
+        job.cancel_button.configure(state="normal" if job.running and not job.cancel_requested else "disabled")
+        if job is self.shown_job:
+            self.progress_bar.set(job.progress)
+            self.update_export_buttons()
+
+    def show_job(self, job):
+        """Show a job's rows (or its status) in the results table and make it the export source"""
+        self.shown_job = job
+        self.results_display.metrics = job.metrics
+        if job.store is not None:
+            self.results_display.set_columns(job.columns, job.view if job.view is not None else job.store)
+        else:
+            self.results_display.show_message(job.message or job.status)
+        self.progress_bar.set(job.progress)
+        self.update_export_buttons()
+
+    def update_export_buttons(self):
+        """Exports use the shown job's result, sorted and searched as shown, once it has completed"""
+        job = self.shown_job
+        rows = job.view if job is not None and job.view is not None else job.store if job is not None else None
+        ready = job is not None and job.state == "done" and rows is not None and len(rows) > 0
+        self.current_report_data = rows if ready else None
+        self.current_report_type = job.result_type if ready else None
+        for button in (self.export_csv_button, self.export_json_button, self.export_parquet_button):
+            button.configure(state="normal" if ready else "disabled")
+
+    def cancel_job(self, job):
+        if job.running and not job.cancel_requested:
+            job.cancel()
+            self.log("🛑 Cancelling...", job)
+            self.update_job_row(job)
+
+    def on_close(self):
+        """Cancel running jobs (closing their connections) before closing the window"""
+        for job in self.jobs.values():
+            if job.running:
+                job.cancel()
+        if self.scheduler:
+            self.scheduler.stop()
+        self.destroy()
+
+    # -- Sorting and Search --
+    # Finished results are re-sorted and searched in memory through per-column sort indexes, on a
+    # short-lived thread; when requests overlap only the latest one is shown
+    @staticmethod
+    def has_rows(job):
+        return job is not None and job.state == "done" and job.store is not None and len(job.store) > 0
+
+    def on_view_change(self, _value=None):
+        """Re-sort the shown report by the selected Order By and Direction without refetching it"""
+        job = self.shown_job
+        if not self.has_rows(job):
+            return
+        field = self.order_var.get()
+        if field not in job.store.fields:
+            self.log(f"⚠️ This report has no {field} column; generate a new report to order by it", job)
+            return
+        job.view_order = (field, self.direction_var.get() == "asc")
+        self.apply_view_threaded(job)
+
+    def on_search(self, _event=None):
+        """Show only the shown report's rows matching the Find box"""
+        job = self.shown_job
+        if not self.has_rows(job):
+            return
+        field = self.search_var.get()
+        text = self.search_entry.get().strip()
+        if field not in job.store.fields:
+            self.log(f"⚠️ This report has no {field} column to search", job)
+            return
+        job.search = (field, text) if text else None
+        self.apply_view_threaded(job)
+
+    def clear_search(self):
+        self.search_entry.delete(0, "end")
+        job = self.shown_job
+        if self.has_rows(job) and job.search:
+            job.search = None
+            self.apply_view_threaded(job)
+
+    def apply_view_threaded(self, job):
+        job.view_version += 1
+        threading.Thread(target=self.apply_view, args=(job, job.view_version), daemon=True).start()
+
+    def apply_view(self, job, version):
+        """Sort and search a finished job's rows (on a worker thread) and show the result"""
+        from frames import select_rows
+        order_by, ascending = job.view_order or (None, True)
+        search_field, search_text = job.search or (None, "")
+        started = time.perf_counter()
+        try:
+            view = select_rows(job.store, order_by, ascending, search_field, search_text)
+        except ValueError as e:
+            # Forget the bad search so later re-sorts do not repeat the error
+            job.search = None
+            self.log(f"❌ Search failed: {str(e)}", job)
+            return
+        elapsed = time.perf_counter() - started
+        job.metrics.add("search" if search_text else "sort", elapsed)
+        if version != job.view_version:
+            return
+        job.view = None if view is job.store else view
+        order = f", by {order_by} ({'asc' if ascending else 'desc'})" if order_by else ""
+        if search_text:
+            match = "=" if job.store.sort_index(search_field).numeric else "starts with"
+            self.log(f"🔎 {len(view)} rows where {search_field} {match} {search_text}{order} "
+                     f"in {elapsed * 1000:.0f} ms", job)
+        elif order_by:
+            self.log(f"↕️ Sorted {len(view)} rows by {order_by} ({'asc' if ascending else 'desc'}) "
+                     f"in {elapsed * 1000:.0f} ms", job)
+        if job is self.shown_job:
+            self.show_job_later(job)
+
+    def build_sort_indexes(self, job):
+        """Index the search fields and the report's order field up front (on the job's worker thread)
+
+        Other columns are indexed the first time the report is sorted by them.
+        """
+        fields = [field for field in dict.fromkeys(SEARCH_FIELDS + [job.inputs['order_by']])
+                  if field in job.store.fields]
+        with job.metrics.stage("index"):
+            for field in fields:
+                job.store.sort_index(field)
+        self.log(f"🗂️ Indexed {', '.join(fields)} for sorting and search", job)
+
+    # -- Scheduled Exports --
+    def start_scheduler(self):
+        """Start the schedule.jobs exports when reports.auto_export is on and credentials are known"""
+        # None until started; False when the schedule failed to load, so the error is only logged once
+        if self.scheduler is not None or not CONFIG["reports"].get("auto_export", False):
+            return
+        try:
+            jobs = load_scheduled_jobs()
+        except ValueError as e:
+            self.log(f"❌ Scheduled exports disabled: {e}")
+            self.scheduler = False
+            return
+        if not jobs:
+            return
+        if not all(self.schedule_credentials):
+            self.log(f"⏰ {len(jobs)} scheduled export(s) start once you generate a report")
+            return
+        self.scheduler = ReportScheduler(jobs, self.run_scheduled_job, self.log_scheduled).start()
+        for job in jobs:
+            self.log_scheduled(f"Scheduled {job.name} ({job.schedule}), first run at {job.next_run:%Y-%m-%d %H:%M}")
+
+    def log_scheduled(self, message):
+        self.log(f"⏰ {message}")
+
+    def run_scheduled_job(self, job):
+        """Run one scheduled export (on the scheduler's worker thread)"""
+        username, password = self.schedule_credentials
+        run_scheduled_job(job, username, password, self.log_scheduled)
+
+    # -- Report Generation --
+    def show_aggregate(self, job, pages, group_by):
+        """Roll up transaction pages by group as they arrive, then display (or stream) the result"""
+        from frames import ColumnStore, TransactionAggregator, export_frame
+        aggregator = TransactionAggregator(group_by)
+        fields = report_fields("transactions")
+        for page in pages:
+            with job.metrics.stage("aggregate"):
+                aggregator.add_records(page, fields)
+        result = aggregator.result()
+        job.result_type = f"transactions_by_{group_by}"
+        self.update_progress(
+            f"🧮 Aggregated {aggregator.transactions} transactions into {len(result)} groups by {group_by}", 0.9, job)
+        
+        if job.stream_filename:
+            if len(result):
+                export_frame(result, job.stream_filename, job.result_type)
+            job.message = f"{len(result)} {group_by} rows written to {job.stream_filename}"
+        elif len(result):
+            job.store = ColumnStore.from_frame(result)
+            job.columns = aggregate_display_columns(group_by)
+        else:
+            job.message = "No transactions to aggregate"
+        
+        job.finish("done", f"✅ {len(result)} groups")
+        self.set_progress(1.0, job)
+        self.log(f"🎉 Aggregation completed! {len(result)} groups from {aggregator.transactions} transactions", job)
+
+    def show_member_view(self, job, summary_pages, transaction_pages):
+        """Join the summary with per-member transaction activity, then display (or stream) it"""
+        from frames import ColumnStore, build_member_view, export_frame
+        inputs = job.inputs
+        view = build_member_view(summary_pages, transaction_pages, order_by=inputs['order_by'],
+                                 order_direction=inputs['order_direction'], limit=inputs['limit'],
+                                 metrics=job.metrics)
+        self.update_progress(f"👥 Joined {len(view)} members with their transaction activity", 0.9, job)
+        
+        if job.stream_filename:
+            if len(view):
+                export_frame(view, job.stream_filename, "members")
+            job.message = f"{len(view)} members written to {job.stream_filename}"
+        elif len(view):
+            job.store = ColumnStore.from_frame(view)
+            job.columns = DISPLAY_COLUMNS["members"]
+        else:
+            job.message = "No members found"
+        
+        job.finish("done", f"✅ {len(view)} members")
+        self.set_progress(1.0, job)
+        self.log(f"🎉 Member view completed! {len(view)} members", job)
+
+    def log_diff_counts(self, diff, job):
+        self.log("🔀 {new} new, {changed} changed and {removed} removed members "
+                 "({unchanged} unchanged)".format(**diff.counts), job)
+
+    def validate_inputs(self):
+        """Validate all input fields"""
+        username = self.username_entry.get().strip()
+        password = self.password_entry.get().strip()
+        limit_str = self.limit_entry.get().strip()
+
+        if not username or not password:
+            raise ValueError("Username and password are required")
+        
+        if not limit_str or not limit_str.isdigit():
+            raise ValueError("Record limit must be 0 (all records) or a positive integer")
+        
+        aggregate = self.aggregate_var.get()
+        if aggregate != "none" and aggregate not in AGGREGATE_KEY_COLUMNS:
+            raise ValueError(f"Unknown aggregation: {aggregate}")
+        if aggregate != "none" and self.report_type_var.get() != "transactions":
+            raise ValueError("Aggregation is only available for the transactions report")
+        if self.shard_var.get() and self.cache_var.get():
+            raise ValueError("Sharded extracts fetch from the API; untick \"Use local cache\" to use them")
+        if self.shard_var.get() and self.report_type_var.get() == "members":
+            raise ValueError("Sharded extracts are not available for the member view")
+        
+        # Date and store filters only apply to transactions (summary has no such fields)
+        filters = {option: entry.get().strip() for option, entry in self.filter_entries.items()}
+        filters = filter_conditions(self.report_type_var.get(), filters)
+        
+        if self.diff_var.get():
+            if self.report_type_var.get() != "summary":
+                raise ValueError("\"Changes only\" is only available for the summary report")
+            if self.shard_var.get() or self.cache_var.get():
+                raise ValueError("\"Changes only\" compares a full download with the cached snapshot; "
+                                 "untick \"Use local cache\" and \"Sharded extract\"")
+            if filters:
+                raise ValueError("\"Changes only\" compares every member; clear the filters to use it")
+
+        return {
+            'username': username,
+            'password': password,
+            'report_type': self.report_type_var.get(),
+            'limit': int(limit_str) or None,
+            'order_by': self.order_var.get(),
+            'order_direction': self.direction_var.get(),
+            'use_cache': self.cache_var.get(),
+            'sharded': self.shard_var.get(),
+            'aggregate': aggregate,
+            'filters': filters,
+            'diff': self.diff_var.get()
+        }
+
+    def handle_generate_report_threaded(self):
+        """Start a report job on its own worker thread
+
+        Summary and transactions reports can run at the same time; only one job per report type
+        runs at once, since both would resume from and write to the same checkpoint.
+        """
+        # Widgets are read here on the main thread; the worker only gets the validated values
+        try:
+            inputs = self.validate_inputs()
+        except ValueError as e:
+            self.log(f"❌ Error: {str(e)}")
+            return
+        
+        self.schedule_credentials = (inputs['username'], inputs['password'])
+        self.start_scheduler()
+        
+        if any(job.running and job.report_type == inputs['report_type'] for job in self.jobs.values()):
+            self.log(f"⚠️ A {inputs['report_type']} report is already running; cancel it or wait for it to finish")
+            return
+        
+        # Ask for the destination up front (dialogs must run on the main thread)
+        stream_filename = None
+        if self.stream_var.get():
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            stream_filename = filedialog.asksaveasfilename(
+                defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv"), ("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"),
+                           ("Parquet files", "*.parquet"), ("Arrow IPC / Feather files", "*.arrow *.feather")],
+                initialfile=f"stampcard_{self.report_type_var.get()}_{timestamp}.csv"
+            )
+            if not stream_filename:
+                return
+        
+        job = ReportJob(self.next_job_id, inputs, stream_filename)
+        self.next_job_id += 1
+        self.jobs[job.job_id] = job
+        self.add_job_row(job)
+        self.show_job(job)
+        
+        # Run report generation in thread to prevent UI freezing
+        job.thread = threading.Thread(target=self.handle_generate_report, args=(job,))
+        job.thread.daemon = True
+        job.thread.start()
+
+    def handle_generate_report(self, job):
+        """Run one report job (on its worker thread)
+
+        When the job has a stream_filename, pages are written straight to that file as they
+        arrive and the report is not kept in memory for display or later export. All requests go
+        over the job's CancellableSession and all UI updates through the thread-safe event queue.
+        """
+        inputs = job.inputs
+        session = job.session
+        cache = None
+        
+        try:
+            self.update_progress("🔍 Inputs validated", 0.1, job)
+            
+            # Login (reusing a cached token when it is still valid)
+            token = get_token_manager(inputs['username'], inputs['password'])
+            if token.has_valid_token():
+                self.update_progress("🔑 Reusing cached authentication token", 0.3, job)
+            else:
+                self.update_progress("🔐 Authenticating...", 0.2, job)
+                with job.metrics.stage("login"):
+                    token.get_token()
+                self.update_progress("✅ Authentication successful", 0.3, job)
+            
+            # Generate report
+            report_type = inputs['report_type']
+            job.status = "Fetching..."
+            self.update_progress(f"📊 Generating {report_type} report...", 0.3, job)
+            
+            # Fall back to the default sort field when the selected one belongs to the other report
+            if inputs['order_by'] not in report_fields(report_type):
+                inputs['order_by'] = DEFAULT_ORDER_FIELDS[report_type]
+            fetch_page = REPORT_FETCHERS.get(report_type)
+            fields = report_fields(report_type)
+            page_progress = lambda pages, records: self.report_page_progress(pages, records, inputs['limit'], job)
+            diff = None
+            
+            if report_type == "members":
+                progress_callback = lambda pages, records: self.report_page_progress(pages, records, None, job)
+                if inputs['use_cache']:
+                    cache = ReportCache()
+                    self.update_progress("🗄️ Refreshing cached transactions and summary...", 0.3, job)
+                    new_rows = refresh_transactions_cache(cache, token, progress_callback=progress_callback,
+                                                          session=session)
+                    self.log(f"🗄️ {new_rows} new transactions merged into cache "
+                             f"({cache.count('transactions', report_fields('transactions'))} cached)", job)
+                    refresh_summary_cache(cache, token, progress_callback=progress_callback, session=session)
+                    sources = [cache.iter_pages(source, report_fields(source), filters=inputs['filters'])
+                               for source in ("summary", "transactions")]
+                else:
+                    self.update_progress("👥 Fetching summary and transactions concurrently...", 0.3, job)
+                    sources = member_view_pages(token, filters=inputs['filters'], progress_callback=progress_callback,
+                                                session=session)
+                self.show_member_view(job, *(job.watch(measured_pages(pages, job.metrics)) for pages in sources))
+                return
+            
+            if inputs['diff']:
+                # Only members that are new, changed or removed since the cached snapshot come through
+                cache = ReportCache()
+                diff = SummaryDiff(cache)
+                fields = SUMMARY_DIFF_FIELDS
+                job.result_type = "summary_changes"
+                self.update_progress("🔀 Comparing summary with the cached snapshot "
+                                     f"({cache.refreshed_at('summary', SUMMARY_FIELDS) or 'none yet'})...", 0.3, job)
+                pages = diff.pages(token, progress_callback=lambda pages, records: self.report_page_progress(
+                    pages, records, None, job), session=session)
+            elif inputs['use_cache']:
+                # Bring the local cache up to date, then serve the report from it
+                cache = ReportCache()
+                progress_callback = lambda pages, records: self.report_page_progress(pages, records, None, job)
+                if report_type == "transactions":
+                    self.update_progress("🗄️ Fetching new transactions into local cache...", 0.3, job)
+                    new_rows = refresh_transactions_cache(cache, token, progress_callback=progress_callback,
+                                                          session=session)
+                    self.log(f"🗄️ {new_rows} new transactions merged into cache "
+                             f"({cache.count('transactions', report_fields('transactions'))} cached)", job)
+                else:
+                    self.update_progress("🗄️ Refreshing cached summary snapshot...", 0.3, job)
+                    refresh_summary_cache(cache, token, progress_callback=progress_callback, session=session)
+                pages = cache.iter_pages(
+                    report_type,
+                    report_fields(report_type),
+                    order_by=inputs['order_by'],
+                    order_direction=inputs['order_direction'],
+                    limit=inputs['limit'],
+                    filters=inputs['filters']
+                )
+            elif inputs['sharded']:
+                shards = CONFIG["reports"].get("shards", 4)
+                self.update_progress(f"⚡ Fetching {report_type} report in {shards} parallel shards...", 0.3, job)
+                pages = sharded_report_pages(
+                    report_type,
+                    token,
+                    shards,
+                    limit=inputs['limit'],
+                    order_by=inputs['order_by'],
+                    order_direction=inputs['order_direction'],
+                    progress_callback=page_progress,
+                    filters=inputs['filters'],
+                    session=session
+                )
+            else:
+                # Pages are checkpointed to disk so an interrupted pull picks up where it stopped
+                pages = resumable_report_pages(
+                    fetch_page,
+                    token,
+                    report_type,
+                    limit=inputs['limit'],
+                    order_by=inputs['order_by'],
+                    order_direction=inputs['order_direction'],
+                    progress_callback=page_progress,
+                    filters=inputs['filters'],
+                    resume=CONFIG.get("jobs", {}).get("resume", True),
+                    resume_callback=lambda pages, records: self.log(
+                        f"♻️ Resuming interrupted report: {records} records from {pages} saved pages", job),
+                    stale_callback=lambda pages, records: self.log(
+                        f"⚠️ Report changed since it was interrupted; discarding {records} saved records "
+                        "and starting over", job),
+                    session=session
+                )
+            pages = job.watch(measured_pages(pages, job.metrics))
+            
+            if inputs['aggregate'] != "none":
+                self.show_aggregate(job, pages, inputs['aggregate'])
+                return
+            
+            if job.stream_filename:
+                record_count = stream_report_to_file(pages, job.stream_filename, job.result_type, fields=fields,
+                                                     metrics=job.metrics)
+                if diff:
+                    self.log_diff_counts(diff, job)
+                self.update_progress(f"💾 Report streamed to file: {job.stream_filename}", 0.9, job)
+                job.message = f"{record_count} records streamed to {job.stream_filename}"
+                job.finish("done", f"✅ {record_count} records")
+                self.set_progress(1.0, job)
+                self.log(f"🎉 Report completed! {record_count} records exported", job)
+                return
+            
+            # Each page is normalized into typed columns once, and shown as it arrives;
+            # the table redraws in batches on the main loop
+            from frames import ColumnStore
+            store = ColumnStore(fields)
+            job.store = store
+            job.columns = DISPLAY_COLUMNS[job.result_type]
+            if job is self.shown_job:
+                self.show_job_later(job)
+            for page in pages:
+                with job.metrics.stage("normalize"):
+                    store.append_records(page)
+                if job is self.shown_job:
+                    self.results_display.refresh()
+            store.consolidate()
+            if diff:
+                self.log_diff_counts(diff, job)
+            
+            self.update_progress("✅ Report generated successfully", 0.8, job)
+            if not len(store):
+                job.store = None
+                job.message = "No changes since the last snapshot" if diff else "No records found"
+            
+            # Success: the shown job's result becomes the export source
+            job.finish("done", f"✅ {len(store)} records")
+            self.set_progress(1.0, job)
+            self.log(f"🎉 Report completed! {len(store)} records retrieved", job)
+                    
+        except ReportCancelled:
+            # Drop the partial result so its memory is released
+            job.store = None
+            job.message = "Report cancelled"
+            job.finish("cancelled", "🛑 Cancelled")
+            self.log("🛑 Report cancelled", job)
+        except Exception as e:
+            job.store = None
+            job.message = f"Error: {str(e)}"
+            job.finish("failed", "❌ Failed")
+            self.log(f"❌ Error: {str(e)}", job)
+        finally:
+            if cache:
+                cache.close()
+            session.close()
+            job.metrics.finish()
+            try:
+                write_metrics(job.metrics)
+            except OSError as e:
+                self.log(f"⚠️ Could not write metrics: {str(e)}", job)
+            self.ui_events.put(("job", job))
+            if job is self.shown_job:
+                self.show_job_later(job)
+            if self.has_rows(job):
+                self.build_sort_indexes(job)
+
+    def export_csv(self):
+        """Export current report data to CSV"""
+        if not self.current_report_data:
+            messagebox.showwarning("No Data", "Please generate a report first")
+            return
+        
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            default_filename = f"stampcard_{self.current_report_type}_{timestamp}.csv"
+            
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+                initialfile=default_filename
+            )
+            
+            if filename:
+                from frames import export_frame
+                with self.shown_job.metrics.stage("export"):
+                    export_frame(self.current_report_data.frame(), filename, self.current_report_type, "csv")
+                self.log(f"📄 CSV exported successfully: {filename}")
+                messagebox.showinfo("Export Successful", f"Report exported to:\n{filename}")
+        except Exception as e:
+            self.log(f"❌ CSV export failed: {str(e)}")
+            messagebox.showerror("Export Failed", f"Failed to export CSV:\n{str(e)}")
+
+    def export_json(self):
+        """Export current report data to JSON"""
+        if not self.current_report_data:
+            messagebox.showwarning("No Data", "Please generate a report first")
+            return
+        
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            default_filename = f"stampcard_{self.current_report_type}_{timestamp}.json"
+            
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".json",
+                filetypes=[("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("All files", "*.*")],
+                initialfile=default_filename
+            )
+            
+            if filename:
+                from frames import export_frame
+                with self.shown_job.metrics.stage("export"):
+                    export_frame(self.current_report_data.frame(), filename, self.current_report_type, "json")
+                self.log(f"📋 JSON exported successfully: {filename}")
+                messagebox.showinfo("Export Successful", f"Report exported to:\n{filename}")
+        except Exception as e:
+            self.log(f"❌ JSON export failed: {str(e)}")
+            messagebox.showerror("Export Failed", f"Failed to export JSON:\n{str(e)}")
+
+    def export_parquet(self):
+        """Export current report data to Parquet (or Arrow IPC / Feather)"""
+        if not self.current_report_data:
+            messagebox.showwarning("No Data", "Please generate a report first")
+            return
+        
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            default_filename = f"stampcard_{self.current_report_type}_{timestamp}.parquet"
+            
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".parquet",
+                filetypes=[("Parquet files", "*.parquet"), ("Arrow IPC / Feather files", "*.arrow *.feather"),
+                           ("All files", "*.*")],
+                initialfile=default_filename
+            )
+            
+            if filename:
+                from frames import export_frame
+                with self.shown_job.metrics.stage("export"):
+                    export_frame(self.current_report_data.frame(), filename, self.current_report_type, "parquet")
+                self.log(f"🧱 Parquet exported successfully: {filename}")
+                messagebox.showinfo("Export Successful", f"Report exported to:\n{filename}")
+        except Exception as e:
+            self.log(f"❌ Parquet export failed: {str(e)}")
+            messagebox.showerror("Export Failed", f"Failed to export Parquet:\n{str(e)}")
@@ -0,0 +1,1997 @@
+"""Reporting core shared by the GUI and the command line: configuration, RedCat API access,
+paging, caching and exporters. Nothing here imports GUI modules."""
+import requests
+from requests.adapters import HTTPAdapter
+import json
+import os
+import csv
+import hashlib
+import base64
+import time
+import random
+import sqlite3
+import sys
+from email.utils import parsedate_to_datetime
+from datetime import datetime, date, timedelta, timezone
+from decimal import Decimal
+import threading
+import heapq
+import tempfile
+import shutil
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# --- Configuration Loading ---
+def load_config():
+    """Load configuration from config.json"""
+    config_path = os.path.join(os.path.dirname(__file__), 'config.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        # Default configuration if file doesn't exist
+        return {
+            "api": {
+                "base_url": "https://your-api-url.com/api/v1",
+                "auth_type": "U",
+                "token_ttl_seconds": 3600,
+                "token_refresh_margin_seconds": 300,
+                "token_cache_file": None
+            },
+            "ui": {
+                "window_title": "RedCat Stamp Card Reporting",
+                "default_width": 900,
+                "default_height": 700,
+                "startup_budget_ms": 1500
+            },
+            "reports": {
+                "default_limit": 1000,
+                "page_size": 500,
+                "max_workers": 4,
+                "shards": 4,
+                "auto_export": False
+            },
+            "cache": {
+                "enabled": False,
+                "path": "cache/reports.sqlite"
+            },
+            "jobs": {
+                "resume": True,
+                "checkpoint_dir": "cache/checkpoints"
+            },
+            "schedule": {
+                "jobs": []
+            },
+            "metrics": {
+                "file": None
+            },
+            "http": {
+                "connect_timeout_seconds": 10,
+                "read_timeout_seconds": 120,
+                "max_retries": 5,
+                "backoff_base_seconds": 1.0,
+                "backoff_max_seconds": 60,
+                "compression": True
+            }
+        }
+
+# Load configuration
+CONFIG = load_config()
+BASE_URL = CONFIG["api"]["base_url"]
+
+# Field sets requested from each report endpoint (also the column order of list-style records)
+SUMMARY_FIELDS = ["MemberNo", "CurrentStamps", "CardsFilled", "RewardsEarned"]
+TRANSACTION_FIELDS = ["MemberSalesHeaderRecid", "MemberNo", "SaleStampsEarned", "RewardsEarned", "StoreName", "Amount", "TxnDate"]
+# Member view: the summary joined with per-member activity derived from transactions
+MEMBER_VIEW_FIELDS = SUMMARY_FIELDS + ["LastTxnDate", "Transactions", "TotalAmount"]
+REPORT_FIELDS = {"summary": SUMMARY_FIELDS, "transactions": TRANSACTION_FIELDS, "members": MEMBER_VIEW_FIELDS}
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_MAX_WORKERS = 4
+
+# --- HTTP Session ---
+_session = None
+_session_lock = threading.Lock()
+
+def mount_pool(session, pool_size=None):
+    """Give a session pool_size pooled connections (default: reports.max_workers) for concurrent requests
+
+    requests already asks for compressed responses (gzip and deflate, plus br and zstd when
+    urllib3 can decode them); http.compression set to false asks for plain ones instead.
+    """
+    if pool_size is None:
+        pool_size = CONFIG["reports"].get("max_workers", DEFAULT_MAX_WORKERS)
+    pool_size = max(pool_size, 1)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.pool_size = pool_size
+    if not CONFIG.get("http", {}).get("compression", True):
+        session.headers["Accept-Encoding"] = "identity"
+    return session
+
+def get_session():
+    """Return the shared keep-alive HTTP session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = mount_pool(requests.Session())
+        return _session
+
+class ReportCancelled(Exception):
+    """Raised in a report job once its CancellableSession has been cancelled"""
+
+class CancellableSession(requests.Session):
+    """Keep-alive session owned by one report job, which another thread can cancel
+
+    Pass it as session= to the report helpers. After cancel() every request (and retry backoff)
+    raises ReportCancelled, page waits in fetch_report_pages stop at once, and the pooled
+    connections are closed. A request already on the wire is abandoned: its worker thread
+    finishes in the background and the response is discarded.
+    """
+
+    def __init__(self, metrics=None):
+        super().__init__()
+        mount_pool(self)
+        self.cancelled = threading.Event()
+        self.metrics = None
+        if metrics is not None:
+            metrics.attach(self)
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise ReportCancelled("Report cancelled")
+
+    def request(self, *args, **kwargs):
+        self.check_cancelled()
+        try:
+            return super().request(*args, **kwargs)
+        except requests.exceptions.RequestException:
+            # Errors caused by cancel() closing the connections are reported as the cancellation
+            self.check_cancelled()
+            raise
+
+    def sleep(self, seconds):
+        """Sleep between retries, waking up as soon as the session is cancelled"""
+        if self.cancelled.wait(seconds):
+            self.check_cancelled()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.close()
+
+# --- Run Metrics ---
+def peak_memory_mb():
+    """Peak resident memory of this process so far in MB, or None where the resource module is missing
+
+    This is the high-water mark over the process lifetime, not of one run: in the GUI or the
+    scheduler a run below an earlier run's peak reports that earlier peak.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class RunMetrics:
+    """Timings and counters for one report run (thread-safe)
+
+    Stages are timed with "with metrics.stage(name):" or add(name, seconds). Requests made over
+    a session passed to attach() are counted with their latency ("request" stage) and response
+    size, and post_report times JSON decoding ("decode"). summary() gives a JSON-ready dict.
+    """
+
+    def __init__(self, report_type, **details):
+        self.report_type = report_type
+        self.details = details
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.finished = None
+        self.stages = {}  # name -> [count, total seconds, longest]
+        self.rows = 0
+        self.requests = 0
+        self.bytes = 0
+        self.decoded_bytes = 0
+        # The process peak when the run started; how far the run pushed it up is its own share
+        self.peak_memory_at_start = peak_memory_mb()
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self.lock:
+            stage = self.stages.setdefault(name, [0, 0.0, 0.0])
+            stage[0] += 1
+            stage[1] += seconds
+            stage[2] = max(stage[2], seconds)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add_rows(self, count):
+        with self.lock:
+            self.rows += count
+
+    def record_response(self, response, *args, **kwargs):
+        """requests response hook: count the request, its latency and body size on the wire and decoded"""
+        decoded = len(response.content)
+        # urllib3 counts the (possibly compressed) bytes it read from the socket
+        size = response.raw.tell() if hasattr(response.raw, "tell") else decoded
+        with self.lock:
+            self.requests += 1
+            self.bytes += size
+            self.decoded_bytes += decoded
+        self.add("request", response.elapsed.total_seconds())
+        return response
+
+    def attach(self, session):
+        """Measure every request made over session"""
+        session.metrics = self
+        session.hooks["response"].append(self.record_response)
+        return session
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self):
+        peak_memory = peak_memory_mb()
+        with self.lock:
+            elapsed = self.elapsed()
+            stages = {
+                name: {"count": count, "total_s": round(total, 4), "avg_ms": round(total / count * 1000, 2),
+                       "max_ms": round(longest * 1000, 2)}
+                for name, (count, total, longest) in self.stages.items()
+            }
+            return {
+                "started_at": self.started_at.isoformat(),
+                "report_type": self.report_type,
+                **self.details,
+                "duration_s": round(elapsed, 3),
+                "rows": self.rows,
+                "rows_per_s": round(self.rows / elapsed, 1) if elapsed > 0 else None,
+                "requests": self.requests,
+                "bytes": self.bytes,
+                "decoded_bytes": self.decoded_bytes,
+                "process_peak_memory_mb": peak_memory,
+                "peak_memory_growth_mb": (round(peak_memory - self.peak_memory_at_start, 1)
+                                          if peak_memory is not None else None),
+                "stages": stages
+            }
+
+    def format_lines(self):
+        """Human-readable summary, one stat per line"""
+        summary = self.summary()
+        lines = [
+            f"Duration: {summary['duration_s']:.2f} s",
+            f"Rows: {summary['rows']} ({summary['rows_per_s'] or 0:.0f}/s)",
+            f"Requests: {summary['requests']} ({summary['bytes'] / (1024 * 1024):.2f} MB transferred, "
+            f"{summary['decoded_bytes'] / (1024 * 1024):.2f} MB decoded)"
+        ]
+        if summary["process_peak_memory_mb"] is not None:
+            lines.append(f"Process peak memory: {summary['process_peak_memory_mb']:.0f} MB "
+                         f"(+{summary['peak_memory_growth_mb']:.0f} MB in this run)")
+        for name, stage in summary["stages"].items():
+            lines.append(f"{name}: {stage['total_s']:.2f} s / {stage['count']} "
+                         f"(avg {stage['avg_ms']:.1f} ms, max {stage['max_ms']:.1f} ms)")
+        return lines
+
+def get_metrics_path():
+    """Return the absolute path of the metrics JSON Lines file, or None if it is disabled"""
+    path = CONFIG.get("metrics", {}).get("file")
+    if path and not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), path)
+    return path
+
+def write_metrics(metrics, path=None):
+    """Append a run's summary to the metrics file (metrics.file) for trend analysis"""
+    path = path or get_metrics_path()
+    if not path:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(metrics.summary(), ensure_ascii=False) + "\n")
+    return path
+
+def measured_pages(pages, metrics):
+    """Pass pages through, timing the wait for each one ("fetch") and counting rows"""
+    iterator = iter(pages)
+    try:
+        while True:
+            with metrics.stage("fetch"):
+                page = next(iterator, None)
+            if page is None:
+                break
+            metrics.add_rows(len(page))
+            yield page
+    finally:
+        if hasattr(pages, "close"):
+            pages.close()
+
+# --- Resilient Requests ---
+# Transient statuses worth retrying; 429 and 503 also mean the server wants less concurrency
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+OVERLOAD_STATUSES = {429, 503}
+
+class AdaptiveLimiter:
+    """Concurrency limit for API requests that adapts to server overload (AIMD)
+
+    The limit is halved when the server signals overload (429/503) and creeps back up by one
+    after a full window of successful requests, so long paged pulls settle at the highest
+    concurrency the server sustains. Never exceeds max_limit or drops below 1.
+    """
+
+    # Ignore further overload signals for this long after a decrease (they belong to the same burst)
+    DECREASE_COOLDOWN_SECONDS = 1.0
+
+    def __init__(self, max_limit):
+        self.max_limit = max(int(max_limit), 1)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def record_success(self):
+        with self.condition:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self.successes = 0
+                self.condition.notify_all()
+
+    def grow(self, max_limit):
+        """Allow up to max_limit requests, raising the current limit by as much as the maximum grows"""
+        with self.condition:
+            if max_limit > self.max_limit:
+                self.limit += max_limit - self.max_limit
+                self.max_limit = max_limit
+                self.condition.notify_all()
+
+    def record_overload(self):
+        with self.condition:
+            now = time.monotonic()
+            if now - self.last_decrease >= self.DECREASE_COOLDOWN_SECONDS:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+                self.last_decrease = now
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+def get_limiter(session):
+    """Return the adaptive limiter of a session, creating it on first use
+
+    Each session (the shared one, or a job's CancellableSession) has its own limiter, sized like
+    its connection pool, so concurrent jobs don't take each other's request slots.
+    """
+    with _session_lock:
+        limiter = getattr(session, "limiter", None)
+        if limiter is None:
+            limiter = AdaptiveLimiter(getattr(session, "pool_size", None)
+                                      or CONFIG["reports"].get("max_workers", DEFAULT_MAX_WORKERS))
+            session.limiter = limiter
+        return limiter
+
+def reserve_concurrency(session, workers):
+    """Let a session carry workers concurrent requests, growing its connection pool and limiter if needed"""
+    with _session_lock:
+        if workers > getattr(session, "pool_size", 0):
+            mount_pool(session, workers)
+    get_limiter(session).grow(workers)
+
+def parse_retry_after(value):
+    """Return the delay in seconds requested by a Retry-After header (seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+def backoff_delay(attempt, response=None):
+    """Seconds to wait before retry number attempt (0-based)
+
+    Honours Retry-After when the server sends one; otherwise exponential backoff with full
+    jitter, capped at http.backoff_max_seconds.
+    """
+    http_config = CONFIG.get("http", {})
+    backoff_max = http_config.get("backoff_max_seconds", 60)
+    if response is not None:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(retry_after, backoff_max)
+    ceiling = min(backoff_max, http_config.get("backoff_base_seconds", 1.0) * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+def post_with_retry(url, session=None, **kwargs):
+    """POST over session (default: the shared session) with timeouts, retries and adaptive concurrency
+
+    Connection errors, timeouts and RETRY_STATUSES responses are retried up to
+    http.max_retries times. The final response is returned even if it is an error, so callers
+    keep using raise_for_status(); if the last attempt failed to connect, that error is raised.
+    """
+    http_config = CONFIG.get("http", {})
+    max_retries = http_config.get("max_retries", 5)
+    kwargs.setdefault("timeout", (http_config.get("connect_timeout_seconds", 10),
+                                  http_config.get("read_timeout_seconds", 120)))
+    if session is None:
+        session = get_session()
+    limiter = get_limiter(session)
+
+    for attempt in range(max_retries + 1):
+        response = None
+        try:
+            with limiter:
+                response = session.post(url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == max_retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                limiter.record_success()
+                return response
+            if response.status_code in OVERLOAD_STATUSES:
+                limiter.record_overload()
+            if attempt == max_retries:
+                return response
+        if isinstance(session, CancellableSession):
+            session.sleep(backoff_delay(attempt, response))
+        else:
+            time.sleep(backoff_delay(attempt, response))
+
+# --- Token Management ---
+class TokenManager:
+    """Caches the X-Redcat-Authtoken returned by login() and re-authenticates when needed
+
+    Tokens are reused until they come within the refresh margin of their expiry (tracked from
+    api.token_ttl_seconds, since the login response carries no expiry), at which point the next
+    request triggers a new login. Thread-safe: concurrent page workers share one token and only
+    one of them re-authenticates after a 401. If api.token_cache_file is set and the optional
+    cryptography package is installed, the token is also kept in a file encrypted with a key
+    derived from the password, so separate runs (e.g. scripted reports) can reuse it.
+    """
+
+    def __init__(self, username, password, ttl=None, refresh_margin=None, token_file=None):
+        api_config = CONFIG["api"]
+        self.username = username
+        self.password = password
+        self.ttl = ttl if ttl is not None else api_config.get("token_ttl_seconds", 3600)
+        self.refresh_margin = (refresh_margin if refresh_margin is not None
+                               else api_config.get("token_refresh_margin_seconds", 300))
+        self.token_file = token_file if token_file is not None else api_config.get("token_cache_file")
+        if self.token_file and not os.path.isabs(self.token_file):
+            self.token_file = os.path.join(os.path.dirname(__file__), self.token_file)
+        self.token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+        self.load_token_file()
+
+    def __getstate__(self):
+        # Sent to sharded worker processes: they get the current token and log in again on expiry,
+        # but leave the token file to the parent process
+        state = dict(self.__dict__, token_file=None)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def has_valid_token(self):
+        """Return True if a cached token can be used without logging in"""
+        return self.token is not None and time.time() < self.expires_at - self.refresh_margin
+
+    def get_token(self):
+        """Return a valid token, logging in first if the cached one is missing or about to expire"""
+        with self.lock:
+            if not self.has_valid_token():
+                self.authenticate()
+            return self.token
+
+    def refresh(self, stale_token=None):
+        """Force re-authentication, e.g. after a 401
+
+        If another thread already replaced stale_token, its new token is returned instead of
+        logging in again.
+        """
+        with self.lock:
+            if stale_token is None or stale_token == self.token:
+                self.authenticate()
+            return self.token
+
+    def authenticate(self):
+        self.token = login(self.username, self.password)
+        self.expires_at = time.time() + self.ttl
+        self.save_token_file()
+
+    # -- Encrypted token file --
+    def cache_key(self):
+        return hashlib.sha256(f"{BASE_URL}|{self.username}".encode("utf-8")).hexdigest()
+
+    def fernet(self, salt):
+        from cryptography.fernet import Fernet
+        key = hashlib.pbkdf2_hmac("sha256", self.password.encode("utf-8"), salt, 200_000)
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    def read_token_file(self):
+        try:
+            with open(self.token_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def load_token_file(self):
+        if not self.token_file:
+            return
+        entry = self.read_token_file().get(self.cache_key())
+        if not entry or entry.get("expires_at", 0) <= time.time():
+            return
+        try:
+            from cryptography.fernet import InvalidToken
+            salt = base64.b64decode(entry["salt"])
+            self.token = self.fernet(salt).decrypt(entry["token"].encode("ascii")).decode("utf-8")
+            self.expires_at = entry["expires_at"]
+        except ImportError:
+            return
+        except (InvalidToken, KeyError, ValueError):
+            # Wrong password or corrupt entry: fall back to a normal login
+            self.token = None
+            self.expires_at = 0
+
+    def save_token_file(self):
+        if not self.token_file:
+            return
+        try:
+            salt = os.urandom(16)
+            encrypted = self.fernet(salt).encrypt(self.token.encode("utf-8")).decode("ascii")
+        except ImportError:
+            return
+        entries = self.read_token_file()
+        entries[self.cache_key()] = {
+            "salt": base64.b64encode(salt).decode("ascii"),
+            "token": encrypted,
+            "expires_at": self.expires_at
+        }
+        os.makedirs(os.path.dirname(self.token_file) or ".", exist_ok=True)
+        with open(self.token_file, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+def get_token_manager(username, password):
+    """Return the shared TokenManager for these credentials, so tokens are reused across reports"""
+    key = (BASE_URL, username)
+    with _token_managers_lock:
+        manager = _token_managers.get(key)
+        if manager is None or manager.password != password:
+            manager = TokenManager(username, password)
+            _token_managers[key] = manager
+        return manager
+
+def auth_token(token):
+    """Return the raw auth token from either a token string or a TokenManager"""
+    if isinstance(token, TokenManager):
+        return token.get_token()
+    return token
+
+# --- API Helpers ---
+_json_loads = None
+
+def json_loads():
+    """Return the JSON decoder: orjson.loads when orjson is installed, otherwise json.loads"""
+    global _json_loads
+    if _json_loads is None:
+        try:
+            import orjson
+            _json_loads = orjson.loads
+        except ImportError:
+            _json_loads = json.loads
+    return _json_loads
+
+def decode_response(response):
+    """Decode a JSON response straight from its body bytes, skipping the text decode of response.json()"""
+    return json_loads()(response.content)
+
+def login(username, password):
+    """Authenticate with the API and return token"""
+    url = f"{BASE_URL}/login"
+    payload = {"username": username, "psw": password, "auth_type": CONFIG["api"]["auth_type"]}
+    try:
+        r = post_with_retry(url, json=payload)
+        r.raise_for_status()
+        response_data = r.json()
+        if "token" not in response_data:
+            raise ValueError(f"Login response missing token. Response: {response_data}")
+        return response_data["token"]
+    except requests.exceptions.RequestException as e:
+        raise ValueError(f"Login request failed: {e}")
+    except KeyError as e:
+        raise ValueError(f"Login response missing expected field: {e}. Response: {response_data}")
+
+def post_report(url, payload, token, session=None):
+    """POST a report request and return the decoded response
+
+    token is either a raw auth token or a TokenManager. With a TokenManager an expired token
+    (401) is refreshed and the same page retried once, so long paged reports survive expiry.
+    """
+    current_token = auth_token(token)
+    headers = {
+        "X-Redcat-Authtoken": current_token,
+        "Content-Type": "application/json"
+    }
+    response = post_with_retry(url, session=session, headers=headers, json=payload)
+    if response.status_code == 401 and isinstance(token, TokenManager):
+        headers["X-Redcat-Authtoken"] = token.refresh(stale_token=current_token)
+        response = post_with_retry(url, session=session, headers=headers, json=payload)
+    response.raise_for_status()
+    metrics = getattr(session, "metrics", None)
+    if metrics is None:
+        return decode_response(response)
+    with metrics.stage("decode"):
+        return decode_response(response)
+
+def get_stampcard_summary(token, start=0, limit=1000, order_by="MemberNo", order_direction="desc", filters=None,
+                          session=None):
+    """Get stampcard summary report"""
+    url = f"{BASE_URL}/reports/loyalty/stampcards_summary"
+    payload = {
+        "Fields": SUMMARY_FIELDS,
+        "Order": [[order_by, order_direction]],
+        "Start": start,
+        "Limit": limit
+    }
+    if filters:
+        payload["Filters"] = filters
+    
+    return post_report(url, payload, token, session=session)
+
+def get_stampcard_transactions(token, start=0, limit=1000, order_by="MemberSalesHeaderRecid", order_direction="desc",
+                               filters=None, session=None):
+    """Get stampcard transactions report"""
+    url = f"{BASE_URL}/reports/loyalty/stampcards_transactions"
+    payload = {
+        "Fields": TRANSACTION_FIELDS,
+        "Order": [[order_by, order_direction]],
+        "Start": start,
+        "Limit": limit
+    }
+    if filters:
+        payload["Filters"] = filters
+    
+    return post_report(url, payload, token, session=session)
+
+REPORT_FETCHERS = {"summary": get_stampcard_summary, "transactions": get_stampcard_transactions}
+DEFAULT_ORDER_FIELDS = {"summary": "MemberNo", "transactions": "MemberSalesHeaderRecid", "members": "MemberNo"}
+
+def extract_records(data):
+    """Return the record list from either API response format (direct list or dict with 'data' key)"""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict) and 'data' in data:
+        return data['data'] or []
+    raise ValueError(f"Unexpected API response format: {type(data)}")
+
+def fetch_report_pages(fetch_page, token, limit=None, page_size=None, order_by=None, order_direction="desc",
+                       progress_callback=None, max_workers=None, start=0, filters=None, session=None):
+    """Yield pages of records from a report helper, walking Start/Limit until the report is exhausted
+
+    fetch_page is get_stampcard_summary or get_stampcard_transactions. Paging begins at Start
+    offset start; limit caps the total number of records returned from there (None fetches
+    everything). Up to max_workers pages are requested at once
+    over the shared session, but pages are always yielded in Start order so the requested Order
+    is preserved. progress_callback, if given, is called after each page with
+    (pages_fetched, records_fetched). filters (see filter_conditions) are sent with every
+    request; pages are yielded as the server returns them, see filter_records for the fallback.
+    Requests go over session if given, e.g. a job's CancellableSession.
+    """
+    if page_size is None:
+        page_size = CONFIG["reports"].get("page_size", DEFAULT_PAGE_SIZE)
+    if max_workers is None:
+        max_workers = CONFIG["reports"].get("max_workers", DEFAULT_MAX_WORKERS)
+    if page_size < 1:
+        raise ValueError("Page size must be a positive integer")
+    if max_workers < 1:
+        raise ValueError("Max workers must be a positive integer")
+    reserve_concurrency(session if session is not None else get_session(), max_workers)
+
+    kwargs = {"order_direction": order_direction}
+    if order_by:
+        kwargs["order_by"] = order_by
+    if filters:
+        kwargs["filters"] = filters
+    if session is not None:
+        kwargs["session"] = session
+
+    total_pages = None if limit is None else -(-limit // page_size)
+    pages_fetched = 0
+    records_fetched = 0
+    in_flight = deque()
+    next_page = 0
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-page")
+    try:
+        while True:
+            # Keep the pool busy with the next pages while earlier ones are consumed in order
+            while len(in_flight) < max_workers and (total_pages is None or next_page < total_pages):
+                offset = next_page * page_size
+                size = page_size if limit is None else min(page_size, limit - offset)
+                in_flight.append((executor.submit(fetch_page, token, start=start + offset, limit=size, **kwargs), size))
+                next_page += 1
+            if not in_flight:
+                break
+
+            future, size = in_flight.popleft()
+            records = extract_records(wait_for_result(future, session))
+            pages_fetched += 1
+            records_fetched += len(records)
+            if progress_callback:
+                progress_callback(pages_fetched, records_fetched)
+            if records:
+                yield records
+            # A short page means the server has no more rows
+            if len(records) < size:
+                break
+    finally:
+        # Drop pages requested past the end of the report (or after the consumer stopped)
+        shutdown_now(executor, [future for future, _ in in_flight])
+
+def shutdown_now(executor, futures):
+    """Shut an executor down without waiting, cancelling those futures that have not started
+
+    Same as shutdown(wait=False, cancel_futures=True), which needs Python 3.9.
+    """
+    for future in futures:
+        future.cancel()
+    executor.shutdown(wait=False)
+
+def wait_for_result(future, session=None):
+    """Return a future's result, raising ReportCancelled as soon as a CancellableSession is cancelled"""
+    if not isinstance(session, CancellableSession):
+        return future.result()
+    while True:
+        session.check_cancelled()
+        try:
+            return future.result(timeout=0.1)
+        except FutureTimeoutError:
+            pass
+
+def member_view_pages(token, filters=None, page_size=None, max_workers=None, progress_callback=None, session=None):
+    """Start paging through the summary and transactions reports for the member view
+
+    Returns (summary pages, transaction pages); consume them concurrently so both downloads
+    overlap. filters may only hold conditions both reports have fields for (MemberNo ranges);
+    they are sent to the server and applied to both sides with filter_records as well.
+    progress_callback gets the pages and records received from both reports together.
+    """
+    received = {}
+    lock = threading.Lock()
+
+    def source_progress(report_type):
+        if progress_callback is None:
+            return None
+
+        def report(pages, records):
+            with lock:
+                received[report_type] = (pages, records)
+                totals = [sum(counts) for counts in zip(*received.values())]
+            progress_callback(*totals)
+        return report
+
+    return tuple(
+        filtered_pages(fetch_report_pages(REPORT_FETCHERS[report_type], token, page_size=page_size,
+                                          order_by=DEFAULT_ORDER_FIELDS[report_type], order_direction="asc",
+                                          progress_callback=source_progress(report_type), max_workers=max_workers,
+                                          filters=filters, session=session),
+                       report_fields(report_type), filters)
+        for report_type in ("summary", "transactions")
+    )
+
+# --- Report Filters ---
+# Filter options -> (report field, operator); date_to is inclusive, so it is sent as "< next day"
+FILTER_OPTIONS = {
+    "date_from": ("TxnDate", ">="),
+    "date_to": ("TxnDate", "<"),
+    "store": ("StoreName", "="),
+    "member_from": ("MemberNo", ">="),
+    "member_to": ("MemberNo", "<=")
+}
+FILTER_OPERATORS = {
+    ">=": lambda value, bound: value >= bound,
+    "<=": lambda value, bound: value <= bound,
+    "<": lambda value, bound: value < bound,
+    "=": lambda value, bound: value == bound
+}
+
+def parse_filter_date(value):
+    """Accept a date, datetime or YYYY-MM-DD string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"Invalid date: {value} (expected YYYY-MM-DD)") from None
+
+def filter_conditions(report_type, filters):
+    """Turn filter options (date_from, date_to, store, member_from, member_to) into API conditions
+
+    Returns a list of [field, operator, value] conditions as sent in the request "Filters";
+    options that are None or empty are skipped. Raises ValueError for options the report has no
+    field for, or for empty ranges.
+    """
+    conditions = []
+    fields = report_fields(report_type)
+    for option, value in (filters or {}).items():
+        if value is None or value == "":
+            continue
+        if option not in FILTER_OPTIONS:
+            raise ValueError(f"Unknown filter: {option}. Choose from: {', '.join(FILTER_OPTIONS)}")
+        field, operator = FILTER_OPTIONS[option]
+        if field not in fields:
+            raise ValueError(f"The {report_type} report cannot be filtered by {field}")
+        if option == "date_from":
+            value = parse_filter_date(value).isoformat()
+        elif option == "date_to":
+            value = (parse_filter_date(value) + timedelta(days=1)).isoformat()
+        elif field == "MemberNo":
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid member number: {value}") from None
+        else:
+            value = str(value).strip()
+        conditions.append([field, operator, value])
+
+    bounds = {option: value for option, value in (filters or {}).items() if value not in (None, "")}
+    if "date_from" in bounds and "date_to" in bounds and \
+            parse_filter_date(bounds["date_from"]) > parse_filter_date(bounds["date_to"]):
+        raise ValueError("The start date must not be after the end date")
+    if "member_from" in bounds and "member_to" in bounds and int(bounds["member_from"]) > int(bounds["member_to"]):
+        raise ValueError("The first member number must not be greater than the last")
+    return conditions
+
+# Converts a record value for comparison against a condition; integer keys (including the
+# MemberSalesHeaderRecid ranges of sharded extracts) must not be compared as text
+FILTER_CONVERTERS = {
+    "TxnDate": lambda value: to_timestamp(value),
+    "MemberNo": int,
+    "MemberSalesHeaderRecid": int,
+    "StoreName": str
+}
+
+def filter_records(records, fields, conditions):
+    """Client-side fallback for servers that ignore "Filters": keep records matching every condition
+
+    Records (dicts or lists in field order) whose value is missing or cannot be compared are
+    dropped. Applying it to pages the server already filtered is cheap and changes nothing.
+    """
+    if not conditions or not records:
+        return records
+    checks = []
+    for field, operator, bound in conditions:
+        key = field if isinstance(records[0], dict) else fields.index(field)
+        convert = FILTER_CONVERTERS.get(field, str)
+        checks.append((key, FILTER_OPERATORS[operator], convert, convert(bound)))
+
+    def matches(record):
+        for key, compare, convert, bound in checks:
+            try:
+                value = record[key]
+                if value is None or not compare(convert(value), bound):
+                    return False
+            except (IndexError, KeyError, TypeError, ValueError):
+                return False
+        return True
+
+    return [record for record in records if matches(record)]
+
+def filtered_pages(pages, fields, conditions, limit=None):
+    """Pass pages through filter_records, stopping once limit matching records were yielded
+
+    Fetch the pages without a limit when there are conditions, since rows a server ignoring
+    "Filters" returns would otherwise count towards it.
+    """
+    matched = 0
+    try:
+        for page in pages:
+            page = filter_records(page, fields, conditions)
+            if limit is not None:
+                page = page[:limit - matched]
+            matched += len(page)
+            if page:
+                yield page
+            if limit is not None and matched >= limit:
+                break
+    finally:
+        if hasattr(pages, "close"):
+            pages.close()
+
+# --- Report Checkpoints ---
+def get_checkpoint_dir():
+    """Return the absolute directory where report checkpoints are kept"""
+    path = CONFIG.get("jobs", {}).get("checkpoint_dir", "cache/checkpoints")
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), path)
+    return path
+
+class ReportCheckpoint:
+    """On-disk checkpoint of a paged report pull, so an interrupted run can resume
+
+    The cursor (report type, fields, ordering, page size, limit and the next Start offset) is
+    kept in <job id>.json and completed pages are appended to <job id>.pages.jsonl. The job id
+    is derived from the request parameters, so running the same report again finds the
+    checkpoint. A page is always written before the cursor that counts it, so a crash between
+    the two only costs refetching that page. The cursor also keeps the last saved record, to
+    check that the report has not shifted before resuming (see checkpoint_is_current).
+    """
+
+    def __init__(self, report_type, fields, order_by, order_direction, page_size, limit, directory=None,
+                 filters=None):
+        self.cursor = {
+            "report_type": report_type,
+            "base_url": BASE_URL,
+            "fields": list(fields),
+            "order": [[order_by, order_direction]],
+            "filters": [list(condition) for condition in filters or []],
+            "page_size": page_size,
+            "limit": limit
+        }
+        self.job_id = hashlib.sha1(json.dumps(self.cursor, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self.directory = directory or get_checkpoint_dir()
+        self.manifest_path = os.path.join(self.directory, f"{self.job_id}.json")
+        self.pages_path = os.path.join(self.directory, f"{self.job_id}.pages.jsonl")
+        self.pages_completed = 0
+        self.records_completed = 0
+        self.next_start = 0
+        self.last_record = None
+        self.pages_file = None
+
+    def load(self):
+        """Load an existing checkpoint for this job; returns True if there is one to resume"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if manifest.get("cursor") != self.cursor:
+            return False
+        self.pages_completed = manifest["pages_completed"]
+        self.records_completed = manifest["records_completed"]
+        self.next_start = manifest["next_start"]
+        self.last_record = manifest.get("last_record")
+        return self.pages_completed > 0
+
+    def saved_pages(self):
+        """Yield the pages completed by the interrupted run"""
+        with open(self.pages_path, 'r', encoding='utf-8') as f:
+            for index, line in enumerate(f):
+                # Lines past the cursor belong to a page whose cursor update never happened
+                if index >= self.pages_completed:
+                    break
+                yield json.loads(line)
+
+    def record_page(self, records, next_start):
+        """Durably append a completed page, then advance the cursor past it"""
+        if self.pages_file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.truncate_pages_file()
+            self.pages_file = open(self.pages_path, 'a', encoding='utf-8')
+        self.pages_file.write(json.dumps(records, ensure_ascii=False) + "\n")
+        self.pages_file.flush()
+        os.fsync(self.pages_file.fileno())
+
+        self.pages_completed += 1
+        self.records_completed += len(records)
+        self.next_start = next_start
+        if records:
+            self.last_record = records[-1]
+        manifest = {
+            "cursor": self.cursor,
+            "pages_completed": self.pages_completed,
+            "records_completed": self.records_completed,
+            "next_start": self.next_start,
+            "last_record": self.last_record,
+            "updated_at": datetime.now().isoformat()
+        }
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def truncate_pages_file(self):
+        """Drop any partial page written after the last cursor update"""
+        if not os.path.exists(self.pages_path):
+            return
+        with open(self.pages_path, 'r+', encoding='utf-8') as f:
+            for _ in range(self.pages_completed):
+                f.readline()
+            f.truncate(f.tell())
+
+    def close(self):
+        if self.pages_file:
+            self.pages_file.close()
+            self.pages_file = None
+
+    def discard(self):
+        """Delete the checkpoint, e.g. once the report has completed"""
+        self.close()
+        for path in (self.manifest_path, self.pages_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.pages_completed = self.records_completed = self.next_start = 0
+        self.last_record = None
+
+def checkpoint_is_current(checkpoint, fetch_page, token, filters=None, session=None):
+    """Return True if the report still has the checkpoint's last saved record at the same offset
+
+    Rows added or removed ahead of the resume point since the checkpoint was written (e.g. new
+    transactions in the default newest-first order) shift every later offset, so resuming would
+    skip or repeat rows.
+    """
+    if checkpoint.last_record is None:
+        return False
+    order_by, order_direction = checkpoint.cursor["order"][0]
+    kwargs = {"order_direction": order_direction, "filters": filters or None, "session": session}
+    if order_by:
+        kwargs["order_by"] = order_by
+    records = extract_records(fetch_page(token, start=checkpoint.next_start - 1, limit=1, **kwargs))
+    return bool(records) and records[0] == checkpoint.last_record
+
+def resumable_report_pages(fetch_page, token, report_type, limit=None, page_size=None, order_by=None,
+                           order_direction="desc", progress_callback=None, max_workers=None, resume=True,
+                           checkpoint_dir=None, resume_callback=None, filters=None, session=None,
+                           stale_callback=None):
+    """Yield report pages like fetch_report_pages, checkpointing each one to disk
+
+    If an earlier run of the same report was interrupted, its saved pages are yielded first and
+    fetching continues from the saved Start offset. The checkpoint is deleted once the report is
+    exhausted; if the consumer stops early it is kept for next time. resume_callback, if given,
+    is called with (pages, records) before saved pages are replayed. A checkpoint the report has
+    shifted past since (see checkpoint_is_current) is discarded instead and the pull starts over,
+    after calling stale_callback with the (pages, records) it held.
+
+    filters (see filter_conditions) are sent to the server and also applied to every page with
+    filter_records, in case the server ignores them; limit then counts matching records.
+    """
+    if page_size is None:
+        page_size = CONFIG["reports"].get("page_size", DEFAULT_PAGE_SIZE)
+    fields = report_fields(report_type)
+    checkpoint = ReportCheckpoint(report_type, fields, order_by, order_direction, page_size, limit,
+                                  directory=checkpoint_dir, filters=filters)
+    matched = 0
+
+    def matching(page):
+        # Apply the client-side filter and trim the page to the records still wanted
+        page = filter_records(page, fields, filters)
+        return page if limit is None else page[:limit - matched]
+
+    if resume and checkpoint.load():
+        if checkpoint_is_current(checkpoint, fetch_page, token, filters, session=session):
+            if resume_callback:
+                resume_callback(checkpoint.pages_completed, checkpoint.records_completed)
+            for page in checkpoint.saved_pages():
+                page = matching(page)
+                matched += len(page)
+                if page:
+                    yield page
+        else:
+            if stale_callback:
+                stale_callback(checkpoint.pages_completed, checkpoint.records_completed)
+            checkpoint.discard()
+    elif not resume:
+        checkpoint.discard()
+
+    # Without filters every fetched record counts towards the limit; with them the server may
+    # return non-matching rows, so keep paging until enough records match
+    remaining = None if limit is None or filters else limit - matched
+    pages = None
+    try:
+        if limit is None or matched < limit:
+            pages = fetch_report_pages(fetch_page, token, limit=remaining, page_size=page_size, order_by=order_by,
+                                       order_direction=order_direction, max_workers=max_workers,
+                                       start=checkpoint.next_start, filters=filters, session=session)
+            for page in pages:
+                checkpoint.record_page(page, checkpoint.next_start + page_size)
+                page = matching(page)
+                matched += len(page)
+                if progress_callback:
+                    progress_callback(checkpoint.pages_completed, matched)
+                if page:
+                    yield page
+                if limit is not None and matched >= limit:
+                    break
+    finally:
+        if pages is not None:
+            pages.close()
+        checkpoint.close()
+    checkpoint.discard()
+
+# --- Sharded Extraction ---
+# Shards split a report into disjoint ranges of its integer key
+SHARD_KEYS = {"summary": "MemberNo", "transactions": "MemberSalesHeaderRecid"}
+
+def key_range(fetch_page, token, key_field, filters=None, session=None):
+    """Return the (lowest, highest) key matching filters, or None if the report is empty
+
+    Also returns None when the server ignores "Filters", since shards would then each download
+    the whole report.
+    """
+    conditions = list(filters or [])
+    lowest = extract_records(fetch_page(token, start=0, limit=1, order_by=key_field, order_direction="asc",
+                                        filters=conditions or None, session=session))
+    highest = extract_records(fetch_page(token, start=0, limit=1, order_by=key_field, order_direction="desc",
+                                         filters=conditions or None, session=session))
+    if not lowest or not highest:
+        return None
+    index = 0 if isinstance(lowest[0], list) else key_field
+    low, high = int(lowest[0][index]), int(highest[0][index])
+    beyond = extract_records(fetch_page(token, start=0, limit=1, order_by=key_field, order_direction="asc",
+                                        filters=conditions + [[key_field, ">=", high + 1]], session=session))
+    if beyond:
+        return None
+    return low, high
+
+def shard_ranges(low, high, shards):
+    """Split the inclusive key range low..high into up to shards [start, end) ranges of equal width"""
+    span = high - low + 1
+    shards = max(1, min(shards, span))
+    bounds = [low + span * index // shards for index in range(shards + 1)]
+    return [(bounds[index], bounds[index + 1]) for index in range(shards) if bounds[index] < bounds[index + 1]]
+
+def init_shard_worker(base_url):
+    """Process pool initializer: use the parent's API URL and open fresh connections"""
+    global BASE_URL, _session
+    BASE_URL = base_url
+    _session = None
+
+def fetch_shard(report_type, token, key_range, order_by, order_direction, filters, page_size, max_workers, path,
+                limit=None):
+    """Fetch one key range of a report into a JSON Lines file (one page per line) in a worker process
+
+    token is a raw token or a TokenManager, which logs in again after a 401 like on the unsharded
+    path. limit caps the records fetched, since the first limit records of the merged report are
+    among the first limit records of every shard. Returns (pages, records) fetched.
+    """
+    key_field = SHARD_KEYS[report_type]
+    conditions = list(filters or []) + [[key_field, ">=", key_range[0]], [key_field, "<", key_range[1]]]
+    fields = report_fields(report_type)
+    pages = records = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for page in fetch_report_pages(REPORT_FETCHERS[report_type], token, limit=limit, page_size=page_size,
+                                       order_by=order_by, order_direction=order_direction,
+                                       max_workers=max_workers, filters=conditions):
+            page = filter_records(page, fields, conditions)
+            f.write(json.dumps(page, ensure_ascii=False) + "\n")
+            pages += 1
+            records += len(page)
+    return pages, records
+
+def wait_for_shard(result, session=None):
+    """Return a shard's (pages, records) from the process pool, stopping once a CancellableSession is cancelled"""
+    while isinstance(session, CancellableSession) and not result.ready():
+        session.check_cancelled()
+        result.wait(0.1)
+    return result.get()
+
+def read_shard_records(path):
+    """Yield the records of a shard file in order"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield from json.loads(line)
+
+def sharded_report_pages(report_type, token, shards, limit=None, page_size=None, order_by=None,
+                         order_direction="desc", progress_callback=None, max_workers=None, filters=None,
+                         session=None):
+    """Yield report pages fetched as disjoint key-range shards by a pool of worker processes
+
+    The report's key range (SHARD_KEYS) is split into up to shards ranges, each paged through
+    with its own Start offsets, so no request goes deeper than its shard. Shards are staged in
+    temporary files and merged back into the requested order: concatenated when ordering by the
+    key, otherwise merged with heapq. progress_callback is called with (pages, records) as
+    shards finish. Falls back to fetch_report_pages when the report cannot be sharded, filtering
+    its pages locally like every other path. With a limit each shard fetches at most limit
+    records. The key range is probed over session. The worker processes are terminated as soon
+    as the consumer stops, the job fails or a CancellableSession is cancelled.
+    """
+    fetch_page = REPORT_FETCHERS[report_type]
+    if page_size is None:
+        page_size = CONFIG["reports"].get("page_size", DEFAULT_PAGE_SIZE)
+    if max_workers is None:
+        max_workers = CONFIG["reports"].get("max_workers", DEFAULT_MAX_WORKERS)
+    key_field = SHARD_KEYS[report_type]
+    order_by = order_by or key_field
+    fields = report_fields(report_type)
+
+    bounds = key_range(fetch_page, token, key_field, filters, session=session) if shards > 1 else None
+    if bounds is None:
+        pages = fetch_report_pages(fetch_page, token, limit=None if filters else limit, page_size=page_size,
+                                   order_by=order_by, order_direction=order_direction,
+                                   progress_callback=progress_callback, max_workers=max_workers, filters=filters,
+                                   session=session)
+        yield from filtered_pages(pages, fields, filters, limit)
+        return
+    ranges = shard_ranges(bounds[0], bounds[1], shards)
+    descending = str(order_direction).lower() != "asc"
+    # Shards in key order: heapq.merge takes ties from earlier shards first, so rows with equal
+    # order_by values keep coming in key order too
+    if descending:
+        ranges.reverse()
+
+    # Log in once here rather than in every worker; a TokenManager travels to the workers so
+    # each can refresh the token after a 401
+    auth_token(token)
+    # Connections are shared between the worker processes
+    threads_per_shard = max(1, max_workers // len(ranges))
+    directory = tempfile.mkdtemp(prefix="report-shards-")
+    paths = [os.path.join(directory, f"shard-{index}.jsonl") for index in range(len(ranges))]
+    pool = multiprocessing.get_context("spawn").Pool(len(ranges), initializer=init_shard_worker,
+                                                     initargs=(BASE_URL,))
+    try:
+        results = [
+            pool.apply_async(fetch_shard, (report_type, token, shard, order_by, order_direction, filters,
+                                           page_size, threads_per_shard, path, limit))
+            for shard, path in zip(ranges, paths)
+        ]
+        pages_fetched = records_fetched = 0
+
+        def shard_done(result):
+            nonlocal pages_fetched, records_fetched
+            pages, records = wait_for_shard(result, session)
+            pages_fetched += pages
+            records_fetched += records
+            if progress_callback:
+                progress_callback(pages_fetched, records_fetched)
+
+        def shards_in_order():
+            for result, path in zip(results, paths):
+                shard_done(result)
+                yield from read_shard_records(path)
+
+        if order_by == key_field:
+            # Shards are disjoint key ranges already in order, so each is passed on as soon as it is done
+            records = shards_in_order()
+        else:
+            for result in results:
+                shard_done(result)
+            index = fields.index(order_by)
+
+            def sort_key(record):
+                value = record[order_by] if isinstance(record, dict) else record[index]
+                # Missing values sort last ascending, like most SQL servers do with NULLs
+                return (value is None) != descending, value if value is not None else 0
+
+            records = heapq.merge(*(read_shard_records(path) for path in paths), key=sort_key,
+                                  reverse=descending)
+
+        page = []
+        yielded = 0
+        for record in records:
+            page.append(record)
+            yielded += 1
+            if len(page) == page_size or yielded == limit:
+                yield page
+                page = []
+            if yielded == limit:
+                break
+        if page:
+            yield page
+    finally:
+        # Stop shards that are still downloading after the consumer stopped, failed or cancelled
+        pool.terminate()
+        pool.join()
+        shutil.rmtree(directory, ignore_errors=True)
+
+# --- Exporters ---
+def report_fields(report_type):
+    """Return the field list requested for a report type"""
+    return REPORT_FIELDS.get(report_type, [])
+
+def record_to_row(record, fields):
+    """Return a record's values in field order regardless of format (dict or list)"""
+    if isinstance(record, dict):
+        return [record.get(field) for field in fields]
+    # List records already follow the Fields order sent in the payload
+    return list(record)
+
+def record_to_dict(record, fields):
+    """Return a record as a dict keyed by field name regardless of format (dict or list)"""
+    if isinstance(record, dict):
+        return record
+    return dict(zip(fields, record))
+
+def frame_to_rows(frame):
+    """Convert a typed pandas DataFrame into plain Python rows (missing values become None)"""
+    return frame.astype(object).where(frame.notna(), None).values.tolist()
+
+def frame_to_json_lines(frame):
+    """Serialize a typed pandas DataFrame into one JSON object string per row"""
+    return frame.to_json(orient="records", lines=True, date_format="iso", force_ascii=False).splitlines()
+
+def report_metadata(report_type, total_records, generated_at=None):
+    """Build the metadata block written alongside exported reports"""
+    return {
+        'report_type': report_type,
+        'generated_at': generated_at or datetime.now().isoformat(),
+        'total_records': total_records
+    }
+
+class ReportWriter:
+    """Base class for exporters that write a report page by page
+
+    Only the current page is held in memory, so exports stay constant-size regardless of how
+    many records the report contains. Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, filename, report_type, fields):
+        self.filename = filename
+        self.report_type = report_type
+        self.fields = list(fields)
+        self.generated_at = datetime.now().isoformat()
+        self.total_records = 0
+        self.closed = False
+        self.open()
+
+    def open(self):
+        self.file = open(self.filename, 'w', newline='', encoding='utf-8')
+        self.write_header()
+
+    def write_header(self):
+        pass
+
+    def write_records(self, records):
+        raise NotImplementedError
+
+    def write_footer(self):
+        pass
+
+    def write_page(self, records):
+        """Append one page of records to the export"""
+        self.write_records(records)
+        self.total_records += len(records)
+
+    def write_frame_rows(self, frame):
+        self.write_records(frame_to_rows(frame))
+
+    def write_frame(self, frame):
+        """Append one page held as a typed pandas DataFrame, using vectorized conversions"""
+        if len(frame):
+            self.write_frame_rows(frame)
+            self.total_records += len(frame)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.write_footer()
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class CSVReportWriter(ReportWriter):
+    """Incrementally write report pages to a CSV file with a header row"""
+
+    def write_header(self):
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.fields)
+
+    def write_records(self, records):
+        self.writer.writerows(record_to_row(record, self.fields) for record in records)
+
+    def write_frame_rows(self, frame):
+        self.file.write(frame.to_csv(header=False, index=False, lineterminator="\r\n",
+                                     date_format="%Y-%m-%dT%H:%M:%S"))
+
+class JSONReportWriter(ReportWriter):
+    """Incrementally write report pages to a JSON document
+
+    The metadata keys come first and total_records is written after the data array, once the
+    final count is known.
+    """
+
+    def write_header(self):
+        self.file.write('{\n')
+        self.file.write(f'"report_type": {json.dumps(self.report_type)},\n')
+        self.file.write(f'"generated_at": {json.dumps(self.generated_at)},\n')
+        self.file.write('"data": [')
+        self.separator = '\n'
+
+    def write_records(self, records):
+        for record in records:
+            self.file.write(self.separator + json.dumps(record_to_dict(record, self.fields), ensure_ascii=False))
+            self.separator = ',\n'
+
+    def write_frame_rows(self, frame):
+        self.file.write(self.separator + ',\n'.join(frame_to_json_lines(frame)))
+        self.separator = ',\n'
+
+    def write_footer(self):
+        self.file.write('\n],\n')
+        self.file.write(f'"total_records": {self.total_records}\n')
+        self.file.write('}\n')
+
+class JSONLinesReportWriter(ReportWriter):
+    """Incrementally write report pages as JSON Lines, with metadata in a .meta.json sidecar"""
+
+    def write_records(self, records):
+        self.file.writelines(json.dumps(record_to_dict(record, self.fields), ensure_ascii=False) + '\n'
+                             for record in records)
+
+    def write_frame_rows(self, frame):
+        self.file.write('\n'.join(frame_to_json_lines(frame)) + '\n')
+
+    def write_footer(self):
+        sidecar = os.path.splitext(self.filename)[0] + '.meta.json'
+        with open(sidecar, 'w', encoding='utf-8') as metafile:
+            json.dump(report_metadata(self.report_type, self.total_records, self.generated_at), metafile, indent=2)
+
+# Arrow column types for typed (Parquet / Arrow IPC) exports; other fields are stored as strings
+ARROW_FIELD_TYPES = {
+    "MemberSalesHeaderRecid": "int64",
+    "MemberNo": "int64",
+    "CurrentStamps": "int64",
+    "CardsFilled": "int64",
+    "RewardsEarned": "int64",
+    "SaleStampsEarned": "int64",
+    "StoreName": "string",
+    "Amount": "decimal",
+    "TxnDate": "timestamp",
+    "Transactions": "int64",
+    "LastTxnDate": "timestamp",
+    "TotalAmount": "decimal",
+    "PreviousCurrentStamps": "int64",
+    "PreviousCardsFilled": "int64",
+    "PreviousRewardsEarned": "int64",
+    "Day": "timestamp",
+    "Week": "timestamp",
+    "Month": "timestamp"
+}
+ARROW_ROW_GROUP_SIZE = 65536
+
+def import_pyarrow():
+    """Import pyarrow on first use so it is only required for typed exports"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet/Arrow export requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+def to_int(value):
+    return None if value is None or value == "" else int(value)
+
+def to_decimal(value):
+    return None if value is None or value == "" else Decimal(str(value)).quantize(Decimal("0.01"))
+
+def to_string(value):
+    return None if value is None else str(value)
+
+def to_timestamp(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+
+class ArrowReportWriter(ReportWriter):
+    """Base class for typed columnar exports built on pyarrow
+
+    Pages are converted into typed Arrow columns (integer MemberNo, decimal Amount, timestamp
+    TxnDate) and buffered until a full row group is ready, so memory stays bounded by
+    ARROW_ROW_GROUP_SIZE rows.
+    """
+
+    CONVERTERS = {
+        "int64": to_int,
+        "decimal": to_decimal,
+        "timestamp": to_timestamp,
+        "string": to_string
+    }
+
+    def open(self):
+        pa = import_pyarrow()
+        self.pa = pa
+        arrow_types = {
+            "int64": pa.int64(),
+            "string": pa.string(),
+            "decimal": pa.decimal128(18, 2),
+            "timestamp": pa.timestamp("ms")
+        }
+        self.kinds = [ARROW_FIELD_TYPES.get(field, "string") for field in self.fields]
+        self.schema = pa.schema([
+            pa.field(field, arrow_types[kind]) for field, kind in zip(self.fields, self.kinds)
+        ], metadata={
+            "report_type": self.report_type,
+            "generated_at": self.generated_at
+        })
+        self.buffered_batches = []
+        self.buffered_rows = 0
+        self.file = self.open_file()
+
+    def open_file(self):
+        raise NotImplementedError
+
+    def write_table(self, table):
+        raise NotImplementedError
+
+    def write_records(self, records):
+        if not records:
+            return
+        rows = [record_to_row(record, self.fields) for record in records]
+        arrays = []
+        for index, (kind, field) in enumerate(zip(self.kinds, self.schema)):
+            convert = self.CONVERTERS[kind]
+            arrays.append(self.pa.array([convert(row[index]) if index < len(row) else None for row in rows],
+                                        type=field.type))
+        self.append_batch(arrays, len(rows))
+
+    def write_frame_rows(self, frame):
+        arrays = []
+        for kind, field in zip(self.kinds, self.schema):
+            column = frame[field.name]
+            if kind == "string":
+                values = frame_to_rows(column.to_frame())
+                arrays.append(self.pa.array([to_string(row[0]) for row in values], type=field.type))
+            elif kind == "decimal":
+                arrays.append(self.pa.array(column.round(2), from_pandas=True).cast(field.type))
+            else:
+                arrays.append(self.pa.array(column, from_pandas=True).cast(field.type))
+        self.append_batch(arrays, len(frame))
+
+    def append_batch(self, arrays, row_count):
+        self.buffered_batches.append(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.buffered_rows += row_count
+        if self.buffered_rows >= ARROW_ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.buffered_batches:
+            self.write_table(self.pa.Table.from_batches(self.buffered_batches, schema=self.schema))
+            self.buffered_batches = []
+            self.buffered_rows = 0
+
+    def write_footer(self):
+        self.flush()
+
+class ParquetReportWriter(ArrowReportWriter):
+    """Incrementally write report pages to a Parquet file, one row group per buffered batch"""
+
+    def open_file(self):
+        return self.pa.parquet.ParquetWriter(self.filename, self.schema, compression="snappy")
+
+    def write_table(self, table):
+        self.file.write_table(table)
+
+class ArrowIPCReportWriter(ArrowReportWriter):
+    """Incrementally write report pages to an Arrow IPC file (readable as Feather v2)"""
+
+    def open_file(self):
+        sink = self.pa.OSFile(self.filename, "wb")
+        self.ipc_writer = self.pa.ipc.new_file(sink, self.schema)
+        return sink
+
+    def write_table(self, table):
+        self.ipc_writer.write_table(table)
+
+    def write_footer(self):
+        super().write_footer()
+        # Closing the IPC writer writes the file footer; the sink itself is closed by close()
+        self.ipc_writer.close()
+
+REPORT_WRITERS = {
+    '.csv': CSVReportWriter,
+    '.json': JSONReportWriter,
+    '.jsonl': JSONLinesReportWriter,
+    '.parquet': ParquetReportWriter,
+    '.arrow': ArrowIPCReportWriter,
+    '.feather': ArrowIPCReportWriter
+}
+
+def open_report_writer(filename, report_type, fields=None):
+    """Open the streaming writer matching the file extension (.csv, .json, .jsonl, .parquet, .arrow or .feather)"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in REPORT_WRITERS:
+        raise ValueError(f"Unsupported export format: {extension or filename}")
+    return REPORT_WRITERS[extension](filename, report_type, fields or report_fields(report_type))
+
+def stream_report_to_file(pages, filename, report_type, fields=None, metrics=None):
+    """Write pages straight from the fetcher to an export file and return the record count
+
+    With metrics, time spent writing is recorded as the "export" stage.
+    """
+    with open_report_writer(filename, report_type, fields) as writer:
+        for page in pages:
+            if metrics is None:
+                writer.write_page(page)
+            else:
+                with metrics.stage("export"):
+                    writer.write_page(page)
+    return writer.total_records
+
+# --- Report Cache ---
+def get_cache_path():
+    """Return the absolute path of the SQLite report cache"""
+    path = CONFIG.get("cache", {}).get("path", "cache/reports.sqlite")
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), path)
+    return path
+
+def quote_identifier(name):
+    """Quote a field name for use as an SQLite identifier"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+class ReportCache:
+    """On-disk SQLite cache of fetched report rows
+
+    Each (report type, field set) pair gets its own table, so changing the requested Fields
+    never mixes incompatible rows. Transactions are keyed on MemberSalesHeaderRecid and only
+    ever grow; summaries are stored as a full snapshot that each refresh replaces.
+    """
+
+    KEY_FIELDS = {"transactions": "MemberSalesHeaderRecid", "summary": "MemberNo"}
+
+    def __init__(self, path=None):
+        self.path = path or get_cache_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        # Readers (e.g. a job serving a report from the cache) and the writer of another job don't block each other
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_meta ("
+            "table_name TEXT PRIMARY KEY, report_type TEXT, fields TEXT, refreshed_at TEXT)"
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def transaction(self):
+        """Context manager that commits on success and rolls back on error"""
+        return self.connection
+
+    def table_name(self, report_type, fields):
+        digest = hashlib.sha1(json.dumps(list(fields)).encode("utf-8")).hexdigest()[:12]
+        return f"{report_type}_{digest}"
+
+    def column_definitions(self, report_type, fields):
+        key_field = self.KEY_FIELDS.get(report_type)
+        return ", ".join(
+            quote_identifier(field) + (" PRIMARY KEY" if field == key_field else "") for field in fields
+        )
+
+    def ensure_table(self, report_type, fields):
+        """Create the table for a report type and field set if needed and return its name"""
+        table = self.table_name(report_type, fields)
+        columns = self.column_definitions(report_type, fields)
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS {quote_identifier(table)} ({columns})")
+        self.connection.execute(
+            "INSERT OR IGNORE INTO cache_meta (table_name, report_type, fields) VALUES (?, ?, ?)",
+            (table, report_type, json.dumps(list(fields)))
+        )
+        return table
+
+    def existing_table(self, report_type, fields):
+        """Return the table name for a report type and field set if it exists, else None (never writes)"""
+        table = self.table_name(report_type, fields)
+        row = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        return table if row else None
+
+    def insert_records(self, report_type, fields, records, table=None):
+        """Insert or replace records (dicts or lists) without committing
+
+        table defaults to the report's cache table; pass a staging_table() name to build a
+        replacement snapshot instead.
+        """
+        table = table or self.ensure_table(report_type, fields)
+        placeholders = ", ".join("?" for _ in fields)
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO {quote_identifier(table)} VALUES ({placeholders})",
+            (record_to_row(record, fields) for record in records)
+        )
+
+    def staging_table(self, report_type, fields):
+        """Create an empty temporary table to download a refresh into and return its name
+
+        Temporary tables live outside the cache file, so filling one takes no lock on the cache;
+        concurrent jobs only wait for each other while merge_table or replace_table copies the
+        rows in.
+        """
+        staging = "staging_" + self.table_name(report_type, fields)
+        self.connection.execute(f"DROP TABLE IF EXISTS temp.{quote_identifier(staging)}")
+        self.connection.execute(
+            f"CREATE TEMP TABLE {quote_identifier(staging)} ({self.column_definitions(report_type, fields)})"
+        )
+        return staging
+
+    def merge_table(self, report_type, fields, staging):
+        """Insert or replace the rows of a filled staging table into the cache without committing"""
+        table = self.ensure_table(report_type, fields)
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO {quote_identifier(table)} SELECT * FROM temp.{quote_identifier(staging)}"
+        )
+        self.connection.execute(f"DROP TABLE temp.{quote_identifier(staging)}")
+
+    def replace_table(self, report_type, fields, staging):
+        """Replace the cached snapshot with the rows of a filled staging table without committing"""
+        table = self.ensure_table(report_type, fields)
+        self.connection.execute(f"DELETE FROM {quote_identifier(table)}")
+        self.connection.execute(
+            f"INSERT INTO {quote_identifier(table)} SELECT * FROM temp.{quote_identifier(staging)}"
+        )
+        self.connection.execute(f"DROP TABLE temp.{quote_identifier(staging)}")
+
+    def mark_refreshed(self, report_type, fields):
+        table = self.ensure_table(report_type, fields)
+        self.connection.execute(
+            "UPDATE cache_meta SET refreshed_at = ? WHERE table_name = ?",
+            (datetime.now().isoformat(), table)
+        )
+
+    def refreshed_at(self, report_type, fields):
+        """Return when the cached rows were last refreshed (ISO timestamp), or None"""
+        row = self.connection.execute(
+            "SELECT refreshed_at FROM cache_meta WHERE table_name = ?",
+            (self.table_name(report_type, fields),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def max_value(self, report_type, fields, field):
+        """Return the highest cached value of a field, or None if nothing is cached"""
+        table = self.existing_table(report_type, fields)
+        if table is None:
+            return None
+        return self.connection.execute(
+            f"SELECT MAX({quote_identifier(field)}) FROM {quote_identifier(table)}"
+        ).fetchone()[0]
+
+    def count(self, report_type, fields):
+        """Return the number of cached rows"""
+        table = self.existing_table(report_type, fields)
+        if table is None:
+            return 0
+        return self.connection.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0]
+
+    def iter_pages(self, report_type, fields, order_by=None, order_direction="desc", limit=None, page_size=None,
+                   filters=None):
+        """Yield cached rows as pages of lists in field order, sorted and filtered like the API would"""
+        if page_size is None:
+            page_size = CONFIG["reports"].get("page_size", DEFAULT_PAGE_SIZE)
+        table = self.existing_table(report_type, fields)
+        if table is None:
+            return
+        query = f"SELECT * FROM {quote_identifier(table)}"
+        params = []
+        if filters:
+            clauses = []
+            for field, operator, value in filters:
+                if field not in fields or operator not in FILTER_OPERATORS:
+                    raise ValueError(f"Cannot filter cached {report_type} report by {field} {operator}")
+                clauses.append(f"{quote_identifier(field)} {operator} ?")
+                params.append(value)
+            query += " WHERE " + " AND ".join(clauses)
+        if order_by:
+            if order_by not in fields:
+                raise ValueError(f"Cannot order cached {report_type} report by unknown field: {order_by}")
+            direction = "ASC" if str(order_direction).lower() == "asc" else "DESC"
+            query += f" ORDER BY {quote_identifier(order_by)} {direction}"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        cursor = self.connection.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(page_size)
+            if not rows:
+                break
+            yield [list(row) for row in rows]
+
+def refresh_transactions_cache(cache, token, page_size=None, max_workers=None, progress_callback=None, session=None):
+    """Merge transactions newer than the highest cached MemberSalesHeaderRecid into the cache
+
+    Pages are requested newest first and fetching stops at the first page that reaches rows
+    already cached. New rows are downloaded into a staging table and merged in one short
+    transaction, so an interrupted refresh never leaves a gap below the new high-water mark and
+    other jobs can use the cache during the download. Returns the number of new rows.
+    """
+    fields = TRANSACTION_FIELDS
+    key_index = fields.index("MemberSalesHeaderRecid")
+    since = cache.max_value("transactions", fields, "MemberSalesHeaderRecid")
+    staging = cache.staging_table("transactions", fields)
+
+    new_rows = 0
+    pages = fetch_report_pages(
+        get_stampcard_transactions,
+        token,
+        page_size=page_size,
+        order_by="MemberSalesHeaderRecid",
+        order_direction="desc",
+        progress_callback=progress_callback,
+        max_workers=max_workers,
+        session=session
+    )
+    # Only the temporary staging table is written here
+    with cache.transaction():
+        try:
+            for page in pages:
+                rows = [record_to_row(record, fields) for record in page]
+                fresh = [row for row in rows if since is None or int(row[key_index]) > int(since)]
+                cache.insert_records("transactions", fields, fresh, table=staging)
+                new_rows += len(fresh)
+                if len(fresh) < len(rows):
+                    break
+        finally:
+            pages.close()
+    with cache.transaction():
+        cache.merge_table("transactions", fields, staging)
+        cache.mark_refreshed("transactions", fields)
+    return new_rows
+
+def refresh_summary_cache(cache, token, page_size=None, max_workers=None, progress_callback=None, session=None):
+    """Replace the cached summary snapshot with a fresh full download and return its row count
+
+    The download is staged like in refresh_transactions_cache and swapped in once complete.
+    """
+    fields = SUMMARY_FIELDS
+    staging = cache.staging_table("summary", fields)
+    total = 0
+    with cache.transaction():
+        for page in fetch_report_pages(get_stampcard_summary, token, page_size=page_size,
+                                       progress_callback=progress_callback, max_workers=max_workers,
+                                       session=session):
+            cache.insert_records("summary", fields, page, table=staging)
+            total += len(page)
+    with cache.transaction():
+        cache.replace_table("summary", fields, staging)
+        cache.mark_refreshed("summary", fields)
+    return total
+
+# --- Snapshot Diff ---
+SUMMARY_VALUE_FIELDS = [field for field in SUMMARY_FIELDS if field != "MemberNo"]
+# Change ("new", "changed" or "removed"), the member's current values and its values in the previous snapshot
+SUMMARY_DIFF_FIELDS = (["Change", "MemberNo"] + SUMMARY_VALUE_FIELDS
+                       + [f"Previous{field}" for field in SUMMARY_VALUE_FIELDS])
+
+def merge_snapshots(previous, current, key_index):
+    """Sorted-merge join of two row streams that are both in ascending key order
+
+    Yields (change, row, previous_row) for every key on either side, where change is "new",
+    "removed", "changed" or "unchanged". Only one row per side is held at a time.
+    """
+    previous_row = next(previous, None)
+    row = next(current, None)
+    last_key = None
+    while row is not None or previous_row is not None:
+        if row is not None and last_key is not None and row[key_index] <= last_key:
+            raise ValueError("The API did not return the summary in ascending MemberNo order; cannot diff it")
+        if row is None or (previous_row is not None and previous_row[key_index] < row[key_index]):
+            yield "removed", None, previous_row
+            previous_row = next(previous, None)
+            continue
+        last_key = row[key_index]
+        if previous_row is None or row[key_index] < previous_row[key_index]:
+            yield "new", row, None
+        else:
+            yield ("unchanged" if list(row) == list(previous_row) else "changed"), row, previous_row
+            previous_row = next(previous, None)
+        row = next(current, None)
+
+def summary_diff_row(change, row, previous_row, key_index):
+    """Build a SUMMARY_DIFF_FIELDS row from a member's current and previous summary rows"""
+    def values(summary_row):
+        if summary_row is None:
+            return [None] * len(SUMMARY_VALUE_FIELDS)
+        return [value for index, value in enumerate(summary_row) if index != key_index]
+    key = (row if row is not None else previous_row)[key_index]
+    return [change, key] + values(row) + values(previous_row)
+
+class SummaryDiff:
+    """Diff a fresh summary download against the cached snapshot, keyed on MemberNo
+
+    pages() yields only new, changed and removed members, as SUMMARY_DIFF_FIELDS rows in
+    MemberNo order. The download is written to a temporary staging table as it is compared and
+    replaces the snapshot in one short transaction once every page has been seen, so an
+    interrupted diff leaves the previous snapshot in place and other jobs can use the cache
+    meanwhile. Both sides are read in MemberNo order and
+    merge-joined, so memory use does not grow with the number of members.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.counts = {"new": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        self.previous_refresh = None
+
+    def pages(self, token, page_size=None, max_workers=None, progress_callback=None, session=None):
+        """Yield pages of changed members, then replace the cached snapshot with the download"""
+        if page_size is None:
+            page_size = CONFIG["reports"].get("page_size", DEFAULT_PAGE_SIZE)
+        cache = self.cache
+        fields = SUMMARY_FIELDS
+        key_index = fields.index("MemberNo")
+        self.previous_refresh = cache.refreshed_at("summary", fields)
+        staging = cache.staging_table("summary", fields)
+
+        downloaded = fetch_report_pages(get_stampcard_summary, token, page_size=page_size, order_by="MemberNo",
+                                        order_direction="asc", progress_callback=progress_callback,
+                                        max_workers=max_workers, session=session)
+        snapshot = cache.iter_pages("summary", fields, order_by="MemberNo", order_direction="asc",
+                                    page_size=page_size)
+
+        def current_rows():
+            for page in downloaded:
+                rows = [record_to_row(record, fields) for record in page]
+                cache.insert_records("summary", fields, rows, table=staging)
+                yield from rows
+
+        def previous_rows():
+            for page in snapshot:
+                yield from page
+
+        # Only the temporary staging table is written while comparing; the cache itself is locked
+        # just for the short swap at the end
+        with cache.transaction():
+            try:
+                changes = []
+                for change, row, previous_row in merge_snapshots(previous_rows(), current_rows(), key_index):
+                    self.counts[change] += 1
+                    if change != "unchanged":
+                        changes.append(summary_diff_row(change, row, previous_row, key_index))
+                        if len(changes) >= page_size:
+                            yield changes
+                            changes = []
+                if changes:
+                    yield changes
+            finally:
+                downloaded.close()
+                snapshot.close()
+        with cache.transaction():
+            cache.replace_table("summary", fields, staging)
+            cache.mark_refreshed("summary", fields)
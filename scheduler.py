@@ -0,0 +1,269 @@
+"""Recurring report exports configured in the schedule section of config.json
+
+Each job names a report (type, order, filters) and a destination file, and runs either every
+interval_minutes or on a cron expression. Jobs are queued and run one at a time, by the headless
+`python main.py schedule` command or inside the desktop app when reports.auto_export is on.
+"""
+import os
+import queue
+import threading
+from datetime import datetime, timedelta
+
+from reporting import CONFIG, REPORT_FIELDS, DEFAULT_ORDER_FIELDS, report_fields, filter_conditions
+
+# Destination extension of each export format
+EXPORT_EXTENSIONS = {"csv": ".csv", "json": ".json", "jsonl": ".jsonl", "parquet": ".parquet", "arrow": ".arrow"}
+AGGREGATE_CHOICES = ["store", "member", "day", "week", "month"]
+
+# --- Schedules ---
+# (lowest, highest) value of each cron field: minute, hour, day of month, month, day of week (0 = Sunday)
+CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+# A cron expression that matches nothing in this many days never will (Feb 29 recurs within 8 years)
+CRON_SEARCH_DAYS = 366 * 8
+
+def parse_cron_field(text, low, high):
+    """Parse one cron field (*, 5, 1-5, */15, 1-30/10 or a comma-separated list) into a set of values"""
+    values = set()
+    for part in text.split(","):
+        spec, _, step = part.partition("/")
+        try:
+            step = int(step) if step else 1
+            if spec == "*":
+                start, end = low, high
+            elif "-" in spec:
+                start, end = (int(value) for value in spec.split("-", 1))
+            else:
+                start = int(spec)
+                end = high if step > 1 else start
+        except ValueError:
+            raise ValueError(f"Invalid cron field: {text}") from None
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Invalid cron field: {text} (values must be within {low}-{high})")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronSchedule:
+    """Five-field cron expression in local time, e.g. "0 6 * * 1-5" for 06:00 on weekdays
+
+    As in cron, when both day of month and day of week are restricted a day matching either runs.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields (minute hour day month weekday): {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_RANGES))
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def __str__(self):
+        return f"cron {self.expression}"
+
+    def day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = moment.isoweekday() % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def first_run(self, now):
+        return self.next_after(now)
+
+    def next_after(self, moment):
+        """Return the first matching minute after moment"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        end = moment + timedelta(days=CRON_SEARCH_DAYS)
+        while moment < end:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+class IntervalSchedule:
+    """Run when the scheduler starts, then every interval"""
+
+    def __init__(self, minutes):
+        # bool is an int, but "interval_minutes": true is a mistake rather than 1 minute
+        if isinstance(minutes, bool) or not isinstance(minutes, (int, float)) or minutes <= 0:
+            raise ValueError(f"interval_minutes must be a positive number, not {minutes!r}")
+        self.interval = timedelta(minutes=minutes)
+
+    def __str__(self):
+        return f"every {self.interval.total_seconds() / 60:g} min"
+
+    def first_run(self, now):
+        return now
+
+    def next_after(self, moment):
+        return moment + self.interval
+
+# --- Scheduled Jobs ---
+class ScheduledJob:
+    """One entry of schedule.jobs: the report to run, the file to write and when to run it
+
+    out may contain {date} and {timestamp}, filled in with the run time so runs do not overwrite
+    each other. Options are validated here, so a broken entry fails when the schedule is loaded.
+    """
+
+    def __init__(self, config):
+        self.report_type = config.get("type", "summary")
+        if self.report_type not in REPORT_FIELDS:
+            raise ValueError(f"Unknown report type: {self.report_type}. Choose from: {', '.join(sorted(REPORT_FIELDS))}")
+        if not config.get("out"):
+            raise ValueError("Scheduled job needs an out file")
+        self.out = config["out"]
+        export_format = config.get("format")
+        if export_format:
+            if export_format not in EXPORT_EXTENSIONS:
+                raise ValueError(f"Unknown export format: {export_format}. Choose from: {', '.join(EXPORT_EXTENSIONS)}")
+            root, extension = os.path.splitext(self.out)
+            if not extension:
+                self.out = root + EXPORT_EXTENSIONS[export_format]
+            elif extension.lower() != EXPORT_EXTENSIONS[export_format]:
+                raise ValueError(f"out {self.out} does not match format {export_format}")
+        self.name = config.get("name") or f"{self.report_type} → {os.path.basename(self.out)}"
+
+        self.order_by = config.get("order_by") or DEFAULT_ORDER_FIELDS[self.report_type]
+        if self.order_by not in report_fields(self.report_type):
+            raise ValueError(f"Cannot order {self.report_type} report by {self.order_by}")
+        self.direction = config.get("direction", "desc")
+        if self.direction not in ("desc", "asc"):
+            raise ValueError(f"direction must be desc or asc, not {self.direction}")
+        # No default: reports.default_limit suits a quick look in the app, but would silently cut
+        # an unattended export (or the transactions behind an aggregate) short
+        if "limit" not in config:
+            raise ValueError("Scheduled job needs a limit (0 for all records)")
+        self.limit = config["limit"]
+        if isinstance(self.limit, bool) or not isinstance(self.limit, int) or self.limit < 0:
+            raise ValueError("limit must be 0 (all records) or a positive integer")
+        self.filters = config.get("filters") or {}
+        filter_conditions(self.report_type, self.filters)
+        self.aggregate = config.get("aggregate")
+        if self.aggregate and (self.report_type != "transactions" or self.aggregate not in AGGREGATE_CHOICES):
+            raise ValueError(f"aggregate must be one of {', '.join(AGGREGATE_CHOICES)} on a transactions report")
+        # Same default as the report command; cached runs only fetch what changed since the last refresh
+        self.cache = config.get("cache", CONFIG.get("cache", {}).get("enabled", False))
+        if not isinstance(self.cache, bool):
+            raise ValueError("cache must be true or false")
+
+        if "cron" in config:
+            self.schedule = CronSchedule(config["cron"])
+        elif "interval_minutes" in config:
+            self.schedule = IntervalSchedule(config["interval_minutes"])
+        else:
+            raise ValueError("Scheduled job needs interval_minutes or cron")
+        self.next_run = None
+        self.last_run = None
+        self.last_status = None
+
+    def output_path(self, moment):
+        return self.out.format(date=moment.strftime("%Y%m%d"), timestamp=moment.strftime("%Y%m%d_%H%M%S"))
+
+    def report_argv(self, moment):
+        """Arguments of the equivalent `main.py report` command for a run at moment"""
+        argv = ["report", "--type", self.report_type, "--out", self.output_path(moment),
+                "--order-by", self.order_by, "--direction", self.direction, "--limit", str(self.limit),
+                "--cache" if self.cache else "--no-cache"]
+        options = {"date_from": "--from-date", "date_to": "--to-date", "store": "--store",
+                   "member_from": "--member-from", "member_to": "--member-to"}
+        for option, value in self.filters.items():
+            if value not in (None, ""):
+                argv += [options[option], str(value)]
+        if self.aggregate:
+            argv += ["--aggregate", self.aggregate]
+        return argv
+
+def load_scheduled_jobs(config=None):
+    """Return the ScheduledJobs of config's schedule.jobs, raising ValueError for an invalid entry"""
+    jobs = []
+    for index, job_config in enumerate((config or CONFIG).get("schedule", {}).get("jobs", [])):
+        try:
+            jobs.append(ScheduledJob(job_config))
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"schedule.jobs[{index}]: {e}") from None
+    return jobs
+
+# --- Scheduler ---
+class ReportScheduler:
+    """Queue ScheduledJobs when they are due and run them one at a time on a worker thread
+
+    A job that comes due while its previous run is still queued or running is skipped instead of
+    queued twice, and jobs never run concurrently, so overlapping schedules do not add API load.
+    run_job(job) does the work; its exceptions are logged and the schedule carries on.
+    """
+
+    POLL_SECONDS = 1
+
+    def __init__(self, jobs, run_job, log=print):
+        self.jobs = jobs
+        self.run_job = run_job
+        self.log = log
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self, now=None):
+        now = now or datetime.now()
+        for job in self.jobs:
+            job.next_run = job.schedule.first_run(now)
+        self.threads = [threading.Thread(target=self.run_timer, daemon=True),
+                        threading.Thread(target=self.run_worker, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop queueing runs; a running job finishes, queued ones are dropped"""
+        self.stopping.set()
+        self.queue.put(None)
+
+    def join(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def check(self, now):
+        """Queue the jobs due at now and move their next run on"""
+        for job in self.jobs:
+            if job.next_run is None or job.next_run > now:
+                continue
+            job.next_run = job.schedule.next_after(now)
+            with self.lock:
+                if job in self.pending:
+                    self.log(f"Skipping {job.name}: its previous run is still queued or running")
+                    continue
+                self.pending.add(job)
+            self.queue.put(job)
+
+    def run_timer(self):
+        while not self.stopping.is_set():
+            self.check(datetime.now())
+            self.stopping.wait(self.POLL_SECONDS)
+
+    def run_worker(self):
+        while True:
+            job = self.queue.get()
+            if job is None or self.stopping.is_set():
+                return
+            job.last_run = datetime.now()
+            try:
+                self.run_job(job)
+                job.last_status = "done"
+            except Exception as e:
+                job.last_status = f"failed: {e}"
+                self.log(f"{job.name} failed: {e}")
+            finally:
+                with self.lock:
+                    self.pending.discard(job)
+            self.log(f"{job.name}: next run at {job.next_run:%Y-%m-%d %H:%M}")
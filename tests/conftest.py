@@ -0,0 +1,39 @@
+"""Shared fixtures: a local mock RedCat API (benchmarks/mock_server.py) and throwaway cache paths"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import reporting
+from mock_server import MockRedCatServer
+
+TOKEN = "mock-token"
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    """Start mock servers on demand: mock_api(rows, **options) points BASE_URL at a fresh one"""
+    servers = []
+
+    def start(rows, **options):
+        server = MockRedCatServer(rows, **options).start()
+        servers.append(server)
+        monkeypatch.setattr(reporting, "BASE_URL", server.base_url)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+@pytest.fixture(autouse=True)
+def isolated_paths(tmp_path, monkeypatch):
+    """Keep caches, checkpoints and metrics of a test in its own temporary directory"""
+    monkeypatch.setitem(reporting.CONFIG, "cache", {**reporting.CONFIG.get("cache", {}),
+                                                    "path": str(tmp_path / "reports.sqlite")})
+    monkeypatch.setitem(reporting.CONFIG, "jobs", {**reporting.CONFIG.get("jobs", {}),
+                                                   "checkpoint_dir": str(tmp_path / "checkpoints")})
+    monkeypatch.setitem(reporting.CONFIG, "metrics", {**reporting.CONFIG.get("metrics", {}), "file": None})
+    return tmp_path
@@ -0,0 +1,93 @@
+"""SQLite report cache: incremental transaction refresh and summary snapshots (see ReportCache)"""
+import pytest
+
+from conftest import TOKEN
+from reporting import (
+    SUMMARY_FIELDS, TRANSACTION_FIELDS, ReportCache, refresh_summary_cache, refresh_transactions_cache
+)
+
+def cached_keys(cache, report_type, fields, key_field, **options):
+    key_index = fields.index(key_field)
+    return [row[key_index] for page in cache.iter_pages(report_type, fields, **options) for row in page]
+
+def test_transactions_refresh_only_fetches_new_rows(mock_api):
+    with ReportCache() as cache:
+        mock_api(1200)
+        assert refresh_transactions_cache(cache, TOKEN, page_size=250) == 1200
+        mock_api(1500)
+        assert refresh_transactions_cache(cache, TOKEN, page_size=250) == 300
+        assert refresh_transactions_cache(cache, TOKEN, page_size=250) == 0
+        assert cache.count("transactions", TRANSACTION_FIELDS) == 1500
+        keys = cached_keys(cache, "transactions", TRANSACTION_FIELDS, "MemberSalesHeaderRecid",
+                           order_by="MemberSalesHeaderRecid", order_direction="asc")
+        assert keys == list(range(1, 1501))
+        assert cache.refreshed_at("transactions", TRANSACTION_FIELDS) is not None
+
+def test_summary_refresh_replaces_the_snapshot(mock_api):
+    with ReportCache() as cache:
+        mock_api(500)
+        assert refresh_summary_cache(cache, TOKEN, page_size=100) == 500
+        mock_api(300)
+        assert refresh_summary_cache(cache, TOKEN, page_size=100) == 300
+        assert cache.count("summary", SUMMARY_FIELDS) == 300
+
+def test_failed_summary_refresh_keeps_the_previous_snapshot(mock_api):
+    with ReportCache() as cache:
+        mock_api(500)
+        refresh_summary_cache(cache, TOKEN, page_size=100)
+        refreshed_at = cache.refreshed_at("summary", SUMMARY_FIELDS)
+
+        def interrupt(pages, records):
+            raise RuntimeError("connection lost")
+
+        mock_api(300)
+        with pytest.raises(RuntimeError):
+            refresh_summary_cache(cache, TOKEN, page_size=100, progress_callback=interrupt)
+        assert cache.count("summary", SUMMARY_FIELDS) == 500
+        assert cache.refreshed_at("summary", SUMMARY_FIELDS) == refreshed_at
+
+def test_staged_snapshot_replaces_the_table_on_commit_only():
+    with ReportCache() as cache:
+        with cache.transaction():
+            cache.insert_records("summary", SUMMARY_FIELDS, [[1, 0, 0, 0], [2, 0, 0, 0]])
+        with pytest.raises(RuntimeError), cache.transaction():
+            staging = cache.staging_table("summary", SUMMARY_FIELDS)
+            cache.insert_records("summary", SUMMARY_FIELDS, [[3, 0, 0, 0]], table=staging)
+            cache.replace_table("summary", SUMMARY_FIELDS, staging)
+            raise RuntimeError("interrupted")
+        assert cached_keys(cache, "summary", SUMMARY_FIELDS, "MemberNo", order_by="MemberNo",
+                           order_direction="asc") == [1, 2]
+
+        with cache.transaction():
+            staging = cache.staging_table("summary", SUMMARY_FIELDS)
+            cache.insert_records("summary", SUMMARY_FIELDS, [[3, 0, 0, 0]], table=staging)
+            cache.replace_table("summary", SUMMARY_FIELDS, staging)
+        assert cached_keys(cache, "summary", SUMMARY_FIELDS, "MemberNo") == [3]
+
+def test_cached_pages_are_ordered_filtered_and_limited(mock_api):
+    mock_api(1000)
+    with ReportCache() as cache:
+        refresh_transactions_cache(cache, TOKEN, page_size=200)
+        keys = cached_keys(cache, "transactions", TRANSACTION_FIELDS, "MemberSalesHeaderRecid",
+                           order_by="MemberSalesHeaderRecid", order_direction="desc", limit=5,
+                           filters=[["StoreName", "=", "South Bank"]])
+        # The mock assigns stores round-robin over 8 stores, South Bank being the third
+        assert keys == [995, 987, 979, 971, 963]
+        with pytest.raises(ValueError):
+            list(cache.iter_pages("transactions", TRANSACTION_FIELDS, order_by="Nope"))
+
+def test_a_refresh_does_not_lock_other_jobs_out_while_downloading(mock_api):
+    mock_api(1000)
+    merged = []
+
+    def refresh_transactions(pages, records):
+        # Another job refreshing the same cache file in the middle of the summary download
+        if not merged:
+            with ReportCache() as other:
+                other.connection.execute("PRAGMA busy_timeout = 100")
+                merged.append(refresh_transactions_cache(other, TOKEN, page_size=250))
+
+    with ReportCache() as cache:
+        assert refresh_summary_cache(cache, TOKEN, page_size=100, progress_callback=refresh_transactions) == 1000
+        assert cache.count("transactions", TRANSACTION_FIELDS) == 1000
+    assert merged == [1000]
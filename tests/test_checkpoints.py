@@ -0,0 +1,81 @@
+"""Resumable report pulls: interrupted runs continue from their on-disk checkpoint"""
+import os
+
+from conftest import TOKEN
+from reporting import get_checkpoint_dir, get_stampcard_transactions, resumable_report_pages
+
+def pull(fetch_page=get_stampcard_transactions, **options):
+    options = {"page_size": 100, "order_by": "MemberSalesHeaderRecid", "order_direction": "asc",
+               "max_workers": 2, **options}
+    return resumable_report_pages(fetch_page, TOKEN, "transactions", **options)
+
+def keys(pages):
+    return [record[0] for page in pages for record in page]
+
+def interrupt_after(pages, count):
+    """Consume count pages, then stop like a cancelled or crashed run"""
+    taken = [next(pages) for _ in range(count)]
+    pages.close()
+    return taken
+
+def test_interrupted_pull_resumes_from_the_checkpoint(mock_api):
+    mock_api(1050)
+    first = interrupt_after(pull(), 3)
+    assert keys(first) == list(range(1, 301))
+    assert os.listdir(get_checkpoint_dir())
+
+    starts = []
+
+    def fetch_page(token, start=0, **kwargs):
+        starts.append(start)
+        return get_stampcard_transactions(token, start=start, **kwargs)
+
+    resumed = []
+    pages = list(pull(fetch_page, resume_callback=lambda pages, records: resumed.append((pages, records))))
+    assert resumed == [(3, 300)]
+    assert keys(pages) == list(range(1, 1051))
+    # Saved pages are replayed from disk once the last saved record is found in place; only the rest is requested
+    assert starts[0] == 299 and min(starts[1:]) == 300
+    # A completed pull deletes its checkpoint
+    assert os.listdir(get_checkpoint_dir()) == []
+
+def test_resume_ignores_a_partly_written_page(mock_api):
+    mock_api(500)
+    interrupt_after(pull(), 2)
+    pages_files = [name for name in os.listdir(get_checkpoint_dir()) if name.endswith(".pages.jsonl")]
+    with open(os.path.join(get_checkpoint_dir(), pages_files[0]), 'a', encoding='utf-8') as f:
+        f.write('[[201, 5, 1, 0, "South')
+    assert keys(pull()) == list(range(1, 501))
+
+def test_resume_off_starts_over(mock_api):
+    mock_api(500)
+    interrupt_after(pull(), 2)
+    resumed = []
+    pages = list(pull(resume=False, resume_callback=lambda pages, records: resumed.append(pages)))
+    assert resumed == []
+    assert keys(pages) == list(range(1, 501))
+
+def test_checkpoint_belongs_to_its_request(mock_api):
+    mock_api(500)
+    interrupt_after(pull(), 2)
+    # A different ordering is a different job, so it does not replay the other run's pages
+    assert keys(pull(order_direction="desc")) == list(range(500, 0, -1))
+    assert keys(pull()) == list(range(1, 501))
+
+def test_limit_counts_records_across_the_resume(mock_api):
+    mock_api(1000)
+    interrupt_after(pull(limit=450), 2)
+    assert keys(pull(limit=450)) == list(range(1, 451))
+
+def test_a_shifted_report_starts_over(mock_api):
+    server = mock_api(1050)
+    first = interrupt_after(pull(order_direction="desc"), 3)
+    assert keys(first) == list(range(1050, 750, -1))
+    # New transactions arrive at the front of the newest-first order, shifting every offset
+    server.api.rows = 1100
+    resumed, stale = [], []
+    pages = pull(order_direction="desc", resume_callback=lambda pages, records: resumed.append(pages),
+                 stale_callback=lambda pages, records: stale.append((pages, records)))
+    assert keys(pages) == list(range(1100, 0, -1))
+    assert resumed == [] and stale == [(3, 300)]
+    assert os.listdir(get_checkpoint_dir()) == []
@@ -0,0 +1,65 @@
+"""Report filters: building API conditions and the client-side fallback for servers that ignore them"""
+from datetime import date
+
+import pytest
+
+from conftest import TOKEN
+from mock_server import FIRST_TXN_DATE, transaction_row
+from reporting import (
+    TRANSACTION_FIELDS, filter_conditions, filter_records, get_stampcard_transactions,
+    resumable_report_pages
+)
+
+def test_options_become_conditions():
+    conditions = filter_conditions("transactions", {"date_from": "2023-01-02", "date_to": date(2023, 1, 2),
+                                                    "store": " Toowong ", "member_from": "5", "member_to": None})
+    # date_to includes the whole day
+    assert conditions == [["TxnDate", ">=", "2023-01-02"], ["TxnDate", "<", "2023-01-03"],
+                          ["StoreName", "=", "Toowong"], ["MemberNo", ">=", 5]]
+    assert filter_conditions("summary", {"store": ""}) == []
+
+@pytest.mark.parametrize("report_type, filters", [
+    ("transactions", {"colour": "red"}), ("summary", {"store": "Toowong"}), ("transactions", {"date_from": "2/1/23"}),
+    ("transactions", {"member_from": "ten"}), ("transactions", {"date_from": "2023-02-01", "date_to": "2023-01-01"}),
+    ("summary", {"member_from": 20, "member_to": 10})
+])
+def test_invalid_options_are_rejected(report_type, filters):
+    with pytest.raises(ValueError):
+        filter_conditions(report_type, filters)
+
+def test_records_are_compared_by_value_not_text():
+    records = [[9, 1, "Toowong", "2023-01-02T23:59:00"], [10, 2, "Toowong", "2023-01-03T00:00:00"],
+               [100, 3, "Chermside", "2023-01-02T08:00:00"], [None, 4, "Toowong", "2023-01-02T08:00:00"]]
+    fields = ["MemberSalesHeaderRecid", "MemberNo", "StoreName", "TxnDate"]
+    assert filter_records(records, fields, [["MemberSalesHeaderRecid", ">=", 10]]) == records[1:3]
+    assert filter_records(records, fields, [["TxnDate", "<", "2023-01-03"], ["StoreName", "=", "Toowong"]]) == [
+        records[0], records[3]]
+    # Missing values never match
+    assert filter_records(records, fields, [["MemberSalesHeaderRecid", "<", 50]]) == records[:2]
+    dicts = [dict(zip(fields, record)) for record in records]
+    assert filter_records(dicts, fields, [["MemberNo", "<=", 2]]) == dicts[:2]
+
+def expected_keys(conditions, rows):
+    matching = filter_records([transaction_row(index, 500) for index in range(rows)], TRANSACTION_FIELDS, conditions)
+    return [row["MemberSalesHeaderRecid"] for row in matching]
+
+def keys(pages):
+    return [record[0] for page in pages for record in page]
+
+@pytest.mark.parametrize("ignore_filters", [False, True])
+def test_resumable_pull_filters_and_limits_matching_records(mock_api, ignore_filters):
+    mock_api(5000, members=500, ignore_filters=ignore_filters)
+    conditions = filter_conditions("transactions", {"date_from": "2023-01-02", "date_to": "2023-01-02",
+                                                    "store": "Toowong"})
+    expected = expected_keys(conditions, 5000)
+    # The mock starts at 08:00 on its first day and adds a transaction a minute
+    assert FIRST_TXN_DATE.hour == 8 and len(expected) == 1440 // 8
+
+    def pull(limit=None):
+        return keys(resumable_report_pages(get_stampcard_transactions, TOKEN, "transactions", limit=limit,
+                                           page_size=400, order_by="MemberSalesHeaderRecid", order_direction="asc",
+                                           filters=conditions))
+
+    assert pull() == expected
+    # Only matching records count towards the limit, even when the server sends everything
+    assert pull(limit=50) == expected[:50]
@@ -0,0 +1,54 @@
+"""Member view: the summary joined with per-member transaction activity"""
+from datetime import datetime
+
+import pytest
+
+from conftest import TOKEN
+from frames import build_member_view
+from mock_server import summary_row, transaction_row
+from reporting import MEMBER_VIEW_FIELDS, member_view_pages
+
+ROWS = 5000
+MEMBERS = 500
+
+def expected_view(member_from, member_to):
+    """The member view computed directly from the mock's rows"""
+    activity = {}
+    for index in range(ROWS):
+        row = transaction_row(index, MEMBERS)
+        count, total, last = activity.get(row["MemberNo"], (0, 0.0, None))
+        date = datetime.fromisoformat(row["TxnDate"])
+        activity[row["MemberNo"]] = (count + 1, total + row["Amount"], max(last or date, date))
+    view = []
+    for index in range(member_from - 1, member_to):
+        row = summary_row(index, MEMBERS)
+        count, total, last = activity.get(row["MemberNo"], (0, 0.0, None))
+        view.append({**row, "Transactions": count, "TotalAmount": round(total, 2), "LastTxnDate": last})
+    return view
+
+def build(filters):
+    summary_pages, transaction_pages = member_view_pages(TOKEN, filters=filters, page_size=300)
+    return build_member_view(summary_pages, transaction_pages, order_by="MemberNo", order_direction="asc")
+
+@pytest.mark.parametrize("ignore_filters", [False, True])
+def test_member_view_joins_activity_within_the_filter(mock_api, ignore_filters):
+    mock_api(ROWS, members=MEMBERS, ignore_filters=ignore_filters)
+    view = build([["MemberNo", ">=", 100], ["MemberNo", "<=", 110]])
+    assert list(view.columns) == MEMBER_VIEW_FIELDS
+    expected = expected_view(100, 110)
+    assert len(view) == len(expected) == 11
+    for (_, row), wanted in zip(view.iterrows(), expected):
+        assert row["MemberNo"] == wanted["MemberNo"]
+        assert row["CurrentStamps"] == wanted["CurrentStamps"]
+        assert row["Transactions"] == wanted["Transactions"]
+        assert row["TotalAmount"] == pytest.approx(wanted["TotalAmount"])
+        assert row["LastTxnDate"] == wanted["LastTxnDate"]
+
+def test_members_without_transactions_get_zero_activity(mock_api):
+    # Only the first MEMBERS member numbers have transactions
+    mock_api(ROWS, members=MEMBERS)
+    view = build([["MemberNo", ">=", MEMBERS - 1], ["MemberNo", "<=", MEMBERS + 2]])
+    assert list(view["MemberNo"]) == [MEMBERS - 1, MEMBERS, MEMBERS + 1, MEMBERS + 2]
+    assert list(view["Transactions"]) == [10, 10, 0, 0]
+    assert list(view["TotalAmount"][2:]) == [0, 0]
+    assert view["LastTxnDate"][2:].isna().all()
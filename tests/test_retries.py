@@ -0,0 +1,109 @@
+"""Retries with backoff and the adaptive (AIMD) concurrency limit"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from conftest import TOKEN
+import reporting
+from reporting import (
+    AdaptiveLimiter, CancellableSession, fetch_report_pages, get_limiter, get_stampcard_transactions,
+    parse_retry_after, post_with_retry
+)
+
+def test_limit_halves_on_overload_and_recovers_one_step_per_window(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(reporting.time, "monotonic", lambda: clock[0])
+    limiter = AdaptiveLimiter(8)
+    limiter.record_overload()
+    assert limiter.limit == 4
+    # Overloads in the same burst only count once
+    limiter.record_overload()
+    assert limiter.limit == 4
+    clock[0] += AdaptiveLimiter.DECREASE_COOLDOWN_SECONDS
+    limiter.record_overload()
+    limiter.record_overload()
+    assert limiter.limit == 2
+
+    for _ in range(2):
+        limiter.record_success()
+    assert limiter.limit == 3
+    for _ in range(3 + 4 + 5 + 6 + 7):
+        limiter.record_success()
+    assert limiter.limit == 8
+
+def test_limit_stays_within_bounds(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(reporting.time, "monotonic", lambda: clock[0])
+    limiter = AdaptiveLimiter(0)
+    assert limiter.limit == 1
+    for _ in range(5):
+        clock[0] += 10
+        limiter.record_overload()
+        limiter.record_success()
+    assert limiter.limit == 1
+
+def test_retry_after_in_seconds_or_as_a_date():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(later) <= 30
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class FakeSession:
+    """Answers with the given statuses in turn"""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = 0
+
+    def post(self, url, **kwargs):
+        self.requests += 1
+        return FakeResponse(self.statuses.pop(0), {"Retry-After": "0"})
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setitem(reporting.CONFIG, "http", {**reporting.CONFIG["http"], "max_retries": 3,
+                                                   "backoff_base_seconds": 0.001})
+    monkeypatch.setitem(reporting.CONFIG, "reports", {**reporting.CONFIG["reports"], "max_workers": 4})
+
+def test_transient_errors_are_retried(fast_retries):
+    session = FakeSession([503, 502, 200])
+    assert post_with_retry("http://api/report", session=session).status_code == 200
+    assert session.requests == 3
+    # The 503 asked for less concurrency
+    assert get_limiter(session).limit == 2
+
+def test_the_last_error_response_is_returned_after_the_final_retry(fast_retries):
+    session = FakeSession([500] * 4)
+    assert post_with_retry("http://api/report", session=session).status_code == 500
+    assert session.requests == 4
+
+def test_client_errors_are_not_retried(fast_retries):
+    session = FakeSession([400, 200])
+    assert post_with_retry("http://api/report", session=session).status_code == 400
+    assert session.requests == 1
+
+def test_requested_workers_are_not_capped_by_the_configured_default(mock_api, fast_retries):
+    mock_api(2000)
+    session = CancellableSession()
+    pages = list(fetch_report_pages(get_stampcard_transactions, TOKEN, page_size=100, max_workers=16, session=session))
+    assert sum(len(page) for page in pages) == 2000
+    assert get_limiter(session).max_limit == session.pool_size == 16
+    # Each job's session has its own request slots
+    assert get_limiter(CancellableSession()).max_limit == 4
+
+def test_a_grown_limit_keeps_its_overload_reduction(monkeypatch):
+    monkeypatch.setattr(reporting.time, "monotonic", lambda: 100.0)
+    limiter = AdaptiveLimiter(4)
+    limiter.record_overload()
+    limiter.grow(16)
+    assert (limiter.limit, limiter.max_limit) == (14, 16)
+    limiter.grow(8)
+    assert (limiter.limit, limiter.max_limit) == (14, 16)
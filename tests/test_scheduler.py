@@ -0,0 +1,129 @@
+"""Scheduled exports: cron parsing, job validation, the run queue and a run against the mock API"""
+import csv
+import threading
+from datetime import datetime
+
+import pytest
+
+from cli import run_scheduled_job
+from scheduler import CronSchedule, IntervalSchedule, ReportScheduler, ScheduledJob, parse_cron_field
+
+def job(**config):
+    return ScheduledJob({"type": "transactions", "out": "exports/t.csv", "limit": 0, "interval_minutes": 5, **config})
+
+# --- Cron ---
+def test_cron_fields():
+    assert parse_cron_field("*", 0, 6) == set(range(7))
+    assert parse_cron_field("1-5", 0, 6) == {1, 2, 3, 4, 5}
+    assert parse_cron_field("*/15", 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field("5/20", 0, 59) == {5, 25, 45}
+    assert parse_cron_field("1,3,10-12", 1, 31) == {1, 3, 10, 11, 12}
+    for text in ("60", "a", "5-1", "*/0", "1-"):
+        with pytest.raises(ValueError):
+            parse_cron_field(text, 0, 59)
+
+@pytest.mark.parametrize("expression, after, expected", [
+    ("0 6 * * 1-5", datetime(2026, 10, 16, 6, 0), datetime(2026, 10, 19, 6, 0)),    # Friday -> Monday
+    ("*/15 * * * *", datetime(2026, 10, 17, 9, 59, 30), datetime(2026, 10, 17, 10, 0)),
+    ("30 2 1 * *", datetime(2026, 12, 1, 2, 30), datetime(2027, 1, 1, 2, 30)),
+    ("0 0 29 2 *", datetime(2026, 3, 1), datetime(2028, 2, 29)),
+    # Day of month and day of week both restricted: either one matches, as in cron
+    ("0 12 13 * 5", datetime(2026, 10, 10), datetime(2026, 10, 13, 12, 0)),
+    ("0 12 13 * 5", datetime(2026, 10, 13, 12, 0), datetime(2026, 10, 16, 12, 0)),
+    ("0 0 * * 7", datetime(2026, 10, 17), datetime(2026, 10, 18)),                     # 7 is Sunday too
+])
+def test_cron_next_run(expression, after, expected):
+    assert CronSchedule(expression).next_after(after) == expected
+
+def test_cron_rejects_bad_expressions():
+    for expression in ("* * * *", "0 0 31 2 *", "61 * * * *"):
+        with pytest.raises(ValueError):
+            CronSchedule(expression).next_after(datetime(2026, 1, 1))
+
+# --- Jobs ---
+def test_interval_must_be_a_positive_number():
+    assert IntervalSchedule(0.5).next_after(datetime(2026, 1, 1)) == datetime(2026, 1, 1, 0, 0, 30)
+    for minutes in (True, 0, -5, "5"):
+        with pytest.raises(ValueError):
+            IntervalSchedule(minutes)
+
+@pytest.mark.parametrize("config", [
+    {"limit": None}, {"limit": True}, {"limit": -1}, {"cache": "yes"}, {"interval_minutes": True},
+    {"type": "nope"}, {"format": "csv", "out": "t.json"}, {"order_by": "CardsFilled"},
+    {"type": "summary", "aggregate": "store"}, {"type": "summary", "filters": {"store": "Toowong"}}
+])
+def test_invalid_jobs_are_rejected(config):
+    with pytest.raises(ValueError):
+        job(**config)
+
+def test_limit_and_schedule_are_required():
+    with pytest.raises(ValueError, match="needs a limit"):
+        ScheduledJob({"type": "summary", "out": "s.csv", "interval_minutes": 5})
+    with pytest.raises(ValueError, match="interval_minutes or cron"):
+        ScheduledJob({"type": "summary", "out": "s.csv", "limit": 0})
+
+def test_job_defaults_match_the_report_command(monkeypatch):
+    from reporting import CONFIG
+    monkeypatch.setitem(CONFIG, "cache", {**CONFIG["cache"], "enabled": False})
+    assert job().cache is False
+    assert "--no-cache" in job().report_argv(datetime(2026, 1, 1))
+    monkeypatch.setitem(CONFIG, "cache", {**CONFIG["cache"], "enabled": True})
+    assert job().cache is True
+
+def test_job_argv_and_output_path():
+    scheduled = job(out="exports/t_{date}", format="csv", order_by="Amount", direction="asc", limit=10,
+                    filters={"store": "Toowong"}, aggregate="store", cache=False)
+    argv = scheduled.report_argv(datetime(2026, 10, 17, 2, 0))
+    assert argv[:4] == ["report", "--type", "transactions", "--out"]
+    assert argv[4] == "exports/t_20261017.csv"
+    for option, value in [("--order-by", "Amount"), ("--direction", "asc"), ("--limit", "10"), ("--store", "Toowong"),
+                          ("--aggregate", "store")]:
+        assert argv[argv.index(option) + 1] == value
+
+# --- Scheduler ---
+def test_due_jobs_are_queued_once_while_pending():
+    messages = []
+    scheduler = ReportScheduler([job(name="every 5")], run_job=lambda job: None, log=messages.append)
+    scheduled = scheduler.jobs[0]
+    now = datetime(2026, 10, 17, 9, 0)
+    scheduled.next_run = now
+    scheduler.check(now)
+    assert scheduler.queue.qsize() == 1 and scheduled.next_run == datetime(2026, 10, 17, 9, 5)
+    # Due again before the worker picked the first run up: skipped, not queued twice
+    scheduler.check(datetime(2026, 10, 17, 9, 5))
+    assert scheduler.queue.qsize() == 1
+    assert messages == ["Skipping every 5: its previous run is still queued or running"]
+
+def test_failed_runs_are_logged_and_the_worker_carries_on():
+    done = threading.Event()
+    messages = []
+    ran = []
+
+    def run_job(job):
+        ran.append(job.name)
+        if job.name == "broken":
+            raise RuntimeError("boom")
+        done.set()
+
+    scheduler = ReportScheduler([job(name="broken"), job(name="fine")], run_job, log=messages.append)
+    scheduler.start(now=datetime.now())
+    assert done.wait(5)
+    scheduler.stop()
+    scheduler.join(5)
+    assert ran == ["broken", "fine"]
+    assert "broken failed: boom" in messages
+    assert scheduler.jobs[0].last_status == "failed: boom" and scheduler.jobs[1].last_status == "done"
+
+# --- Runs ---
+def test_scheduled_job_exports_the_report(mock_api, tmp_path):
+    mock_api(700)
+    out = tmp_path / "exports" / "transactions_{date}.csv"
+    scheduled = job(out=str(out), limit=0, filters={"store": "Toowong"}, cache=False)
+    messages = []
+    run_scheduled_job(scheduled, "user", "password", messages.append)
+    written = tmp_path / "exports" / f"transactions_{datetime.now():%Y%m%d}.csv"
+    with open(written, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    # The mock assigns stores round-robin over 8 stores, Toowong being the sixth
+    assert len(rows) == len([index for index in range(700) if index % 8 == 5])
+    assert {row["StoreName"] for row in rows} == {"Toowong"}
@@ -0,0 +1,78 @@
+"""Sharded extraction: key-range shards must return exactly the rows of an unsharded pull"""
+import multiprocessing
+
+import pytest
+
+from conftest import TOKEN
+from reporting import (
+    TRANSACTION_FIELDS, TokenManager, fetch_report_pages, filter_records, get_stampcard_transactions, shard_ranges,
+    sharded_report_pages
+)
+
+def rows(pages):
+    return [tuple(record) for page in pages for record in page]
+
+def unsharded(**options):
+    return rows(fetch_report_pages(get_stampcard_transactions, TOKEN, page_size=400, **options))
+
+def sharded(shards=4, **options):
+    return rows(sharded_report_pages("transactions", TOKEN, shards, page_size=400, **options))
+
+def test_shard_ranges_cover_the_key_range_once():
+    for low, high, shards in [(1, 5000, 4), (1, 3, 8), (10, 10, 2), (2500, 10000, 3)]:
+        ranges = shard_ranges(low, high, shards)
+        assert ranges[0][0] == low and ranges[-1][1] == high + 1
+        assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+@pytest.mark.parametrize("order_by, direction", [
+    ("MemberSalesHeaderRecid", "asc"), ("MemberSalesHeaderRecid", "desc"), ("Amount", "desc")
+])
+def test_sharded_rows_match_unsharded(mock_api, order_by, direction):
+    # Keys cross a power of ten, where comparing them as text would drop rows
+    mock_api(5000)
+    expected = unsharded(order_by=order_by, order_direction=direction)
+    assert len(expected) == 5000
+    assert sharded(order_by=order_by, order_direction=direction) == expected
+
+def test_sharded_limit_and_filters(mock_api):
+    mock_api(5000)
+    filters = [["StoreName", "=", "Toowong"]]
+    expected = unsharded(order_by="MemberSalesHeaderRecid", order_direction="desc", limit=300, filters=filters)
+    assert len(expected) == 300
+    assert sharded(order_by="MemberSalesHeaderRecid", order_direction="desc", limit=300, filters=filters) == expected
+
+def test_fallback_filters_locally_when_the_server_ignores_filters(mock_api):
+    mock_api(5000, ignore_filters=True)
+    filters = [["StoreName", "=", "Toowong"], ["MemberSalesHeaderRecid", "<", 2500]]
+    everything = unsharded(order_by="MemberSalesHeaderRecid", order_direction="asc")
+    expected = filter_records([list(row) for row in everything], TRANSACTION_FIELDS, filters)
+    assert 0 < len(expected) < 5000
+    result = sharded(order_by="MemberSalesHeaderRecid", order_direction="asc", filters=filters)
+    assert result == [tuple(row) for row in expected]
+    assert sharded(order_by="MemberSalesHeaderRecid", order_direction="asc", filters=filters, limit=50) == result[:50]
+
+def test_each_shard_stops_at_the_limit(mock_api):
+    server = mock_api(40000)
+    for order_by in ("MemberSalesHeaderRecid", "Amount"):
+        expected = unsharded(order_by=order_by, limit=100)
+        server.api.rows_served = 0
+        assert sharded(order_by=order_by, limit=100) == expected
+        # The key range probes fetch three rows; every shard fetches no more than the limit
+        assert server.api.rows_served <= 3 + 4 * 100
+
+def test_shard_processes_stop_with_the_consumer(mock_api):
+    mock_api(20000, latency_ms=20)
+    pages = sharded_report_pages("transactions", TOKEN, 4, page_size=100, order_by="MemberSalesHeaderRecid")
+    assert len(next(pages)) == 100
+    pages.close()
+    assert multiprocessing.active_children() == []
+
+def test_shards_log_in_again_when_the_token_expires(mock_api):
+    # Each shard pages through more requests than one token allows
+    server = mock_api(5000, token_requests=8)
+    manager = TokenManager("user", "password", token_file="")
+    expected = rows(fetch_report_pages(get_stampcard_transactions, manager, page_size=100))
+    logins = server.api.logins
+    assert len(expected) == 5000
+    assert rows(sharded_report_pages("transactions", manager, 4, page_size=100)) == expected
+    assert server.api.logins > logins + 4
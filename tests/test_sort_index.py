@@ -0,0 +1,87 @@
+"""Client-side sort and search (SortIndex, select_rows) checked against plain sorted() and scans"""
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from frames import ColumnStore, SortIndex, select_rows
+from mock_server import STORES
+from reporting import TRANSACTION_FIELDS
+
+ROWS = 3000
+
+def maybe(value, rng):
+    """The value, or None for about one row in ten"""
+    return None if rng.random() < 0.1 else value
+
+@pytest.fixture(scope="module")
+def records():
+    # Few distinct values per column, so most rows tie with others
+    rng = random.Random(25)
+    start = datetime(2024, 1, 1)
+    return [[
+        index + 1,
+        maybe(rng.randint(1, 40), rng),
+        rng.randint(1, 3),
+        rng.choice([0, 1]),
+        maybe(rng.choice(STORES[:5]), rng),
+        maybe(rng.choice([4.5, 5.0, 12.25, 30.0]), rng),
+        maybe((start + timedelta(hours=rng.randint(0, 50))).isoformat(), rng)
+    ] for index in range(ROWS)]
+
+@pytest.fixture(scope="module")
+def store(records):
+    store = ColumnStore(TRANSACTION_FIELDS)
+    # Pages with different store names, so the categorical column is united across chunks
+    for start in range(0, ROWS, 700):
+        store.append_records(records[start:start + 700])
+    return store
+
+def reference_order(records, field, ascending):
+    """Rows sorted by one field with sorted(): stable, missing values last in both directions"""
+    index = TRANSACTION_FIELDS.index(field)
+    present = [row for row in range(len(records)) if records[row][index] is not None]
+    missing = [row for row in range(len(records)) if records[row][index] is None]
+    return sorted(present, key=lambda row: records[row][index], reverse=not ascending) + missing
+
+@pytest.mark.parametrize("field", ["MemberNo", "SaleStampsEarned", "StoreName", "Amount", "TxnDate",
+                                   "MemberSalesHeaderRecid"])
+@pytest.mark.parametrize("ascending", [True, False])
+def test_positions_match_sorted(records, store, field, ascending):
+    positions = store.sort_index(field).positions(ascending)
+    assert positions.tolist() == reference_order(records, field, ascending)
+
+def test_store_names_are_a_categorical_column(store):
+    assert str(store.frame()["StoreName"].dtype) == "category"
+
+def test_edge_columns():
+    assert SortIndex(pd.Series([None, None], dtype="object")).positions(False).tolist() == [0, 1]
+    assert SortIndex(pd.array([3, 3, 3], dtype="Int8")).positions(False).tolist() == [0, 1, 2]
+    assert SortIndex(pd.array([], dtype="Int8")).positions().tolist() == []
+
+@pytest.mark.parametrize("field, text, matches", [
+    ("MemberNo", "7", lambda value: value == 7),
+    ("MemberNo", " 7.0 ", lambda value: value == 7),
+    ("Amount", "12.25", lambda value: value == 12.25),
+    ("Amount", "12", lambda value: value == 12),
+    ("StoreName", "south", lambda value: value is not None and value.casefold().startswith("south")),
+    ("StoreName", "c", lambda value: value is not None and value.casefold().startswith("c")),
+    ("StoreName", "Newstead", lambda value: False),
+])
+def test_find_matches_a_scan(records, store, field, text, matches):
+    index = TRANSACTION_FIELDS.index(field)
+    expected = [row for row in range(ROWS) if matches(records[row][index])]
+    assert sorted(store.sort_index(field).find(text).tolist()) == expected
+
+def test_find_rejects_text_for_numbers(store):
+    with pytest.raises(ValueError):
+        store.sort_index("MemberNo").find("seven")
+
+def test_select_rows_sorts_the_search_matches(records, store):
+    selection = select_rows(store, order_by="Amount", ascending=False, search_field="StoreName", search_text="car")
+    store_index = TRANSACTION_FIELDS.index("StoreName")
+    expected = [row for row in reference_order(records, "Amount", False) if records[row][store_index] == "Carindale"]
+    assert selection.positions.tolist() == expected
+    assert [selection.row(index)[0] for index in range(3)] == [records[row][0] for row in expected[:3]]
+    assert select_rows(store) is store
@@ -0,0 +1,119 @@
+"""Summary diffs: the download merge-joined with the cached snapshot, which it then replaces"""
+import pytest
+
+from conftest import TOKEN
+from mock_server import summary_row
+from reporting import (
+    SUMMARY_DIFF_FIELDS, SUMMARY_FIELDS, TRANSACTION_FIELDS, ReportCache, SummaryDiff, merge_snapshots,
+    refresh_transactions_cache
+)
+
+def merged(previous, current):
+    return list(merge_snapshots(iter(previous), iter(current), 0))
+
+def changes(diff, **options):
+    return [row for page in diff.pages(TOKEN, page_size=50, **options) for row in page]
+
+def snapshot(rows):
+    return [[row[field] for field in SUMMARY_FIELDS] for row in rows]
+
+def cached_summary(cache):
+    return [row for page in cache.iter_pages("summary", SUMMARY_FIELDS, order_by="MemberNo", order_direction="asc")
+            for row in page]
+
+# --- Merge ---
+def test_merge_classifies_every_key_on_either_side():
+    previous = [[1, "a"], [3, "c"], [4, "d"], [7, "g"]]
+    current = [[2, "b"], [3, "c"], [4, "D"], [8, "h"]]
+    assert merged(previous, current) == [
+        ("removed", None, [1, "a"]), ("new", [2, "b"], None), ("unchanged", [3, "c"], [3, "c"]),
+        ("changed", [4, "D"], [4, "d"]), ("removed", None, [7, "g"]), ("new", [8, "h"], None)
+    ]
+
+def test_merge_with_an_empty_side():
+    rows = [[1, "a"], [2, "b"]]
+    assert [change for change, _, _ in merged([], rows)] == ["new", "new"]
+    assert [change for change, _, _ in merged(rows, [])] == ["removed", "removed"]
+    assert merged([], []) == []
+
+@pytest.mark.parametrize("current", [[[2, "b"], [1, "a"]], [[1, "a"], [1, "b"]]])
+def test_merge_rejects_a_download_out_of_key_order(current):
+    with pytest.raises(ValueError, match="ascending MemberNo order"):
+        merged([[1, "a"], [2, "b"]], current)
+
+# --- Diffs against the cache ---
+def test_diff_reports_new_changed_and_removed_members_and_replaces_the_snapshot(mock_api):
+    mock_api(400)
+    with ReportCache() as cache:
+        previous = snapshot(summary_row(index, 40) for index in range(300))
+        previous[4][1] += 1                      # member 5's stamps changed since
+        previous[9][3] += 2                      # member 10's rewards changed since
+        previous.append([9999, 1, 2, 3])          # member 9999 is gone
+        with cache.transaction():
+            cache.insert_records("summary", SUMMARY_FIELDS, previous)
+            cache.mark_refreshed("summary", SUMMARY_FIELDS)
+        refreshed_at = cache.refreshed_at("summary", SUMMARY_FIELDS)
+
+        diff = SummaryDiff(cache)
+        rows = changes(diff)
+        assert diff.counts == {"new": 100, "changed": 2, "removed": 1, "unchanged": 298}
+        assert diff.previous_refresh == refreshed_at
+        assert [row[:2] for row in rows] == ([["changed", 5], ["changed", 10]]
+                                              + [["new", member] for member in range(301, 401)]
+                                              + [["removed", 9999]])
+        changed = dict(zip(SUMMARY_DIFF_FIELDS, rows[0]))
+        assert changed["CurrentStamps"] == summary_row(4, 40)["CurrentStamps"]
+        assert changed["PreviousCurrentStamps"] == previous[4][1]
+        assert dict(zip(SUMMARY_DIFF_FIELDS, rows[-1]))["CurrentStamps"] is None
+
+        assert cached_summary(cache) == snapshot(summary_row(index, 40) for index in range(400))
+        # Nothing changed since the diff just taken
+        again = SummaryDiff(cache)
+        assert changes(again) == [] and again.counts["unchanged"] == 400
+
+def test_an_interrupted_diff_keeps_the_previous_snapshot(mock_api):
+    mock_api(1000)
+    with ReportCache() as cache:
+        previous = snapshot(summary_row(index, 100) for index in range(200))
+        with cache.transaction():
+            cache.insert_records("summary", SUMMARY_FIELDS, previous)
+            cache.mark_refreshed("summary", SUMMARY_FIELDS)
+        refreshed_at = cache.refreshed_at("summary", SUMMARY_FIELDS)
+
+        # The consumer stops after the first page of changes
+        pages = SummaryDiff(cache).pages(TOKEN, page_size=50)
+        assert len(next(pages)) == 50
+        pages.close()
+        assert cached_summary(cache) == previous
+        assert cache.refreshed_at("summary", SUMMARY_FIELDS) == refreshed_at
+
+        def fail(pages, records):
+            if records >= 300:
+                raise RuntimeError("connection lost")
+
+        with pytest.raises(RuntimeError):
+            changes(SummaryDiff(cache), progress_callback=fail)
+        assert cached_summary(cache) == previous
+
+        # A later diff still compares against the untouched snapshot
+        diff = SummaryDiff(cache)
+        assert len(changes(diff)) == 800 and diff.counts["unchanged"] == 200
+
+def test_other_jobs_can_use_the_cache_during_a_diff(mock_api):
+    mock_api(1000)
+    refreshed = []
+
+    def refresh_transactions(pages, records):
+        if not refreshed:
+            with ReportCache() as other:
+                other.connection.execute("PRAGMA busy_timeout = 100")
+                refreshed.append(refresh_transactions_cache(other, TOKEN, page_size=250))
+
+    with ReportCache() as cache:
+        with cache.transaction():
+            cache.insert_records("summary", SUMMARY_FIELDS, [summary_row(index, 100) for index in range(500)])
+        diff = SummaryDiff(cache)
+        assert len(changes(diff, progress_callback=refresh_transactions)) == 500
+        assert cache.count("summary", SUMMARY_FIELDS) == 1000
+        assert cache.count("transactions", TRANSACTION_FIELDS) == 1000
+    assert refreshed == [1000]
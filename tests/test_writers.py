@@ -0,0 +1,143 @@
+"""Streaming exporters: files written page by page read back with the same rows"""
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+import reporting
+from frames import normalize_page
+from mock_server import transaction_row
+from reporting import TRANSACTION_FIELDS, open_report_writer, stream_report_to_file
+
+ROWS = 1234
+
+@pytest.fixture(scope="module")
+def rows():
+    """Transaction rows in field order, a few of them with missing values"""
+    rows = []
+    for index in range(ROWS):
+        row = [transaction_row(index, 100)[field] for field in TRANSACTION_FIELDS]
+        if index % 97 == 0:
+            row[4] = row[5] = row[6] = None
+        rows.append(row)
+    return rows
+
+def pages(rows, size=500, as_dicts=False):
+    for start in range(0, len(rows), size):
+        page = rows[start:start + size]
+        yield [dict(zip(TRANSACTION_FIELDS, row)) for row in page] if as_dicts else page
+
+def write_frames(rows, filename):
+    with open_report_writer(filename, "transactions") as writer:
+        for page in pages(rows):
+            writer.write_frame(normalize_page(page, TRANSACTION_FIELDS))
+    return writer.total_records
+
+def read_csv(filename):
+    with open(filename, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+def as_text(row):
+    return ["" if value is None else str(value) for value in row]
+
+def assert_records(records, rows):
+    assert len(records) == len(rows)
+    for record, row in zip(records, rows):
+        expected = dict(zip(TRANSACTION_FIELDS, row))
+        # Typed frames write timestamps with milliseconds
+        if record["TxnDate"] is not None:
+            record["TxnDate"] = record["TxnDate"][:19]
+        assert record == expected
+
+# --- CSV / JSON / JSON Lines ---
+@pytest.mark.parametrize("as_dicts", [False, True])
+def test_csv_round_trip(rows, tmp_path, as_dicts):
+    filename = tmp_path / "transactions.csv"
+    assert stream_report_to_file(pages(rows, as_dicts=as_dicts), str(filename), "transactions") == ROWS
+    assert read_csv(filename) == [TRANSACTION_FIELDS] + [as_text(row) for row in rows]
+
+def test_csv_from_typed_frames_matches_csv_from_records(rows, tmp_path):
+    assert write_frames(rows, str(tmp_path / "frames.csv")) == ROWS
+    stream_report_to_file(pages(rows), str(tmp_path / "records.csv"), "transactions")
+    assert read_csv(tmp_path / "frames.csv") == read_csv(tmp_path / "records.csv")
+
+@pytest.mark.parametrize("typed", [False, True])
+def test_json_round_trip(rows, tmp_path, typed):
+    filename = str(tmp_path / "transactions.json")
+    if typed:
+        write_frames(rows, filename)
+    else:
+        stream_report_to_file(pages(rows, as_dicts=True), filename, "transactions")
+    with open(filename, encoding="utf-8") as f:
+        document = json.load(f)
+    assert document["report_type"] == "transactions"
+    assert document["total_records"] == len(document["data"]) == ROWS
+    assert_records(document["data"], rows)
+
+@pytest.mark.parametrize("typed", [False, True])
+def test_json_lines_round_trip(rows, tmp_path, typed):
+    filename = str(tmp_path / "transactions.jsonl")
+    if typed:
+        write_frames(rows, filename)
+    else:
+        stream_report_to_file(pages(rows), filename, "transactions")
+    with open(filename, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    with open(tmp_path / "transactions.meta.json", encoding="utf-8") as f:
+        assert json.load(f)["total_records"] == ROWS
+    assert_records(records, rows)
+
+# --- Parquet / Arrow ---
+def read_table(filename):
+    """Read a Parquet or Arrow IPC export back with pyarrow (skipping the test without it)"""
+    pa = pytest.importorskip("pyarrow")
+    if filename.endswith(".parquet"):
+        return pytest.importorskip("pyarrow.parquet").read_table(filename)
+    with pa.OSFile(filename, "rb") as source:
+        return pytest.importorskip("pyarrow.ipc").open_file(source).read_all()
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow", ".feather"])
+@pytest.mark.parametrize("typed", [False, True])
+def test_columnar_round_trip(rows, tmp_path, extension, typed):
+    pytest.importorskip("pyarrow")
+    filename = str(tmp_path / f"transactions{extension}")
+    if typed:
+        assert write_frames(rows, filename) == ROWS
+    else:
+        assert stream_report_to_file(pages(rows, as_dicts=True), filename, "transactions") == ROWS
+    table = read_table(filename)
+    assert table.num_rows == ROWS
+    assert table.schema.metadata[b"report_type"] == b"transactions"
+    types = {field.name: str(field.type) for field in table.schema}
+    assert types == {"MemberSalesHeaderRecid": "int64", "MemberNo": "int64", "SaleStampsEarned": "int64",
+                     "RewardsEarned": "int64", "StoreName": "string", "Amount": "decimal128(18, 2)",
+                     "TxnDate": "timestamp[ms]"}
+    expected = [dict(zip(TRANSACTION_FIELDS, row)) for row in rows]
+    for record in expected:
+        if record["Amount"] is not None:
+            record["Amount"] = Decimal(str(record["Amount"])).quantize(Decimal("0.01"))
+        if record["TxnDate"] is not None:
+            record["TxnDate"] = datetime.fromisoformat(record["TxnDate"])
+    assert table.to_pylist() == expected
+
+def test_pandas_reads_typed_columns(rows, tmp_path):
+    pytest.importorskip("pyarrow")
+    filename = str(tmp_path / "transactions.parquet")
+    stream_report_to_file(pages(rows), filename, "transactions")
+    frame = pd.read_parquet(filename)
+    assert len(frame) == ROWS
+    assert str(frame["MemberNo"].dtype) == "int64"
+    assert pd.api.types.is_datetime64_any_dtype(frame["TxnDate"])
+    assert frame["TxnDate"].isna().sum() == frame["StoreName"].isna().sum() == len(range(0, ROWS, 97))
+
+def test_parquet_row_groups_bound_the_buffer(rows, tmp_path, monkeypatch):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(reporting, "ARROW_ROW_GROUP_SIZE", 400)
+    filename = str(tmp_path / "transactions.parquet")
+    stream_report_to_file(pages(rows, size=200), filename, "transactions")
+    metadata = parquet.ParquetFile(filename).metadata
+    assert metadata.num_rows == ROWS
+    assert metadata.num_row_groups == 4